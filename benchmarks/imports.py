@@ -0,0 +1,117 @@
+# -*- coding: UTF-8 -*-
+"""Import time and CLI startup benchmarks, each case runs in a fresh interpreter
+
+    python benchmarks/imports.py
+    python benchmarks/imports.py -save-baseline imports.json
+    python benchmarks/imports.py -baseline imports.json -top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name: python code run by a fresh interpreter
+CASES = {
+    "import jvav": "import jvav",
+    "import jvav.utils": "import jvav.utils",
+    "import jvav.async_utils": "import jvav.async_utils",
+    "first util": "import jvav; jvav.JavBusUtil(use_cache=False)",
+    "jvav -v": "import sys; sys.argv = ['jvav', '-v']; import jvav.cmd; jvav.cmd.main()",
+}
+
+
+def env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    return env
+
+
+def bench(code: str, repeat: int) -> dict:
+    """Time repeat runs of code in new interpreters, minus the startup of a bare interpreter"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", code], env=env(), check=True, stdout=subprocess.DEVNULL
+        )
+        times.append(time.perf_counter() - start)
+    return {
+        "runs": repeat,
+        "median_ms": round(statistics.median(times) * 1000, 1),
+        "min_ms": round(min(times) * 1000, 1),
+    }
+
+
+def import_times(code: str, top: int) -> List[tuple]:
+    """The modules imported by code taking the longest, from python -X importtime"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env(),
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    modules = []
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:  # the imported modules and what they import directly
+            modules.append((name.strip(), int(parts[1]) / 1000))
+    return sorted(modules, key=lambda m: -m[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time benchmarks")
+    parser.add_argument("-repeat", type=int, default=10, help="runs per case")
+    parser.add_argument("-baseline", help="baseline json to compare with")
+    parser.add_argument("-save-baseline", help="save the results as a baseline")
+    parser.add_argument(
+        "-threshold", type=float, default=0.2, help="slowdown counted as a regression"
+    )
+    parser.add_argument(
+        "-top", type=int, default=0, help="show the slowest imports of each case"
+    )
+    args = parser.parse_args()
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    base = bench("pass", args.repeat)["median_ms"]
+    print(f"bare interpreter: {base} ms, subtracted below")
+    print(f"{'case':<26}{'median ms':>10}{'min ms':>10}{'vs base':>10}")
+    results: Dict[str, dict] = {}
+    regressed = False
+    for name, code in CASES.items():
+        r = bench(code, args.repeat)
+        r["median_ms"] = round(r["median_ms"] - base, 1)
+        r["min_ms"] = round(r["min_ms"] - base, 1)
+        results[name] = r
+        diff = ""
+        if name in baseline and baseline[name]["median_ms"] > 0:
+            change = r["median_ms"] / baseline[name]["median_ms"] - 1
+            diff = f"{change:+.1%}"
+            if change > args.threshold:
+                regressed = True
+                diff += " !"
+        print(f"{name:<26}{r['median_ms']:>10}{r['min_ms']:>10}{diff:>10}")
+        for module, ms in import_times(code, args.top):
+            print(f"    {module:<30}{ms:>8.1f} ms")
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=4)
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+# -*- coding: UTF-8 -*-
+"""Parser micro-benchmarks over recorded pages, no network needed once recorded
+
+Record a corpus of pages (needs network):
+
+    python benchmarks/parsers.py record ipx-365 ssis-586 -stars 河北彩花
+
+Benchmark every parse path over it, save a baseline and compare later runs to it:
+
+    python benchmarks/parsers.py run -save-baseline baseline.json
+    python benchmarks/parsers.py run -baseline baseline.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests_cache
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import jvav
+from jvav.replay import Fixture, FixtureStore
+
+PATH_FIXTURES = f"{jvav.utils.PATH_ROOT}/fixtures"
+
+
+class Case:
+    def __init__(self, name: str, util: jvav.BaseUtil, pattern: str, parse: Callable):
+        """A parse path and the recorded pages it applies to
+
+        :param str name: name, e.g. javbus.av
+        :param BaseUtil util: util owning the parser
+        :param str pattern: regex matching the urls of the pages, a page can feed several cases
+        :param Callable parse: parse(util, resp, match) running the parser
+        """
+        self.name = name
+        self.util = util
+        self.pattern = re.compile(pattern)
+        self.parse = parse
+
+    def run(self, resp, match):
+        return self.parse(self.util, resp, match)
+
+
+CASES = [
+    Case(
+        "javdb.av",
+        jvav.JavDbUtil(use_cache=False),
+        r"javdb\.com/v/(\w+)$",
+        lambda u, r, m: u._parse_av(r, m[1], False, False),
+    ),
+    Case(
+        "javdb.javdb_id",
+        jvav.JavDbUtil(use_cache=False),
+        r"javdb\.com/search\?q=([^&]+)$",
+        lambda u, r, m: u._parse_javdb_id(r, unquote(m[1])),
+    ),
+    Case(
+        "javdb.ids_from_page",
+        jvav.JavDbUtil(use_cache=False),
+        r"javdb\.com/(actors/|\?|$)",
+        lambda u, r, m: u._parse_ids_from_page(r),
+    ),
+    Case(
+        "javbus.av",
+        jvav.JavBusUtil(use_cache=False),
+        r"javbus\.com/([\w-]+)$",
+        lambda u, r, m: u._parse_av(r, m[1], r.url),
+    ),
+    Case(
+        "javbus.uc_gid",
+        jvav.JavBusUtil(use_cache=False),
+        r"javbus\.com/([\w-]+)$",
+        lambda u, r, m: u._scan_uc_gid(r.content),
+    ),
+    Case(
+        # how uc and gid were found before the raw scan, kept to compare with
+        "javbus.uc_gid_prettify",
+        jvav.JavBusUtil(use_cache=False),
+        r"javbus\.com/([\w-]+)$",
+        lambda u, r, m: [
+            re.findall(p, u.get_soup(r).prettify())
+            for p in (r"var uc = .+;", r"var gid = .+;")
+        ],
+    ),
+    Case(
+        "javbus.magnets",
+        jvav.JavBusUtil(use_cache=False),
+        r"javbus\.com/ajax/uncledatoolsbyajax\.php",
+        lambda u, r, m: u._parse_magnets(r, jvav.AV(), False, False),
+    ),
+    Case(
+        "javbus.ids_from_page",
+        jvav.JavBusUtil(use_cache=False),
+        r"javbus\.com/(page|search|star|genre)/",
+        lambda u, r, m: u._parse_ids_from_page(r, r.url),
+    ),
+    Case(
+        "sukebei.av",
+        jvav.SukebeiUtil(use_cache=False),
+        r"sukebei\.nyaa\.si/?\?q=([^&]+)$",
+        lambda u, r, m: u._parse_av(r, unquote(m[1]), r.url, False, False),
+    ),
+    Case(
+        "dmm.nice_avs",
+        jvav.DmmUtil(use_cache=False),
+        r"dmm\.co\.jp/search/=/limit=30/sort=ranking/searchstr=([^/]+)",
+        lambda u, r, m: u._parse_nice_avs(r, unquote(m[1])),
+    ),
+    Case(
+        "javlib.comments",
+        jvav.JavLibUtil(use_cache=False),
+        r"javlibrary\.com/cn/videoreviews\.php\?v=(\w+)",
+        lambda u, r, m: u._parse_comments(r, m[1]),
+    ),
+]
+
+
+def to_response(fixture: Fixture) -> requests_cache.CachedResponse:
+    """A response as the parsers get it, outside of the response cache so that
+    BaseUtil.parsed_cache is bypassed"""
+    headers = CaseInsensitiveDict(fixture.headers)
+    return requests_cache.CachedResponse(
+        content=fixture.body,
+        status_code=fixture.status,
+        url=fixture.url,
+        headers=headers,
+        encoding=get_encoding_from_headers(headers),
+    )
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def bench(case: Case, pages: list, repeat: int) -> dict:
+    """Time repeat calls of the parser per page, then measure its allocations once per page"""
+    times = []
+    for resp, match in pages:
+        case.run(resp, match)  # warm up
+        for _ in range(repeat):
+            start = time.perf_counter()
+            case.run(resp, match)
+            times.append(time.perf_counter() - start)
+    peaks = []
+    tracemalloc.start()
+    for resp, match in pages:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        case.run(resp, match)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return {
+        "pages": len(pages),
+        "calls": len(times),
+        "p50_us": round(statistics.median(times) * 1e6, 1),
+        "p90_us": round(percentile(times, 0.9) * 1e6, 1),
+        "p99_us": round(percentile(times, 0.99) * 1e6, 1),
+        "pages_per_sec": round(len(times) / sum(times), 1),
+        "peak_kib": round(statistics.mean(peaks) / 1024, 1),
+    }
+
+
+def run(store: FixtureStore, repeat: int, only: str = "") -> Dict[str, dict]:
+    pages: Dict[str, list] = {case.name: [] for case in CASES}
+    for fixture in store:
+        if fixture.status != 200:
+            continue
+        for case in CASES:
+            match = case.pattern.search(fixture.url)
+            if match:
+                pages[case.name].append((to_response(fixture), match))
+    results = {}
+    for case in CASES:
+        if pages[case.name] and re.search(only, case.name):
+            results[case.name] = bench(case, pages[case.name], repeat)
+    return results
+
+
+def report(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> bool:
+    """Print the results, return whether a case got slower than the baseline by more than threshold"""
+    regressed = False
+    print(
+        f"{'case':<26}{'pages':>6}{'p50 us':>10}{'p90 us':>10}{'p99 us':>10}"
+        f"{'pages/s':>10}{'peak KiB':>10}{'vs base':>10}"
+    )
+    for name, r in results.items():
+        diff = ""
+        if name in baseline:
+            change = r["p50_us"] / baseline[name]["p50_us"] - 1
+            diff = f"{change:+.1%}"
+            if change > threshold:
+                regressed = True
+                diff += " !"
+        print(
+            f"{name:<26}{r['pages']:>6}{r['p50_us']:>10}{r['p90_us']:>10}{r['p99_us']:>10}"
+            f"{r['pages_per_sec']:>10}{r['peak_kib']:>10}{diff:>10}"
+        )
+    return regressed
+
+
+def record(store: FixtureStore, ids: List[str], stars: List[str]):
+    """Fetch the pages of ids and stars from every provider into the store"""
+    jvav.BaseUtil.recorder = store
+    try:
+        for id in ids:
+            jvav.JavDbUtil().get_av_by_id(id, False, False)
+            jvav.JavBusUtil().get_av_by_id(id, False, False)
+            jvav.SukebeiUtil().get_av_by_id(id, False, False)
+            jvav.JavLibUtil().get_comments_by_id(id)
+        for star in stars:
+            jvav.DmmUtil().get_nice_avs_by_star_name(star)
+            jvav.JavBusUtil().get_ids_by_star_name(star)
+            jvav.JavDbUtil().get_ids_by_star_name(star)
+    finally:
+        jvav.BaseUtil.recorder = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parser micro-benchmarks")
+    parser.add_argument(
+        "-fixtures", default=PATH_FIXTURES, help="fixture directory, see jvav.replay"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    parser_record = subparsers.add_parser("record", help="record pages to benchmark")
+    parser_record.add_argument("ids", nargs="*", help="codes, e.g. ipx-365")
+    parser_record.add_argument("-stars", nargs="*", default=[], help="star names")
+    parser_run = subparsers.add_parser("run", help="benchmark the recorded pages")
+    parser_run.add_argument("-repeat", type=int, default=20, help="calls per page")
+    parser_run.add_argument("-only", default="", help="regex on case names")
+    parser_run.add_argument(
+        "-engine",
+        choices=["lxml", "soup"],
+        default="lxml",
+        help="BaseUtil.parse_engine, soup benchmarks the BeautifulSoup fallbacks",
+    )
+    parser_run.add_argument("-baseline", help="baseline json to compare with")
+    parser_run.add_argument("-save-baseline", help="save the results as a baseline")
+    parser_run.add_argument(
+        "-threshold", type=float, default=0.1, help="p50 slowdown counted as a regression"
+    )
+    args = parser.parse_args()
+    store = FixtureStore(args.fixtures)
+    if args.command == "record":
+        record(store, args.ids, args.stars)
+        return
+    jvav.BaseUtil.parse_engine = args.engine
+    results = run(store, args.repeat, args.only)
+    if not results:
+        print(f"no recorded pages in {args.fixtures}, run the record command first")
+        return
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressed = report(results, baseline, args.threshold)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=4)
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
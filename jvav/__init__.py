@@ -1,33 +1,89 @@
 # -*- coding: UTF-8 -*-
-from jvav.utils import (
-    BaseUtil,
-    JavLibUtil,
-    DmmUtil,
-    JavBusUtil,
-    AvgleUtil,
-    MagnetUtil,
-    SukebeiUtil,
-    WikiUtil,
-    TransUtil,
-    JavDbUtil,
-    RankUtil,
-)
+import importlib
+from typing import TYPE_CHECKING
 
 __version__ = "3.0.0"
 
 VERSION = __version__
 
-__all__ = [
-    VERSION,
-    BaseUtil,
-    JavLibUtil,
-    DmmUtil,
-    JavBusUtil,
-    AvgleUtil,
-    MagnetUtil,
-    SukebeiUtil,
-    WikiUtil,
-    TransUtil,
-    JavDbUtil,
-    RankUtil,
-]
+# name: module defining it, the modules are only imported when a name is first accessed
+# so that `import jvav` (and `jvav -v`) does not pay for requests, bs4, httpx and co
+_LAZY_NAMES = {
+    "BaseUtil": "jvav.utils",
+    "JavLibUtil": "jvav.utils",
+    "DmmUtil": "jvav.utils",
+    "JavBusUtil": "jvav.utils",
+    "AvgleUtil": "jvav.utils",
+    "MagnetUtil": "jvav.utils",
+    "Magnet": "jvav.utils",
+    "AV": "jvav.utils",
+    "JavDbAV": "jvav.utils",
+    "Star": "jvav.utils",
+    "RatedAV": "jvav.utils",
+    "Listing": "jvav.utils",
+    "SukebeiUtil": "jvav.utils",
+    "WikiUtil": "jvav.utils",
+    "TransUtil": "jvav.utils",
+    "JavDbUtil": "jvav.utils",
+    "RankUtil": "jvav.utils",
+    "AsyncBaseUtil": "jvav.async_utils",
+    "AsyncRankUtil": "jvav.async_utils",
+    "AsyncJavDbUtil": "jvav.async_utils",
+    "AsyncJavLibUtil": "jvav.async_utils",
+    "AsyncDmmUtil": "jvav.async_utils",
+    "AsyncJavBusUtil": "jvav.async_utils",
+    "AsyncAvgleUtil": "jvav.async_utils",
+    "AsyncSukebeiUtil": "jvav.async_utils",
+    "MetricsCollector": "jvav.metrics",
+}
+_SUBMODULES = ("utils", "async_utils", "metrics", "replay", "cmd")
+
+if TYPE_CHECKING:
+    from jvav.utils import (
+        BaseUtil,
+        JavLibUtil,
+        DmmUtil,
+        JavBusUtil,
+        AvgleUtil,
+        MagnetUtil,
+        Magnet,
+        AV,
+        JavDbAV,
+        Star,
+        RatedAV,
+        Listing,
+        SukebeiUtil,
+        WikiUtil,
+        TransUtil,
+        JavDbUtil,
+        RankUtil,
+    )
+    from jvav.async_utils import (
+        AsyncBaseUtil,
+        AsyncRankUtil,
+        AsyncJavDbUtil,
+        AsyncJavLibUtil,
+        AsyncDmmUtil,
+        AsyncJavBusUtil,
+        AsyncAvgleUtil,
+        AsyncSukebeiUtil,
+    )
+    from jvav.metrics import MetricsCollector
+
+
+def __getattr__(name: str):
+    if name in _LAZY_NAMES:
+        value = getattr(importlib.import_module(_LAZY_NAMES[name]), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f"jvav.{name}")
+    else:
+        raise AttributeError(f"module 'jvav' has no attribute '{name}'")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_NAMES) + list(_SUBMODULES))
+
+
+__all__ = ["VERSION", *_LAZY_NAMES]
@@ -0,0 +1,1177 @@
+# -*- coding: UTF-8 -*-
+import asyncio
+import itertools
+import random
+import time
+from typing import (
+    Tuple,
+    Union,
+    List,
+    Any,
+    Dict,
+    Callable,
+    Awaitable,
+    Iterable,
+    AsyncIterator,
+)
+
+import httpx
+import requests
+import requests_cache
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib.parse import urlsplit
+
+from jvav.metrics import add_timing, httpx_trace, request_timing, set_timing
+from jvav.utils import (
+    BaseUtil,
+    CircuitOpenError,
+    RankUtil,
+    JavDbUtil,
+    JavLibUtil,
+    DmmUtil,
+    JavBusUtil,
+    AvgleUtil,
+    SukebeiUtil,
+)
+
+
+class AsyncBaseUtil(BaseUtil):
+    """BaseUtil whose requests run on an asyncio event loop
+
+    Responses are read from and written to the same cache as the blocking utils,
+    and are handed to the parsers as requests-compatible response objects.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The async client shared by all requests of this util, created on first use"""
+        if self._client is None:
+            self._client = self._new_client()
+        return self._client
+
+    def _new_client(self) -> httpx.AsyncClient:
+        proxy = self.proxy_addr or None
+        mounts = {}
+        for host, size in self.pool_sizes.items():
+            pattern = host if "://" in host else f"all://{host}"
+            mounts[pattern] = httpx.AsyncHTTPTransport(
+                proxy=proxy, limits=httpx.Limits(max_connections=size)
+            )
+        return httpx.AsyncClient(
+            proxy=proxy,
+            mounts=mounts,
+            follow_redirects=True,
+            timeout=None,
+            limits=httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=self.pool_connections * self.pool_maxsize,
+            ),
+        )
+
+    async def aclose(self):
+        """Close the async client and the session holding the cache"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self.close()
+
+    @staticmethod
+    def _to_httpx_args(headers: dict, args: dict) -> Tuple[dict, dict]:
+        """Translate requests-style keyword arguments to httpx ones"""
+        headers = CaseInsensitiveDict(headers)
+        args = dict(args)
+        cookies = args.pop("cookies", None)
+        if cookies:
+            cookie = "; ".join(f"{k}={v}" for k, v in cookies.items())
+            old = headers.pop("cookie", None)
+            headers["cookie"] = f"{old}; {cookie}" if old else cookie
+        if "allow_redirects" in args:
+            args["follow_redirects"] = args.pop("allow_redirects")
+        for k in ("proxies", "verify", "stream", "cert"):
+            args.pop(k, None)
+        return dict(headers), args
+
+    @staticmethod
+    def _to_cached_response(resp: httpx.Response) -> requests_cache.CachedResponse:
+        """Wrap an httpx response so that parsers and the cache can use it like a requests one"""
+        headers = CaseInsensitiveDict(resp.headers)
+        return requests_cache.CachedResponse(
+            content=resp.content,
+            status_code=resp.status_code,
+            url=str(resp.url),
+            headers=headers,
+            encoding=get_encoding_from_headers(headers),
+            reason=resp.reason_phrase,
+            elapsed=resp.elapsed,
+            request=requests_cache.CachedRequest(
+                method=resp.request.method,
+                url=str(resp.request.url),
+                headers=CaseInsensitiveDict(resp.request.headers),
+            ),
+        )
+
+    @staticmethod
+    def _validation_headers(cached: requests_cache.CachedResponse) -> dict:
+        """Conditional request headers revalidating an expired cached response"""
+        headers = {}
+        if "ETag" in cached.headers:
+            headers["If-None-Match"] = cached.headers["ETag"]
+        if "Last-Modified" in cached.headers:
+            headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+        return headers
+
+    async def _send(
+        self, client, method: str, url: str, headers: dict, args: dict
+    ) -> httpx.Response:
+        """Send a request with pacing, retries and the circuit breaker, see PolicyAdapter"""
+        attempt = 0
+        while True:
+            if not self.circuit_breaker.allow(url):
+                raise CircuitOpenError(f"circuit open for {urlsplit(url).netloc}")
+            delay = self.rate_limiter.delay(url)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                add_timing("queue_wait", delay)
+            try:
+                resp = await client.request(
+                    method,
+                    url,
+                    headers=headers,
+                    extensions={"trace": httpx_trace},
+                    **args,
+                )
+            except httpx.TransportError:
+                self.circuit_breaker.record(url)
+                delay = self.retry_policy.retry_delay(method, attempt)
+                if delay is None:
+                    raise
+            else:
+                self.rate_limiter.feedback(url, resp.status_code)
+                self.circuit_breaker.record(url, resp.status_code)
+                delay = self.retry_policy.retry_delay(
+                    method, attempt, resp.status_code, resp.headers.get("Retry-After")
+                )
+                if delay is None:
+                    return resp
+            await asyncio.sleep(delay)
+            add_timing("queue_wait", delay)
+            add_timing("retries", 1)
+            attempt += 1
+
+    async def _inner_send_req(
+        self, url: str, client, headers=None, m=0, **args
+    ) -> Union[Tuple[int, None], Tuple[int, Any]]:
+        if not headers:
+            headers = {"user-agent": self._ua(url=url)}
+        if m not in self.METHODS:
+            return 502, None
+        method = self.METHODS[m]
+        try:
+            cache = cached = None
+            if self.use_cache and method == "GET":
+                cache = self.session.cache
+                cache_key = cache.create_key(
+                    requests.Request(method, url, params=args.get("params")).prepare()
+                )
+                cached = await asyncio.to_thread(cache.get_response, cache_key)
+                if cached is not None and not cached.is_expired:
+                    return 200, cached
+            headers, args = self._to_httpx_args(headers, args)
+            if cached is not None:
+                headers.update(self._validation_headers(cached))
+            resp = await self._send(client, method, url, headers, args)
+            if resp.status_code == 304 and cached is not None:
+                # not modified: keep the cached body, only its expiration is refreshed
+                cached.headers.update(resp.headers)
+                cached.revalidated = True
+                resp = cached
+            elif resp.status_code != 200:
+                return self._map_status(url, resp)
+            else:
+                resp = self._to_cached_response(resp)
+                # converted responses always claim to come from the cache
+                set_timing("cache", "miss")
+            if cache is not None:
+                resp.expires = requests_cache.get_expiration_datetime(
+                    self.get_expire_after(url)
+                )
+                await asyncio.to_thread(
+                    cache.save_response, resp, cache_key, resp.expires
+                )
+                resp.cache_key = cache_key  # see cache_parsed
+            return 200, resp
+        except Exception as e:
+            self.log.error(f"AsyncBaseUtil: failed to access {url}: {e}")
+            return 502, None
+
+    async def send_req(
+        self, url: str, headers=None, m=0, endpoint="", **args
+    ) -> Tuple[int, requests.Response]:
+        """send request asynchronously, see BaseUtil.send_req
+
+        :param str url: url
+        :param dict headers: headers, random headers by default
+        :param int m: request method, default: get(0), others: post(1), delete(2), put(3)
+        :param str endpoint: public util method sending the request, reported to the
+            instrumentation observers, defaults to ''
+        :param dict args: othre request parameters
+        :return tuple[int, requests.Response] status code and response
+        """
+        if self.instrumentation.enabled:
+            start = time.perf_counter()
+            with request_timing() as timing:
+                code, resp = await self._inner_send_req(
+                    url, self.client, headers, m, **args
+                )
+            self._emit_request(
+                endpoint, url, m, code, resp, timing, time.perf_counter() - start
+            )
+        else:
+            code, resp = await self._inner_send_req(
+                url, self.client, headers, m, **args
+            )
+        if code == 200 and self.recorder is not None:
+            await asyncio.to_thread(
+                self.recorder.record, url, resp, args.get("params")
+            )
+        return code, resp
+
+    async def _star_page(
+        self, base_page_url: str, page: int
+    ) -> Tuple[int, Union[int, None]]:
+        """Page of the AV list of a star to fetch, see BaseUtil._star_page"""
+        if page != -1:
+            return 200, page
+        code, max_page = await self._max_page(base_page_url)
+        if code != 200:
+            return code, None
+        return 200, random.randint(1, max_page)
+
+    async def _max_page(self, base_page_url: str) -> Tuple[int, Union[int, None]]:
+        """Page count of an AV list, see BaseUtil._max_page"""
+        max_page = self.star_cache.get_max_page(base_page_url) if self.use_cache else None
+        if max_page:
+            return 200, max_page
+        code, max_page = await self.get_max_page(base_page_url)
+        if code == 200 and self.use_cache:
+            self.star_cache.put_max_page(base_page_url, max_page)
+        return code, max_page
+
+    async def _iter_batch(
+        self,
+        fn: Callable[[str], Awaitable[Tuple[int, Any]]],
+        ids: Iterable[str],
+        concurrency=8,
+        ordered=False,
+    ) -> AsyncIterator[Tuple[str, Tuple[int, Any]]]:
+        """Run a lookup over many ids on the event loop, see BaseUtil._iter_batch"""
+        ids = iter(ids)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(id: str) -> Tuple[int, Any]:
+            async with semaphore:
+                return await fn(id)
+
+        pending = {}  # task -> id, in submission order
+        try:
+            for id in itertools.islice(ids, concurrency * 2):
+                pending[asyncio.ensure_future(run(id))] = id
+            while pending:
+                if ordered:
+                    done = [next(iter(pending))]
+                    await asyncio.wait(done)
+                else:
+                    done, _ = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                for task in done:
+                    id = pending.pop(task)
+                    for next_id in itertools.islice(ids, 1):
+                        pending[asyncio.ensure_future(run(next_id))] = next_id
+                    try:
+                        res = task.result()
+                    except Exception as e:
+                        self.log.error(f"AsyncBaseUtil: failed to look up {id}: {e}")
+                        res = (502, None)
+                    yield id, res
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _iter_pages(
+        self,
+        fetch: Callable[[int], Awaitable[Tuple[int, Union[list, None]]]],
+        pages: Iterable[int],
+        concurrency=4,
+    ) -> AsyncIterator[Any]:
+        """Yield the items of list pages fetched concurrently, see BaseUtil._iter_pages"""
+        batch = self._iter_batch(fetch, pages, concurrency, ordered=True)
+        try:
+            async for page, (code, items) in batch:
+                if code == 404:
+                    return
+                if code != 200:
+                    self.log.error(f"AsyncBaseUtil: failed to get page {page}: {code}")
+                    continue
+                for item in items:
+                    yield item
+        finally:
+            await batch.aclose()
+
+
+class AsyncRankUtil(AsyncBaseUtil, RankUtil):
+    """Async twin of RankUtil"""
+
+    async def random_get_av_from_rank(self) -> Tuple[int, str]:
+        code, resp = await self.send_req(
+            self.BASE_URL_AV_RANK, endpoint="random_get_av_from_rank"
+        )
+        if code != 200:
+            return code, None
+        return 200, random.choice(self._parse_av_rank(resp))
+
+    async def get_av_250_rank(self) -> Tuple[int, list]:
+        code, resp = await self.send_req(
+            self.BASE_URL_AV_RANK, endpoint="get_av_250_rank"
+        )
+        if code != 200:
+            return code, None
+        return 200, self._parse_av_rank(resp)
+
+
+class AsyncJavDbUtil(AsyncBaseUtil, JavDbUtil):
+    """Async twin of JavDbUtil, every lookup is a coroutine returning the same result"""
+
+    async def get_max_page(self, url: str) -> Union[Tuple[int, None], Tuple[int, int]]:
+        code, resp = await self.send_req(url, endpoint="get_max_page")
+        if code != 200:
+            return code, None
+        return self._parse_max_page(resp, url)
+
+    async def get_new_ids(self) -> Tuple[int, any]:
+        return await self.get_ids_from_page(self.base_url_new_av)
+
+    async def get_ids_from_page(
+        self, url: str
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
+        code, resp = await self.send_req(url=url, endpoint="get_ids_from_page")
+        if code != 200:
+            return code, None
+        return self._parse_ids_from_page(resp)
+
+    async def get_star_page_by_star_name(
+        self, star_name
+    ) -> Union[Tuple[int, None], Tuple[int, str]]:
+        url = self._cached_star(star_name).get("url")
+        if url:
+            return 200, url
+        code, resp = await self.send_req(
+            url=self.base_url_search_star + star_name,
+            endpoint="get_star_page_by_star_name",
+        )
+        if code != 200:
+            return code, None
+        code, url = self._parse_star_page(resp)
+        if code == 200:
+            self._cache_star(star_name, url=url)
+        return code, url
+
+    async def fuzzy_search_stars(
+        self, text
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
+        code, resp = await self.send_req(
+            url=self.base_url_search_star + text, endpoint="fuzzy_search_stars"
+        )
+        if code != 200:
+            return code, None
+        return self._parse_fuzzy_stars(resp)
+
+    async def get_id_by_star_name(
+        self, star_name: str, page=-1
+    ) -> Union[Tuple[int, None], Tuple[int, Any]]:
+        code, ids = await self.get_ids_by_star_name(star_name, page)
+        if code != 200:
+            return code, None
+        return 200, random.choice(ids)
+
+    async def get_ids_by_star_name(
+        self, star_name: str, page=-1
+    ) -> Union[Tuple[Any, None], Tuple[int, Any], Tuple[int, None]]:
+        code, base_page_url = await self.get_star_page_by_star_name(star_name)
+        if code != 200:
+            return code, None
+        code, page = await self._star_page(base_page_url, page)
+        if code != 200:
+            return code, None
+        return await self.get_ids_from_page(f"{base_page_url}?page={page}")
+
+    async def iter_ids_by_star_name(
+        self, star_name: str, max_pages: Union[int, None] = None, concurrency=4
+    ) -> AsyncIterator[str]:
+        code, base_page_url = await self.get_star_page_by_star_name(star_name)
+        if code != 200:
+            return
+        code, max_page = await self._max_page(base_page_url)
+        if code != 200:
+            return
+        async for id in self._iter_pages(
+            lambda page: self.get_ids_from_page(f"{base_page_url}?page={page}"),
+            self._page_range(max_page, max_pages),
+            concurrency,
+        ):
+            yield id
+
+    def iter_home_ids(
+        self, max_pages: Union[int, None] = None, concurrency=4
+    ) -> AsyncIterator[str]:
+        return self._iter_pages(
+            lambda page: self.get_ids_from_page(f"{self.base_url}/?page={page}"),
+            self._page_range(self.max_home_page_count, max_pages),
+            concurrency,
+        )
+
+    async def get_new_ids_by_star_name(
+        self, star_name: str
+    ) -> Union[Tuple[Any, None], Tuple[int, Any], Tuple[int, None]]:
+        code, url = await self.get_star_page_by_star_name(star_name)
+        if code != 200:
+            return code, None
+        code, ids = await self.get_ids_from_page(url)
+        if code != 200:
+            return code, None
+        return 200, ids[: self.max_new_avs_count]
+
+    async def get_nice_avs_by_star_name(
+        self, star_name: str, cookie: str
+    ) -> Union[
+        Tuple[Any, None], Tuple[int, None], Tuple[int, List[Dict[str, Union[str, Any]]]]
+    ]:
+        code, base_page_url = await self.get_star_page_by_star_name(star_name)
+        if code != 200:
+            return code, None
+        url = f"{base_page_url}{self.BASE_PARAM_NICE_AVS_OF_STAR}"
+        code, resp = await self.send_req(
+            url=url,
+            headers={"cookie": cookie, "user-agent": self._ua("desktop")},
+            endpoint="get_nice_avs_by_star_name",
+        )
+        if code != 200:
+            return code, None
+        return self._export(*self._parse_nice_avs(resp))
+
+    async def get_javdb_id_by_id(
+        self, id: str
+    ) -> Union[Tuple[int, None], Tuple[int, Any]]:
+        javdb_id = self._indexed_javdb_id(id)
+        if javdb_id:
+            return 200, javdb_id
+        code, resp = await self.send_req(
+            url=self.base_url_search + id, endpoint="get_javdb_id_by_id"
+        )
+        if code != 200:
+            return code, None
+        return self._parse_javdb_id(resp, id)
+
+    async def get_javdb_ids_from_page(
+        self, url: str
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
+        code, resp = await self.send_req(url=url, endpoint="get_javdb_ids_from_page")
+        if code != 200:
+            return code, None
+        return self._parse_javdb_ids_from_page(resp)
+
+    async def get_id_from_home(self) -> Union[Tuple[Any, None], Tuple[int, Any]]:
+        code, resp = await self.get_ids_from_page(url=self.base_url)
+        if code != 200:
+            return code, None
+        return 200, random.choice(resp)
+
+    async def get_javdb_id_from_home(self) -> Union[Tuple[Any, None], Tuple[int, Any]]:
+        code, resp = await self.get_javdb_ids_from_page(url=self.base_url)
+        if code != 200:
+            return code, None
+        return 200, random.choice(resp)
+
+    async def get_ids_from_home(self) -> Union[Tuple[Any, None], Tuple[int, Any]]:
+        return await self.get_ids_from_page(url=self.base_url)
+
+    async def get_javdb_ids_from_home(
+        self,
+    ) -> Union[Tuple[Any, None], Tuple[int, Any]]:
+        return await self.get_javdb_ids_from_page(url=self.base_url)
+
+    async def get_ids_by_tag(self, tag: str) -> Tuple[int, list]:
+        return await self.get_ids_from_page(f"{self.base_url_search}{tag}")
+
+    async def get_javdb_ids_by_tag(self, tag: str) -> Tuple[int, list]:
+        return await self.get_javdb_ids_from_page(f"{self.base_url_search}{tag}")
+
+    async def get_cover_by_id(
+        self, id: str
+    ) -> Union[Tuple[int, None], Tuple[int, Any]]:
+        code, resp = await self.send_req(
+            url=self.base_url_search + id, endpoint="get_cover_by_id"
+        )
+        if code != 200:
+            return code, None
+        return self._parse_cover_from_search(resp, id)
+
+    async def get_cover_by_javdb_id(
+        self, javdb_id: str
+    ) -> Union[Tuple[int, None], Tuple[int, Union[str, Any]]]:
+        code, resp = await self.send_req(
+            url=self.base_url_video + javdb_id, endpoint="get_cover_by_javdb_id"
+        )
+        if code != 200:
+            return code, None
+        return self._parse_cover(resp)
+
+    async def get_pv_by_id(
+        self, id: str
+    ) -> Union[Tuple[Any, None], Tuple[int, None], Tuple[int, Union[str, Any]]]:
+        code, j_id = await self.get_javdb_id_by_id(id)
+        if code != 200:
+            return code, None
+        code, resp = await self.send_req(
+            url=self.base_url_video + j_id, endpoint="get_pv_by_id"
+        )
+        if code != 200:
+            return code, None
+        return self._parse_pv(resp)
+
+    async def get_samples_by_id(
+        self, id: str
+    ) -> Union[Tuple[Any, None], Tuple[int, None], Tuple[int, List[Any]]]:
+        code, j_id = await self.get_javdb_id_by_id(id)
+        if code != 200:
+            return code, None
+        code, resp = await self.send_req(
+            url=self.base_url_video + j_id, endpoint="get_samples_by_id"
+        )
+        if code != 200:
+            return code, None
+        return self._parse_samples(resp)
+
+    async def get_av_by_javdb_id(
+        self,
+        javdb_id: str,
+        is_nice: bool,
+        is_uncensored: bool,
+        sex_limit: bool = False,
+        magnet_max_count=10,
+    ) -> Tuple[int, any]:
+        code, resp = await self.send_req(
+            url=self.base_url_video + javdb_id, endpoint="get_av_by_javdb_id"
+        )
+        if code != 200:
+            return code, None
+        return self._export(
+            *self._parse_av(
+                resp, javdb_id, is_nice, is_uncensored, sex_limit, magnet_max_count
+            )
+        )
+
+    async def get_av_by_id(
+        self,
+        id: str,
+        is_nice: bool,
+        is_uncensored: bool,
+        sex_limit: bool = False,
+        magnet_max_count=10,
+    ) -> Tuple[int, any]:
+        code, j_id = await self.get_javdb_id_by_id(id)
+        if code != 200:
+            return code, None
+        return await self.get_av_by_javdb_id(
+            j_id, is_nice, is_uncensored, sex_limit, magnet_max_count
+        )
+
+    async def get_bundle_by_id(
+        self,
+        id: str,
+        fields: Iterable[str] = JavDbUtil.BUNDLE_FIELDS,
+        is_nice=False,
+        is_uncensored=False,
+        sex_limit=False,
+        magnet_max_count=10,
+    ) -> Tuple[int, any]:
+        fields = self._bundle_fields(fields)
+        j_id = self._indexed_javdb_id(id)
+        if not j_id or set(fields) <= {"cover"}:
+            code, resp = await self.send_req(
+                url=self.base_url_search + id, endpoint="get_bundle_by_id"
+            )
+            if code != 200:
+                return code, None
+            code, j_id = self._parse_javdb_id(resp, id)
+            if code != 200:
+                return code, None
+            if set(fields) <= {"cover"}:
+                bundle = {"javdb_id": j_id}
+                if fields:
+                    bundle["cover"] = self._parse_cover_from_search(resp, id)[1]
+                return 200, bundle
+        code, resp = await self.send_req(
+            url=self.base_url_video + j_id, endpoint="get_bundle_by_id"
+        )
+        if code != 200:
+            return code, None
+        return self._export_bundle(
+            *self._parse_bundle(
+                resp, j_id, fields, is_nice, is_uncensored, sex_limit, magnet_max_count
+            )
+        )
+
+    async def get_av_by_ids(
+        self,
+        ids: Iterable[str],
+        is_nice: bool,
+        is_uncensored: bool,
+        sex_limit: bool = False,
+        magnet_max_count=10,
+        concurrency=8,
+        ordered=False,
+    ) -> Dict[str, Tuple[int, any]]:
+        return {
+            id: res
+            async for id, res in self.iter_av_by_ids(
+                ids,
+                is_nice,
+                is_uncensored,
+                sex_limit,
+                magnet_max_count,
+                concurrency,
+                ordered,
+            )
+        }
+
+    def iter_av_by_ids(
+        self,
+        ids: Iterable[str],
+        is_nice: bool,
+        is_uncensored: bool,
+        sex_limit: bool = False,
+        magnet_max_count=10,
+        concurrency=8,
+        ordered=False,
+    ) -> AsyncIterator[Tuple[str, Tuple[int, any]]]:
+        return self._iter_batch(
+            lambda id: self.get_av_by_id(
+                id, is_nice, is_uncensored, sex_limit, magnet_max_count
+            ),
+            ids,
+            concurrency,
+            ordered,
+        )
+
+
+class AsyncJavLibUtil(AsyncBaseUtil, JavLibUtil):
+    """Async twin of JavLibUtil"""
+
+    async def get_random_ids_from_rank_by_page(
+        self, page: int, list_type: int
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
+        return await self._get_rank_ids(
+            self._rank_url(list_type), page, "get_random_ids_from_rank_by_page"
+        )
+
+    def iter_rank_ids(
+        self, list_type: int, max_pages: Union[int, None] = None, concurrency=4
+    ) -> AsyncIterator[str]:
+        url = self._rank_url(list_type)
+        return self._iter_pages(
+            lambda page: self._get_rank_ids(url, page, "iter_rank_ids"),
+            self._page_range(self.MAX_RANK_PAGE, max_pages),
+            concurrency,
+        )
+
+    async def _get_rank_ids(
+        self, url: str, page: int, endpoint: str
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
+        code, resp = await self.send_req(
+            url=url + str(page), headers=self.get_headers(), endpoint=endpoint
+        )
+        if code != 200:
+            return code, None
+        return self._parse_rank_ids(resp)
+
+    async def get_random_id_from_rank(
+        self, list_type: int
+    ) -> Union[Tuple[Any, None], Tuple[int, Any]]:
+        page = random.randint(1, self.MAX_RANK_PAGE)
+        code, ids = await self.get_random_ids_from_rank_by_page(
+            page=page, list_type=list_type
+        )
+        if code != 200:
+            return code, None
+        return 200, random.choice(ids)
+
+    async def get_comments_by_id(
+        self, id: str
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
+        url = self.base_url_search_av + id
+        code, resp = await self.send_req(
+            url=url, headers=self.get_headers(), endpoint="get_comments_by_id"
+        )
+        if code != 200:
+            return code, None
+        code, javlib_av_id = self._parse_javlib_av_id(resp, url, id)
+        if code != 200:
+            return code, None
+        comment_url = self.base_url_review + javlib_av_id
+        code, resp = await self.send_req(
+            url=comment_url, headers=self.get_headers(), endpoint="get_comments_by_id"
+        )
+        if code != 200:
+            return code, None
+        return self._parse_comments(resp, id)
+
+
+class AsyncDmmUtil(AsyncBaseUtil, DmmUtil):
+    """Async twin of DmmUtil"""
+
+    def _req_args(self, ua: str) -> dict:
+        return {"headers": {"user-agent": ua}, "cookies": {"age_check_done": "1"}}
+
+    async def get_pv_by_id(self, id: str) -> Union[Tuple[int, None], Tuple[int, Any]]:
+        code, resp = await self.send_req(
+            url=self.base_url_search_av + id,
+            **self._req_args(self._ua("mobile")),
+            endpoint="get_pv_by_id",
+        )
+        if code != 200:
+            return code, None
+        return self._parse_pv(resp, id)
+
+    async def get_cids(
+        self, url: str
+    ) -> Union[Tuple[int, None], Tuple[int, List[str]]]:
+        code, resp = await self.send_req(
+            url=url, **self._req_args(self._ua("desktop")), endpoint="get_cids"
+        )
+        if code != 200:
+            return code, None
+        return self._parse_cids(resp, url)
+
+    async def get_cids_monthly(
+        self, url: str
+    ) -> Union[Tuple[int, None], Tuple[int, List[str]]]:
+        code, resp = await self.send_req(
+            url=url, **self._req_args(self._ua("desktop")), endpoint="get_cids_monthly"
+        )
+        if code != 200:
+            return code, None
+        return self._parse_cids_monthly(resp, url)
+
+    async def get_cids_by_tag(self, tag: str) -> Tuple[int, list]:
+        return await self.get_cids(self.base_url_search_av + tag)
+
+    async def get_cids_by_tag_monthly(self, tag: str) -> Tuple[int, list]:
+        return await self.get_cids_monthly(self.base_url_search_av_monthly + tag)
+
+    async def get_cids_by_link(self, lk: str) -> Tuple[int, list]:
+        return await self.get_cids(lk)
+
+    async def get_cids_by_link_monthly(self, lk: str) -> Tuple[int, list]:
+        return await self.get_cids_monthly(lk)
+
+    async def get_nice_avs_by_star_name(self, star_name: str) -> Tuple[int, any]:
+        url = self.base_url_search_star + star_name + "%20単体"
+        code, resp = await self.send_req(
+            url=url,
+            **self._req_args(self._ua("desktop")),
+            endpoint="get_nice_avs_by_star_name",
+        )
+        if code != 200:
+            return code, resp
+        return self._export(*self._parse_nice_avs(resp, star_name))
+
+    async def get_score_by_id(self, id: str) -> Tuple[int, any]:
+        code, resp = await self.send_req(
+            url=self.base_url_search_av + id,
+            **self._req_args(self._ua("desktop")),
+            endpoint="get_score_by_id",
+        )
+        if code != 200:
+            return code, resp
+        return self._parse_score(resp, id)
+
+    async def get_top_stars(
+        self, page=1
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
+        url = self.base_url_top_stars + f"/page={page}/"
+        code, resp = await self.send_req(
+            url=url, **self._req_args(self._ua("desktop")), endpoint="get_top_stars"
+        )
+        if code != 200:
+            return code, None
+        return self._parse_top_stars(resp, page)
+
+    async def get_all_top_stars(
+        self,
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
+        results = await asyncio.gather(*[self.get_top_stars(p) for p in range(1, 6)])
+        stars = []
+        for code, res in results:
+            if code != 200:
+                return 502, None
+            if res != None:
+                stars += res
+        if stars == []:
+            return 404, None
+        return 200, stars
+
+
+class AsyncJavBusUtil(AsyncBaseUtil, JavBusUtil):
+    """Async twin of JavBusUtil"""
+
+    async def get_all_genres(
+        self,
+    ) -> Union[Tuple[int, None], Tuple[int, List[Dict[Any, Any]]]]:
+        code, resp = await self.send_req(
+            url=self.base_url_genre,
+            headers=self.get_headers(),
+            endpoint="get_all_genres",
+        )
+        if code != 200:
+            return code, None
+        return self._parse_all_genres(resp)
+
+    async def get_id_by_genre_id(self, genre: str) -> Tuple[int, str]:
+        return await self.get_id_from_page(
+            base_page_url=f"{self.base_url_genre}/{genre}"
+        )
+
+    async def get_id_by_genre_name(self, genre: str) -> Tuple[int, str]:
+        return await self.get_id_from_page(
+            base_page_url=f"{self.base_url_genre}/{genre}"
+        )
+
+    async def get_max_page(self, url: str) -> Union[Tuple[int, None], Tuple[int, int]]:
+        code, resp = await self.send_req(
+            url, headers=self.get_headers(), endpoint="get_max_page"
+        )
+        if code != 200:
+            return code, None
+        return self._parse_max_page(resp, url)
+
+    async def get_ids_from_page(
+        self, base_page_url: str, page=1
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
+        if page != -1:
+            url = f"{base_page_url}/{page}"
+        else:
+            code, max_page = await self.get_max_page(base_page_url)
+            if code != 200:
+                return code, None
+            url = f"{base_page_url}/{random.randint(1, max_page)}"
+        code, resp = await self.send_req(
+            url=url, headers=self.get_headers(), endpoint="get_ids_from_page"
+        )
+        if code != 200:
+            return code, None
+        return self._parse_ids_from_page(resp, base_page_url)
+
+    async def get_id_from_page(
+        self, base_page_url: str, page=-1
+    ) -> Union[Tuple[int, None], Tuple[int, Any]]:
+        code, ids = await self.get_ids_from_page(base_page_url, page)
+        if code != 200:
+            return code, None
+        return 200, random.choice(ids)
+
+    async def iter_ids_from_page(
+        self,
+        base_page_url: str,
+        max_pages: Union[int, None] = None,
+        concurrency=4,
+        max_page: Union[int, None] = None,
+    ) -> AsyncIterator[str]:
+        if max_page is None:
+            code, max_page = await self._max_page(base_page_url)
+            if code != 200:
+                return
+        async for id in self._iter_pages(
+            lambda page: self.get_ids_from_page(base_page_url, page),
+            self._page_range(max_page, max_pages),
+            concurrency,
+        ):
+            yield id
+
+    def iter_home_ids(
+        self, max_pages: Union[int, None] = None, concurrency=4
+    ) -> AsyncIterator[str]:
+        return self.iter_ids_from_page(
+            self.base_url + "/page", max_pages, concurrency, self.max_home_page_count
+        )
+
+    def iter_ids_by_star_name(
+        self, star_name: str, max_pages: Union[int, None] = None, concurrency=4
+    ) -> AsyncIterator[str]:
+        return self.iter_ids_from_page(
+            f"{self.base_url_search_by_star_name}/{star_name}", max_pages, concurrency
+        )
+
+    def iter_ids_by_star_id(
+        self, star_id: str, max_pages: Union[int, None] = None, concurrency=4
+    ) -> AsyncIterator[str]:
+        return self.iter_ids_from_page(
+            f"{self.base_url_search_by_star_id}/{star_id}", max_pages, concurrency
+        )
+
+    async def get_id_from_home(self, page=-1) -> Tuple[int, str]:
+        if page == -1:
+            page = random.randint(1, self.max_home_page_count)
+        return await self.get_id_from_page(
+            base_page_url=self.base_url + "/page", page=page
+        )
+
+    async def get_id_by_star_name(self, star_name: str, page=-1) -> Tuple[int, str]:
+        base_page_url = f"{self.base_url_search_by_star_name}/{star_name}"
+        code, page = await self._star_page(base_page_url, page)
+        if code != 200:
+            return code, None
+        return await self.get_id_from_page(base_page_url=base_page_url, page=page)
+
+    async def get_ids_by_star_name(self, star_name: str, page=-1) -> Tuple[int, list]:
+        base_page_url = f"{self.base_url_search_by_star_name}/{star_name}"
+        code, page = await self._star_page(base_page_url, page)
+        if code != 200:
+            return code, None
+        return await self.get_ids_from_page(base_page_url=base_page_url, page=page)
+
+    async def get_new_ids_by_star_name(
+        self, star_name: str
+    ) -> Union[Tuple[int, None], Tuple[int, Any]]:
+        code, ids = await self.get_ids_from_page(
+            base_page_url=f"{self.base_url_search_by_star_name}/{star_name}",
+            page=1,
+        )
+        if code != 200:
+            return code, None
+        return 200, ids[: self.max_new_avs_count]
+
+    async def get_id_by_star_id(self, star_id: str, page=-1) -> Tuple[int, str]:
+        base_page_url = f"{self.base_url_search_by_star_id}/{star_id}"
+        code, page = await self._star_page(base_page_url, page)
+        if code != 200:
+            return code, None
+        return await self.get_id_from_page(base_page_url=base_page_url, page=page)
+
+    async def get_new_ids_by_star_id(
+        self, star_id: str
+    ) -> Union[Tuple[int, None], Tuple[int, list]]:
+        code, ids = await self.get_ids_from_page(
+            base_page_url=f"{self.base_url_search_by_star_id}/{star_id}", page=1
+        )
+        if code != 200:
+            return code, None
+        return 200, ids[: self.max_new_avs_count]
+
+    async def get_samples_by_id(
+        self, id: str
+    ) -> Union[Tuple[int, None], Tuple[int, List[Union[str, Any]]]]:
+        code, resp = await self.send_req(
+            url=f"{self.base_url}/{id}",
+            headers=self.get_headers(),
+            endpoint="get_samples_by_id",
+        )
+        if code != 200:
+            return code, None
+        return self._parse_samples(resp, id)
+
+    async def check_star_exists(
+        self, star_name: str
+    ) -> Union[Tuple[int, None], Tuple[int, Dict[str, Union[str, Any]]]]:
+        star = self._cached_star(star_name)
+        if star.get("star_id"):
+            return 200, {"star_id": star["star_id"], "star_name": star["star_name"]}
+        code, resp = await self.send_req(
+            url=f"{self.base_url_search_star}/{star_name}",
+            headers=self.get_headers(),
+            endpoint="check_star_exists",
+        )
+        if code != 200:
+            return code, None
+        code, star = self._parse_star(resp, star_name)
+        if code == 200:
+            self._cache_star(star_name, **star)
+        return code, star
+
+    async def fuzzy_search_stars(
+        self, text
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
+        code, resp = await self.send_req(
+            url=f"{self.base_url_search_star}/{text}",
+            headers=self.get_headers(),
+            endpoint="fuzzy_search_stars",
+        )
+        if code != 200:
+            return code, None
+        return self._parse_fuzzy_stars(resp)
+
+    async def get_av_by_id(
+        self,
+        id: str,
+        is_nice: bool,
+        is_uncensored: bool,
+        magnet_max_count=10,
+    ) -> Tuple[int, any]:
+        id = id.lower()  # some IDs must be lowercase to be found on javbus
+        url = f"{self.base_url}/{id}"
+        code, resp = await self.send_req(
+            url=url, headers=self.get_headers(), endpoint="get_av_by_id"
+        )
+        if code != 200:
+            return code, None
+        av, uc, gid = self._parse_av(resp, id, url)
+        if not uc and not gid:
+            return self._export(200, av)
+        code, resp = await self.send_req(
+            **self._magnet_req(id, uc, gid), endpoint="get_av_by_id"
+        )
+        if code != 200:
+            return self._export(200, av)
+        return self._export(
+            200, self._parse_magnets(resp, av, is_nice, is_uncensored, magnet_max_count)
+        )
+
+    async def get_av_by_ids(
+        self,
+        ids: Iterable[str],
+        is_nice: bool,
+        is_uncensored: bool,
+        magnet_max_count=10,
+        concurrency=8,
+        ordered=False,
+    ) -> Dict[str, Tuple[int, any]]:
+        return {
+            id: res
+            async for id, res in self.iter_av_by_ids(
+                ids, is_nice, is_uncensored, magnet_max_count, concurrency, ordered
+            )
+        }
+
+    def iter_av_by_ids(
+        self,
+        ids: Iterable[str],
+        is_nice: bool,
+        is_uncensored: bool,
+        magnet_max_count=10,
+        concurrency=8,
+        ordered=False,
+    ) -> AsyncIterator[Tuple[str, Tuple[int, any]]]:
+        return self._iter_batch(
+            lambda id: self.get_av_by_id(
+                id, is_nice, is_uncensored, magnet_max_count
+            ),
+            ids,
+            concurrency,
+            ordered,
+        )
+
+
+class AsyncAvgleUtil(AsyncBaseUtil, AvgleUtil):
+    """Async twin of AvgleUtil"""
+
+    async def get_video_by_id(self, id: str) -> Tuple[int, any]:
+        code, resp = await self.send_req(
+            url=f"{self.base_url}/v1/jav/{id}/0?limit=3", endpoint="get_video_by_id"
+        )
+        if code != 200:
+            return code, None
+        return self._parse_video(resp)
+
+    async def get_pv_by_id(self, id: str) -> Union[Tuple[int, None], Tuple[int, str]]:
+        code, res = await self.get_video_by_id(id)
+        if code != 200:
+            return code, None
+        if res["pv"] != "":
+            return 200, res["pv"]
+        return 404, None
+
+    async def get_fv_by_id(self, id: str) -> Union[Tuple[int, None], Tuple[int, str]]:
+        code, res = await self.get_video_by_id(id)
+        if code != 200:
+            return code, None
+        if res["pv"] != "":
+            return 200, res["fv"]
+        return 404, None
+
+
+class AsyncSukebeiUtil(AsyncBaseUtil, SukebeiUtil):
+    """Async twin of SukebeiUtil"""
+
+    async def get_av_by_id(
+        self,
+        id: str,
+        is_nice: bool,
+        is_uncensored: bool,
+        magnet_max_count=10,
+    ) -> Tuple[int, any]:
+        url = self._search_url(id)
+        code, resp = await self.send_req(url=url, endpoint="get_av_by_id")
+        if code != 200:
+            return code, None
+        return self._export(
+            *self._parse_av(resp, id, url, is_nice, is_uncensored, magnet_max_count)
+        )
+
+    async def get_av_by_ids(
+        self,
+        ids: Iterable[str],
+        is_nice: bool,
+        is_uncensored: bool,
+        magnet_max_count=10,
+        concurrency=8,
+        ordered=False,
+    ) -> Dict[str, Tuple[int, any]]:
+        return {
+            id: res
+            async for id, res in self.iter_av_by_ids(
+                ids, is_nice, is_uncensored, magnet_max_count, concurrency, ordered
+            )
+        }
+
+    def iter_av_by_ids(
+        self,
+        ids: Iterable[str],
+        is_nice: bool,
+        is_uncensored: bool,
+        magnet_max_count=10,
+        concurrency=8,
+        ordered=False,
+    ) -> AsyncIterator[Tuple[str, Tuple[int, any]]]:
+        return self._iter_batch(
+            lambda id: self.get_av_by_id(
+                id, is_nice, is_uncensored, magnet_max_count
+            ),
+            ids,
+            concurrency,
+            ordered,
+        )
+
+    async def search_av_by_tag(self, tag: str) -> Tuple[int, any]:
+        code, resp = await self.send_req(
+            url=f"{self.base_url}?q={tag}", endpoint="search_av_by_tag"
+        )
+        if code != 200:
+            return code, None
+        return self._export(*self._parse_search(resp, tag))
+
+    async def get_av_by_url(self, url: str) -> Tuple[int, any]:
+        code, resp = await self.send_req(url=url, endpoint="get_av_by_url")
+        if code != 200:
+            return code, None
+        return self._parse_av_page(resp, url)
@@ -4,7 +4,6 @@ import sys
 import json
 import logging
 import argparse
-import langdetect
 import jvav
 
 PATH_ROOT = os.path.expanduser("~") + "/.jvav"
@@ -119,6 +118,28 @@ class JvavArgsParser:
             default="",
             help="Followed by a proxy server address (by default reads the value of the environment variable http_proxy)",
         )
+        # Manage the cache
+        subparsers = parser.add_subparsers(dest="command")
+        parser_cache = subparsers.add_parser(
+            "cache", help="Show stats of the cache, prune or vacuum it"
+        )
+        parser_cache.add_argument(
+            "action",
+            choices=["stats", "prune", "vacuum"],
+            help="stats: show entries and sizes, prune: drop expired entries and evict entries over the size limit, vacuum: compact the cache file",
+        )
+        parser_cache.add_argument(
+            "-max-size",
+            type=float,
+            default=0,
+            help="Followed by a size limit in MiB for prune (by default the limit of BaseUtil.cache_janitor)",
+        )
+        parser_cache.add_argument(
+            "-policy",
+            choices=["lru", "lfu"],
+            default="",
+            help="Eviction policy for prune (by default lru)",
+        )
         self.parser = parser
         self.args = None
 
@@ -128,6 +149,23 @@ class JvavArgsParser:
             return
         LOG.info(json.dumps(res, indent=4, ensure_ascii=False))
 
+    def handle_cache(self, args):
+        import requests_cache
+
+        janitor = jvav.BaseUtil.cache_janitor
+        if args.policy:
+            janitor.policy = args.policy
+        cache = requests_cache.SQLiteCache(jvav.utils.PATH_CACHE_JVAV)
+        if args.action == "prune":
+            self.handle_code(
+                200, janitor.prune(cache, max_size=int(args.max_size * 1024 * 1024))
+            )
+        elif args.action == "vacuum":
+            cache.responses.vacuum()
+            self.handle_code(200, janitor.stats(cache))
+        else:
+            self.handle_code(200, janitor.stats(cache))
+
     def parse(self):
         parser = self.parser
         self.args = parser.parse_args()
@@ -141,6 +179,9 @@ class JvavArgsParser:
         if args.version:
             print(f"jvav-{jvav.VERSION}")
             return
+        if args.command == "cache":
+            self.handle_cache(args)
+            return
         if args.proxy == "" and env_proxy:
             args.proxy = env_proxy
         if args.av1 != "":
@@ -170,6 +211,8 @@ class JvavArgsParser:
         elif args.sr != "" or args.srn != "":
             star_name = args.sr if args.sr != "" else args.srn
             flag_srn = True if args.srn != "" else False
+            import langdetect
+
             if langdetect.detect(star_name) != "ja":  # zh
                 wiki_json = jvav.WikiUtil(proxy_addr=args.proxy).get_wiki_page_by_lang(
                     topic=star_name, from_lang="zh", to_lang="ja"
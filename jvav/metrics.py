@@ -0,0 +1,268 @@
+# -*- coding: UTF-8 -*-
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Tuple, Union
+
+import urllib3
+from urllib3.connection import HTTPConnection, HTTPSConnection
+
+# timings of the request being sent by the current thread or task, see request_timing
+_timing: ContextVar[Union[dict, None]] = ContextVar("jvav_request_timing", default=None)
+
+
+class Instrumentation:
+    def __init__(self):
+        """Observer registry receiving an event dict per request and per parse
+
+        Request events:
+        {
+            'kind': 'request',
+            'provider': '',    # util class, e.g. JavBusUtil
+            'endpoint': '',    # public util method passed to send_req, e.g. get_av_by_id
+            'method': '',      # http method
+            'url': '',
+            'code': 200,       # code returned by send_req
+            'cache': '',       # hit | miss | revalidated | off
+            'queue_wait': 0.0, # seconds waiting for the rate limiter, the breaker and retry backoffs
+            'connect': 0.0,    # seconds opening connections (tcp and tls)
+            'ttfb': 0.0,       # seconds from sending to the response headers, connect included
+            'total': 0.0,      # seconds spent in send_req
+            'retries': 0,
+            'size': 0,         # body size in bytes
+        }
+
+        Parse events:
+        {
+            'kind': 'parse',
+            'provider': '',    # util class
+            'parser': '',      # parse method, e.g. _parse_av
+            'cache': '',       # hit | miss | off, see cache_parsed
+            'total': 0.0,      # seconds
+        }
+
+        Soup events, one per page parsed by BaseUtil.get_soup or BaseUtil.get_tree:
+        {
+            'kind': 'soup',
+            'engine': '',      # soup | lxml
+            'host': '',        # host of the parsed page
+            'total': 0.0,      # seconds building the tree
+            'size': 0,         # page size in bytes
+        }
+        """
+        self.observers: List[Callable[[dict], None]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.observers)
+
+    def add_observer(self, observer: Callable[[dict], None]):
+        self.observers.append(observer)
+
+    def remove_observer(self, observer: Callable[[dict], None]):
+        self.observers.remove(observer)
+
+    def emit(self, event: dict):
+        for observer in list(self.observers):
+            try:
+                observer(event)
+            except Exception as e:
+                logging.getLogger(__name__).error(
+                    f"Instrumentation: observer {observer} failed: {e}"
+                )
+
+
+class request_timing:
+    def __init__(self):
+        """Collect the timings of the request sent by the current thread or task
+
+        with request_timing() as timing:
+            session.get(url)
+        timing['connect'], timing['queue_wait'], timing['retries']
+        """
+        self.timing = {"queue_wait": 0.0, "connect": 0.0, "retries": 0}
+
+    def __enter__(self) -> dict:
+        self.token = _timing.set(self.timing)
+        return self.timing
+
+    def __exit__(self, *exc):
+        _timing.reset(self.token)
+
+
+def add_timing(name: str, value: Union[int, float]):
+    """Add to a timing of the current request, if it is measured"""
+    timing = _timing.get()
+    if timing is not None:
+        timing[name] = timing.get(name, 0) + value
+
+
+def set_timing(name: str, value):
+    """Set a timing of the current request, if it is measured"""
+    timing = _timing.get()
+    if timing is not None:
+        timing[name] = value
+
+
+async def httpx_trace(event_name: str, info: dict):
+    """httpx trace extension filling the connect and ttfb timings of the current request"""
+    timing = _timing.get()
+    if timing is None:
+        return
+    now = time.perf_counter()
+    if event_name.endswith(".started"):
+        timing[event_name] = now
+    elif event_name in (
+        "connection.connect_tcp.complete",
+        "connection.start_tls.complete",
+    ):
+        started = timing.pop(event_name.replace(".complete", ".started"), now)
+        timing["connect"] += now - started
+    elif event_name.endswith(".receive_response_headers.complete"):
+        # from the request headers being sent, the connection was opened before
+        prefix = event_name.split(".")[0]
+        sent = timing.pop(f"{prefix}.send_request_headers.started", now)
+        timing["ttfb"] = now - sent + timing["connect"]
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            add_timing("connect", time.perf_counter() - start)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            add_timing("connect", time.perf_counter() - start)
+
+
+class TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+TIMED_POOL_CLASSES = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+class MetricsCollector:
+    # upper bounds of the latency histogram buckets, in seconds
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    # request timings summed per provider and endpoint
+    REQUEST_SUMS = ("queue_wait", "connect", "ttfb", "total", "size", "retries")
+
+    def __init__(self):
+        """Observer aggregating events into counters and latency histograms
+
+        collector = MetricsCollector()
+        BaseUtil.instrumentation.add_observer(collector)
+        collector.to_prometheus()
+        """
+        self.lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str], dict] = {}
+        self.parses: Dict[Tuple[str, str], dict] = {}
+
+    def _new_series(self, counters: Tuple[str, ...]) -> dict:
+        series = {"count": 0, "buckets": [0] * len(self.BUCKETS), "by": {}}
+        for name in counters:
+            series[name] = 0
+        return series
+
+    def __call__(self, event: dict):
+        if event["kind"] == "request":
+            key = (event["provider"], event["endpoint"])
+            by = (str(event["code"]), event["cache"])
+            table, counters = self.requests, self.REQUEST_SUMS
+        elif event["kind"] == "parse":
+            key = (event["provider"], event["parser"])
+            by = ("", event["cache"])
+            table, counters = self.parses, ("total",)
+        elif event["kind"] == "soup":
+            key = (event["host"], "get_tree" if event["engine"] == "lxml" else "get_soup")
+            by = ("", "off")
+            table, counters = self.parses, ("total",)
+        else:
+            return
+        with self.lock:
+            series = table.get(key)
+            if series is None:
+                series = table[key] = self._new_series(counters)
+            series["count"] += 1
+            series["by"][by] = series["by"].get(by, 0) + 1
+            for name in counters:
+                series[name] += event[name]
+            for i, bound in enumerate(self.BUCKETS):
+                if event["total"] <= bound:
+                    series["buckets"][i] += 1
+
+    def to_json(self) -> str:
+        with self.lock:
+            data = {
+                "requests": [
+                    {"provider": p, "endpoint": e, **self._export(s)}
+                    for (p, e), s in self.requests.items()
+                ],
+                "parses": [
+                    {"provider": p, "parser": e, **self._export(s)}
+                    for (p, e), s in self.parses.items()
+                ],
+            }
+        return json.dumps(data, indent=4)
+
+    @staticmethod
+    def _export(series: dict) -> dict:
+        data = {k: v for k, v in series.items() if k not in ("buckets", "by")}
+        data["by"] = [
+            {"code": code, "cache": cache, "count": count}
+            for (code, cache), count in series["by"].items()
+        ]
+        return data
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition of the collected metrics"""
+        lines = []
+        with self.lock:
+            self._histogram(lines, "jvav_request_seconds", "endpoint", self.requests)
+            for name in self.REQUEST_SUMS:
+                if name == "total":
+                    continue
+                metric = f"jvav_request_{name}_total"
+                if name not in ("size", "retries"):
+                    metric = f"jvav_request_{name}_seconds_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (provider, endpoint), series in self.requests.items():
+                    labels = f'provider="{provider}",endpoint="{endpoint}"'
+                    lines.append(f"{metric}{{{labels}}} {series[name]}")
+            lines.append("# TYPE jvav_requests_total counter")
+            for (provider, endpoint), series in self.requests.items():
+                for (code, cache), count in series["by"].items():
+                    labels = f'provider="{provider}",endpoint="{endpoint}",code="{code}",cache="{cache}"'
+                    lines.append(f"jvav_requests_total{{{labels}}} {count}")
+            self._histogram(lines, "jvav_parse_seconds", "parser", self.parses)
+            lines.append("# TYPE jvav_parses_total counter")
+            for (provider, parser), series in self.parses.items():
+                for (_, cache), count in series["by"].items():
+                    labels = f'provider="{provider}",parser="{parser}",cache="{cache}"'
+                    lines.append(f"jvav_parses_total{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def _histogram(self, lines: list, metric: str, label: str, table: dict):
+        lines.append(f"# TYPE {metric} histogram")
+        for (provider, name), series in table.items():
+            labels = f'provider="{provider}",{label}="{name}"'
+            for bound, count in zip(self.BUCKETS, series["buckets"]):
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {series["count"]}')
+            lines.append(f"{metric}_sum{{{labels}}} {series['total']}")
+            lines.append(f"{metric}_count{{{labels}}} {series['count']}")
@@ -0,0 +1,245 @@
+# -*- coding: UTF-8 -*-
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+
+# response headers worth replaying, the others describe the original transfer
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+class Fixture:
+    def __init__(self, method: str, url: str, status: int, headers: dict, body: bytes):
+        """A recorded response
+
+        :param str method: request method
+        :param str url: requested url
+        :param int status: status code
+        :param dict headers: response headers, see KEPT_HEADERS
+        :param bytes body: response body
+        """
+        self.method = method
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class FixtureStore:
+    def __init__(self, path: str):
+        """Recorded responses in a directory, one `<hash>.json` (metadata) and `<hash>.body` per request
+
+        Fixtures are keyed by method, host, path and query: the scheme is ignored so that
+        responses recorded from https sites can be replayed by a local http server.
+
+        :param str path: directory, created if missing
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(method: str, url: str) -> str:
+        parts = urlsplit(url)
+        target = f"{parts.netloc}{parts.path or '/'}"
+        if parts.query:
+            target += f"?{parts.query}"
+        return hashlib.sha1(f"{method.upper()} {target}".encode()).hexdigest()
+
+    def save(self, fixture: Fixture):
+        name = os.path.join(self.path, self.key(fixture.method, fixture.url))
+        meta = {
+            "method": fixture.method.upper(),
+            "url": fixture.url,
+            "status": fixture.status,
+            "headers": fixture.headers,
+        }
+        with self.lock:
+            with open(f"{name}.body", "wb") as f:
+                f.write(fixture.body)
+            with open(f"{name}.json", "w") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=4)
+
+    def record(self, url: str, resp: requests.Response, params=None):
+        """Save a response received for url
+
+        :param str url: requested url
+        :param requests.Response resp: response, a requests one or a requests_cache one
+        :param dict params: query parameters sent along with url, defaults to None
+        """
+        if params:
+            url = requests.Request("GET", url, params=params).prepare().url
+        headers = {k: resp.headers[k] for k in KEPT_HEADERS if k in resp.headers}
+        method = resp.request.method if resp.request is not None else "GET"
+        self.save(Fixture(method, url, resp.status_code, headers, resp.content))
+
+    def load(self, method: str, url: str) -> Union[Fixture, None]:
+        name = os.path.join(self.path, self.key(method, url))
+        try:
+            with open(f"{name}.json") as f:
+                meta = json.load(f)
+            with open(f"{name}.body", "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        return Fixture(meta["method"], meta["url"], meta["status"], meta["headers"], body)
+
+    def __iter__(self) -> Iterator[Fixture]:
+        for file in sorted(os.listdir(self.path)):
+            if file.endswith(".json"):
+                with open(os.path.join(self.path, file)) as f:
+                    meta = json.load(f)
+                fixture = self.load(meta["method"], meta["url"])
+                if fixture:
+                    yield fixture
+
+
+class FixtureServer:
+    def __init__(
+        self,
+        store: FixtureStore,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        error_codes=(503,),
+        seed=None,
+    ):
+        """Local http stand-in replaying a FixtureStore
+
+        Every site is served under a path prefix named after its host, point a util at it
+        with `base_url=server.base_url(JavBusUtil.BASE_URL)`. Unknown requests get a 404.
+
+        :param FixtureStore store: recorded responses
+        :param str host: address to listen on, defaults to '127.0.0.1'
+        :param int port: port to listen on, defaults to a free one
+        :param float latency: seconds to wait before each answer, defaults to 0
+        :param float jitter: extra random wait of up to jitter seconds, defaults to 0
+        :param float error_rate: share of requests answered with one of error_codes, defaults to 0
+        :param tuple error_codes: injected error statuses, defaults to (503,)
+        :param int seed: seed of the latency and error injection, defaults to None
+        """
+        self.store = store
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats: Dict[str, int] = {"served": 0, "missing": 0, "errors": 0}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def base_url(self, base_url: str) -> str:
+        """The url replaying base_url, e.g. http://127.0.0.1:8000/www.javbus.com"""
+        return f"{self.url}/{urlsplit(base_url).netloc}"
+
+    def start(self) -> "FixtureServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _draw(self) -> Tuple[float, Union[int, None]]:
+        """Pick the delay and the injected error (if any) of a request"""
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            error = None
+            if self.error_rate and self.random.random() < self.error_rate:
+                error = self.random.choice(self.error_codes)
+            return delay, error
+
+    def _count(self, stat: str):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                delay, error = server._draw()
+                if delay > 0:
+                    time.sleep(delay)
+                if error is not None:
+                    server._count("errors")
+                    return self._answer(error, {"Retry-After": "0"}, b"")
+                # the path starts with the host of the replayed site
+                fixture = server.store.load(self.command, f"http:/{self.path}")
+                if fixture is None:
+                    server._count("missing")
+                    return self._answer(404, {}, b"")
+                server._count("served")
+                etag = fixture.headers.get("ETag")
+                if etag and self.headers.get("If-None-Match") == etag:
+                    return self._answer(304, {"ETag": etag}, b"")
+                self._answer(fixture.status, fixture.headers, fixture.body)
+
+            do_POST = do_GET
+
+            def _answer(self, status: int, headers: dict, body: bytes):
+                if self.command == "POST":
+                    self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded responses locally")
+    parser.add_argument("path", help="fixture directory")
+    parser.add_argument("-port", type=int, default=8000, help="port to listen on")
+    parser.add_argument("-latency", type=float, default=0, help="seconds per answer")
+    parser.add_argument("-jitter", type=float, default=0, help="extra random seconds")
+    parser.add_argument(
+        "-error-rate", type=float, default=0, help="share of answers that are errors"
+    )
+    args = parser.parse_args()
+    server = FixtureServer(
+        FixtureStore(args.path),
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+    )
+    print(f"replaying {args.path} on {server.url}/<host>")
+    server.httpd.serve_forever()
+
+
+# python -m jvav.replay ~/.jvav/fixtures -latency 0.2 -error-rate 0.05
+if __name__ == "__main__":
+    main()
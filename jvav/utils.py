@@ -1,52 +1,1273 @@
 # -*- coding: UTF-8 -*-
+import atexit
 import concurrent.futures
+import copy
+import email.utils
+import functools
+import heapq
+import itertools
+import json
 import logging
+import operator
 import random
 import re
-from typing import Tuple, Union, List, Any, Dict
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from typing import (
+    TYPE_CHECKING,
+    Tuple,
+    Union,
+    List,
+    Any,
+    Dict,
+    Callable,
+    Iterable,
+    Iterator,
+)
 
 import os
 import requests
 import requests_cache
 import unicodedata
-import wikipediaapi
-from anti_useragent import UserAgent
-from bs4 import BeautifulSoup
-from deep_translator import GoogleTranslator
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+
+from jvav.metrics import TIMED_POOL_CLASSES, Instrumentation, add_timing, request_timing
+
+# bs4, lxml, anti_useragent, wikipediaapi and deep_translator are imported on first use,
+# they make up most of the import time of jvav
+if TYPE_CHECKING:
+    import lxml.etree
+    import bs4
+    import lxml.html
+    from bs4 import BeautifulSoup
 
 PATH_ROOT = os.path.expanduser("~") + "/.jvav"
 PATH_CACHE_JVAV = f"{PATH_ROOT}/.jvav_cache"
+PATH_ID_INDEX = f"{PATH_ROOT}/.jvav_ids.sqlite"
+PATH_STAR_CACHE = f"{PATH_ROOT}/.jvav_stars.sqlite"
+# cache expiration units, in seconds
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+WEEK = 7 * DAY
 if not os.path.exists(PATH_ROOT):
     os.makedirs(PATH_ROOT)
 
 
+class TokenBucket:
+    def __init__(self, rate: float, burst=1, min_rate: float = None):
+        """Token bucket that adapts its rate to throttling (AIMD)
+
+        :param float rate: max requests per second
+        :param int burst: max requests sent back to back, defaults to 1
+        :param float min_rate: lowest rate after throttling, defaults to rate / 16
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token, return how many seconds the caller must wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def penalize(self):
+        """Halve the rate after the host throttled us"""
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def reward(self):
+        """Creep back towards the max rate after a successful request"""
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class RateLimiter:
+    # responses meaning the host wants us to slow down
+    THROTTLE_CODES = (429, 503)
+
+    def __init__(self):
+        """Per-host token buckets; hosts without a configured rate are not paced"""
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlsplit(url).netloc if "://" in url else url
+
+    def set_rate(self, base_url: str, rate: float, burst=1, min_rate: float = None):
+        """Pace all requests to a host
+
+        :param str base_url: base url or host, e.g. JavDbUtil.BASE_URL
+        :param float rate: max requests per second
+        :param int burst: max requests sent back to back, defaults to 1
+        :param float min_rate: lowest rate after throttling, defaults to rate / 16
+        """
+        self.buckets[self._host(base_url)] = TokenBucket(rate, burst, min_rate)
+
+    def remove_rate(self, base_url: str):
+        self.buckets.pop(self._host(base_url), None)
+
+    def delay(self, url: str) -> float:
+        """Take a token for url, return how many seconds to wait before sending"""
+        bucket = self.buckets.get(self._host(url))
+        return bucket.reserve() if bucket else 0
+
+    def wait(self, url: str):
+        delay = self.delay(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    def feedback(self, url: str, status_code: int):
+        """Adapt the rate of url's host to the status code it answered with"""
+        bucket = self.buckets.get(self._host(url))
+        if not bucket:
+            return
+        if status_code in self.THROTTLE_CODES:
+            bucket.penalize()
+        elif status_code < 400:
+            bucket.reward()
+
+
+class RetryPolicy:
+    # statuses worth retrying: throttling and transient server errors
+    RETRY_CODES = (429, 500, 502, 503, 504)
+    IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+
+    def __init__(self, max_retries=2, backoff_factor=0.5, max_backoff=30):
+        """Bounded exponential backoff that honours Retry-After
+
+        :param int max_retries: max retries per request, defaults to 2
+        :param float backoff_factor: first backoff in seconds, doubled on each retry, defaults to 0.5
+        :param float max_backoff: max seconds to wait before a retry; a longer Retry-After gives up, defaults to 30
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+    def retry_delay(
+        self, method: str, attempt: int, status_code: int = None, retry_after=None
+    ) -> Union[float, None]:
+        """Seconds to wait before retrying a request, or None to give up
+
+        :param str method: request method
+        :param int attempt: number of retries already made
+        :param int status_code: response status, None if the request raised
+        :param str retry_after: value of the Retry-After header, if any
+        """
+        if attempt >= self.max_retries or method.upper() not in self.IDEMPOTENT_METHODS:
+            return None
+        if status_code is not None and status_code not in self.RETRY_CODES:
+            return None
+        if retry_after:
+            delay = self.parse_retry_after(retry_after)
+            if delay is not None:
+                return delay if delay <= self.max_backoff else None
+        backoff = min(self.max_backoff, self.backoff_factor * 2**attempt)
+        return backoff * random.uniform(0.5, 1)
+
+    @staticmethod
+    def parse_retry_after(value: str) -> Union[float, None]:
+        """Parse Retry-After given either in seconds or as an HTTP date"""
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+            return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        """Per-host circuit breaker
+
+        After `failure_threshold` consecutive failures (errors or 5xx) a host is
+        considered down and requests to it fail fast. Once `reset_timeout` seconds
+        have passed a single trial request is let through; success closes the circuit.
+
+        :param int failure_threshold: consecutive failures that open the circuit, defaults to 5
+        :param float reset_timeout: seconds before a trial request, defaults to 60
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures: Dict[str, int] = {}
+        self.opened_at: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlsplit(url).netloc if "://" in url else url
+
+    def is_open(self, base_url: str) -> bool:
+        """Whether requests to a host currently fail fast, e.g. to fail over to another provider"""
+        with self.lock:
+            opened_at = self.opened_at.get(self._host(base_url))
+            return (
+                opened_at is not None
+                and time.monotonic() - opened_at < self.reset_timeout
+            )
+
+    def allow(self, url: str) -> bool:
+        host = self._host(url)
+        with self.lock:
+            opened_at = self.opened_at.get(host)
+            if opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - opened_at < self.reset_timeout:
+                return False
+            self.opened_at[host] = now  # half open: let this one request through
+            return True
+
+    def record_success(self, url: str):
+        host = self._host(url)
+        with self.lock:
+            self.failures.pop(host, None)
+            self.opened_at.pop(host, None)
+
+    def record_failure(self, url: str):
+        host = self._host(url)
+        with self.lock:
+            self.failures[host] = self.failures.get(host, 0) + 1
+            if self.failures[host] >= self.failure_threshold:
+                self.opened_at.setdefault(host, time.monotonic())
+
+    def record(self, url: str, status_code: int = None):
+        """Record the outcome of a request, status_code is None if it raised"""
+        if status_code is None or status_code >= 500:
+            self.record_failure(url)
+        else:
+            self.record_success(url)
+
+
+class PolicyAdapter(HTTPAdapter):
+    def __init__(
+        self,
+        rate_limiter: RateLimiter,
+        retry_policy: RetryPolicy,
+        circuit_breaker: CircuitBreaker,
+        *args,
+        **kwargs,
+    ):
+        """HTTPAdapter applying pacing, retries and the circuit breaker
+
+        Only requests leaving the process get here, cache hits never do.
+        """
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # connections measure how long they take to open, see request_timing
+        self.poolmanager.pool_classes_by_scheme = TIMED_POOL_CLASSES
+
+    def proxy_manager_for(self, *args, **kwargs):
+        manager = super().proxy_manager_for(*args, **kwargs)
+        manager.pool_classes_by_scheme = TIMED_POOL_CLASSES
+        return manager
+
+    def send(self, request, *args, **kwargs):
+        url = request.url
+        attempt = 0
+        while True:
+            if not self.circuit_breaker.allow(url):
+                raise CircuitOpenError(f"circuit open for {urlsplit(url).netloc}")
+            delay = self.rate_limiter.delay(url)
+            if delay > 0:
+                time.sleep(delay)
+                add_timing("queue_wait", delay)
+            try:
+                resp = super().send(request, *args, **kwargs)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ):
+                self.circuit_breaker.record(url)
+                delay = self.retry_policy.retry_delay(request.method, attempt)
+                if delay is None:
+                    raise
+            else:
+                self.rate_limiter.feedback(url, resp.status_code)
+                self.circuit_breaker.record(url, resp.status_code)
+                delay = self.retry_policy.retry_delay(
+                    request.method,
+                    attempt,
+                    resp.status_code,
+                    resp.headers.get("Retry-After"),
+                )
+                if delay is None:
+                    return resp
+                resp.close()
+            time.sleep(delay)
+            add_timing("queue_wait", delay)
+            add_timing("retries", 1)
+            attempt += 1
+
+
+class LRUCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        """Thread-safe in-memory LRU bounded by the total size of its entries
+
+        :param int max_bytes: max total size of the entries, 0 disables the cache, defaults to 64 MiB
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.items: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """Get an entry and mark it as recently used, None if absent"""
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: str, value: Any, size: int):
+        """Add an entry, evicting the least recently used ones to stay under max_bytes
+
+        :param str key: key
+        :param Any value: value
+        :param int size: size of the value in bytes
+        """
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            if size > self.max_bytes:
+                return
+            self.items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self.items.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key: str):
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters and current usage"""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "count": len(self.items),
+                "size": self.size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class CacheJanitor:
+    ACCESS_TABLE = "jvav_access"
+    POLICIES = ("lru", "lfu")
+
+    def __init__(
+        self,
+        max_size=1024 * 1024 * 1024,
+        policy="lru",
+        purge_interval=600,
+        revalidate_window=86400,
+        vacuum_ratio=0.25,
+    ):
+        """Keeps the sqlite response cache bounded
+
+        Accesses are counted in memory and written to the db on each purge. A purge
+        drops entries expired for longer than `revalidate_window` (younger ones may
+        still be revalidated with a conditional request), evicts the least recently
+        (lru) or least frequently (lfu) used entries while the cache is bigger than
+        `max_size`, and vacuums the db once a `vacuum_ratio` share of its pages are free.
+
+        :param int max_size: max total size of the cached responses in bytes, None for no limit, defaults to 1 GiB
+        :param str policy: eviction policy, 'lru' or 'lfu', defaults to 'lru'
+        :param float purge_interval: seconds between background purges, None to only purge on demand, defaults to 600
+        :param float revalidate_window: seconds expired entries are kept for revalidation, defaults to 86400
+        :param float vacuum_ratio: share of free pages that triggers a vacuum, defaults to 0.25
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"unknown eviction policy: {policy}")
+        self.max_size = max_size
+        self.policy = policy
+        self.purge_interval = purge_interval
+        self.revalidate_window = revalidate_window
+        self.vacuum_ratio = vacuum_ratio
+        self.accesses: Dict[str, List[float]] = {}
+        self.lock = threading.Lock()
+        self.started: Dict[str, threading.Thread] = {}
+
+    def touch(self, key: str):
+        """Count an access to a cache entry"""
+        now = time.time()
+        with self.lock:
+            access = self.accesses.get(key)
+            if access is None:
+                self.accesses[key] = [now, 1]
+            else:
+                access[0] = now
+                access[1] += 1
+
+    def start(self, db_path: str):
+        """Purge the cache at db_path every purge_interval seconds in a daemon thread"""
+        if not self.purge_interval:
+            return
+        with self.lock:
+            if db_path in self.started:
+                return
+            thread = threading.Thread(
+                target=self._run, args=(db_path,), name="jvav-cache-janitor", daemon=True
+            )
+            self.started[db_path] = thread
+        atexit.register(self._flush_at_exit, db_path)
+        thread.start()
+
+    def _run(self, db_path: str):
+        cache = requests_cache.SQLiteCache(db_path)
+        while True:
+            time.sleep(self.purge_interval)
+            try:
+                self.prune(cache)
+            except Exception as e:
+                logging.getLogger(__name__).error(f"CacheJanitor: failed to purge: {e}")
+
+    def _flush_at_exit(self, db_path: str):
+        try:
+            self.flush(requests_cache.SQLiteCache(db_path))
+        except Exception:
+            pass
+
+    def _init_db(self, con):
+        con.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.ACCESS_TABLE} ("
+            "key TEXT PRIMARY KEY, accessed REAL, hits INTEGER)"
+        )
+
+    def flush(self, cache: requests_cache.SQLiteCache):
+        """Write the accesses counted so far to the db"""
+        with self.lock:
+            accesses, self.accesses = self.accesses, {}
+        with cache.responses.connection(commit=True) as con:
+            self._init_db(con)
+            con.executemany(
+                f"INSERT INTO {self.ACCESS_TABLE} (key, accessed, hits) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "accessed = max(accessed, excluded.accessed), hits = hits + excluded.hits",
+                [(key, accessed, hits) for key, (accessed, hits) in accesses.items()],
+            )
+
+    def prune(self, cache: requests_cache.SQLiteCache, max_size: int = None) -> dict:
+        """Drop long expired entries, evict entries over the size limit and compact the db
+
+        :param SQLiteCache cache: cache
+        :param int max_size: size limit in bytes, defaults to self.max_size
+        :return dict: number of expired and evicted entries, whether the db was vacuumed
+        """
+        max_size = max_size or self.max_size
+        self.flush(cache)
+        table = cache.responses.table_name
+        with cache.responses.connection(commit=True) as con:
+            expired = con.execute(
+                f"DELETE FROM {table} WHERE expires <= ?",
+                (round(time.time() - self.revalidate_window),),
+            ).rowcount
+        evicted = []
+        with cache.responses.connection() as con:
+            size = con.execute(f"SELECT TOTAL(LENGTH(value)) FROM {table}").fetchone()[0]
+            if max_size and size > max_size:
+                # evict down to 90% of the limit so that purges don't run back to back
+                excess = size - max_size * 0.9
+                order = "COALESCE(a.accessed, 0)"
+                if self.policy == "lfu":
+                    order = f"COALESCE(a.hits, 0), {order}"
+                rows = con.execute(
+                    f"SELECT r.key, LENGTH(r.value) FROM {table} r "
+                    f"LEFT JOIN {self.ACCESS_TABLE} a ON a.key = r.key ORDER BY {order}"
+                )
+                for key, length in rows:
+                    if excess <= 0:
+                        break
+                    evicted.append(key)
+                    excess -= length
+                rows.close()
+        cache.responses.bulk_delete(evicted)
+        with cache.responses.connection(commit=True) as con:
+            con.execute(
+                f"DELETE FROM {self.ACCESS_TABLE} WHERE key NOT IN (SELECT key FROM {table})"
+            )
+        cache._prune_redirects()
+        vacuumed = self.fragmentation(cache) > self.vacuum_ratio
+        if vacuumed:
+            cache.responses.vacuum()
+        return {"expired": expired, "evicted": len(evicted), "vacuumed": vacuumed}
+
+    @staticmethod
+    def fragmentation(cache: requests_cache.SQLiteCache) -> float:
+        """Share of free pages in the db"""
+        with cache.responses.connection() as con:
+            pages = con.execute("PRAGMA page_count").fetchone()[0]
+            free = con.execute("PRAGMA freelist_count").fetchone()[0]
+        return free / pages if pages else 0
+
+    def stats(self, cache: requests_cache.SQLiteCache) -> dict:
+        """Entry counts and sizes of the cache"""
+        with cache.responses.connection() as con:
+            count, size = con.execute(
+                f"SELECT COUNT(key), TOTAL(LENGTH(value)) FROM {cache.responses.table_name}"
+            ).fetchone()
+        return {
+            "path": str(cache.db_path),
+            "file_size": cache.responses.size(),
+            "responses": count,
+            "expired": count - cache.count(expired=False),
+            "size": int(size),
+            "max_size": self.max_size,
+            "policy": self.policy,
+            "fragmentation": round(self.fragmentation(cache), 3),
+        }
+
+
+class TieredCache(requests_cache.SQLiteCache):
+    # rough per-response overhead of headers, url and object bookkeeping
+    RESPONSE_OVERHEAD = 1024
+
+    def __init__(
+        self,
+        db_path: str,
+        memory: LRUCache,
+        parsed: LRUCache = None,
+        janitor: CacheJanitor = None,
+        **kwargs,
+    ):
+        """SQLite response cache with an in-memory LRU tier in front of it
+
+        Reads are served from memory when possible and fall back to SQLite,
+        writes and deletions go to SQLite and invalidate the memory tier.
+
+        :param str db_path: sqlite database path
+        :param LRUCache memory: memory tier, may be shared by several caches of the same db
+        :param LRUCache parsed: results parsed from the cached responses, see cache_parsed
+        :param CacheJanitor janitor: counts accesses for eviction, defaults to None
+        """
+        super().__init__(db_path, **kwargs)
+        self.memory = memory
+        self.parsed = parsed
+        self.janitor = janitor
+
+    def get_response(self, key: str, default=None):
+        resp = self.memory.get(key)
+        if resp is None:
+            resp = super().get_response(key)
+            if resp is None:
+                return default
+            self.memory.put(key, resp, len(resp.content) + self.RESPONSE_OVERHEAD)
+        if self.janitor is not None:
+            self.janitor.touch(key)
+        return resp
+
+    def save_response(self, response, cache_key: str = None, expires=None):
+        cache_key = cache_key or self.create_key(response.request)
+        super().save_response(response, cache_key, expires)
+        self.memory.pop(cache_key)
+        if self.janitor is not None:
+            self.janitor.touch(cache_key)
+
+    def delete(self, *args, **kwargs):
+        super().delete(*args, **kwargs)
+        # deletions by condition don't tell which keys went away
+        self._clear_memory()
+
+    def clear(self):
+        super().clear()
+        self._clear_memory()
+
+    def _clear_memory(self):
+        self.memory.clear()
+        if self.parsed is not None:
+            self.parsed.clear()
+
+
+class SqliteStore:
+    # statements creating the tables, run when the db is opened
+    SCHEMA: Tuple[str, ...] = ()
+
+    def __init__(self, db_path: Union[str, None] = None):
+        """Small sqlite store shared by the threads of a process, opened on first use
+
+        Failures are logged, reads then find nothing and writes are dropped.
+
+        :param str db_path: sqlite database path, defaults to None for an in-memory store
+        """
+        self.db_path = db_path
+        self._conn = None
+        self.lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path or ":memory:", check_same_thread=False)
+            if self.db_path:
+                conn.execute("PRAGMA journal_mode=WAL")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _read(self, sql: str, params: tuple) -> Union[tuple, None]:
+        """First row of a query, None if there is none"""
+        try:
+            with self.lock:
+                return self.conn.execute(sql, params).fetchone()
+        except sqlite3.Error as e:
+            logging.getLogger(__name__).error(f"{type(self).__name__}: failed to read: {e}")
+            return None
+
+    def _read_all(self, sql: str, params: tuple) -> List[tuple]:
+        """Rows of a query, [] if it failed"""
+        try:
+            with self.lock:
+                return self.conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logging.getLogger(__name__).error(f"{type(self).__name__}: failed to read: {e}")
+            return []
+
+    def _write(self, sql: str, rows: List[tuple]):
+        try:
+            with self.lock:
+                self.conn.executemany(sql, rows)
+                self.conn.commit()
+        except sqlite3.Error as e:
+            logging.getLogger(__name__).error(f"{type(self).__name__}: failed to write: {e}")
+
+
+class IdIndex(SqliteStore):
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS ids (id TEXT PRIMARY KEY, internal_id TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ids_internal_id ON ids (internal_id)",
+    )
+
+    def __init__(self, db_path: Union[str, None] = None):
+        """Persistent public id <-> site internal id index, e.g. IPX-365 <-> a1b2
+
+        Public ids are stored upper case.
+
+        :param str db_path: sqlite database path, defaults to None for an in-memory index
+        """
+        super().__init__(db_path)
+
+    def get(self, id: str) -> Union[str, None]:
+        """Internal id of a public id, None if unknown"""
+        row = self._read("SELECT internal_id FROM ids WHERE id = ?", (id.upper(),))
+        return row[0] if row else None
+
+    def get_id(self, internal_id: str) -> Union[str, None]:
+        """Public id of an internal id, None if unknown"""
+        row = self._read("SELECT id FROM ids WHERE internal_id = ?", (internal_id,))
+        return row[0] if row else None
+
+    def put_many(self, pairs: Iterable[Tuple[str, str]]):
+        """Add or update (public id, internal id) pairs, the empty ones are skipped"""
+        rows = [(id.upper(), internal_id) for id, internal_id in pairs if id and internal_id]
+        if rows:
+            self._write("INSERT OR REPLACE INTO ids (id, internal_id) VALUES (?, ?)", rows)
+
+    def __len__(self) -> int:
+        row = self._read("SELECT COUNT(*) FROM ids", ())
+        return row[0] if row else 0
+
+
+class StarCache(SqliteStore):
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS star_fields (site TEXT, name TEXT, field TEXT, value TEXT, "
+        "updated REAL, PRIMARY KEY (site, name, field))",
+        "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, max_page INTEGER, updated REAL)",
+    )
+    STAR_FIELDS = ("url", "star_id", "star_name")
+
+    def __init__(self, db_path: Union[str, None] = None, expire_after=WEEK, page_expire_after=DAY):
+        """Persistent cache of star name -> star page url / star id and of page counts
+
+        Star lookups skip the star search and the first page of the AV list while fresh.
+        Each field of a star expires on its own, counted from when it was stored.
+
+        :param str db_path: sqlite database path, defaults to None for an in-memory cache
+        :param float expire_after: seconds a star field is kept, defaults to a week
+        :param float page_expire_after: seconds a page count is kept, defaults to a day
+        """
+        super().__init__(db_path)
+        self.expire_after = expire_after
+        self.page_expire_after = page_expire_after
+
+    def get_star(self, site: str, name: str) -> Union[Dict[str, str], None]:
+        """Star of a name on a site, None if none of its fields is known and fresh
+
+        :return dict: {'url': '', 'star_id': '', 'star_name': ''}, None for the fields
+            never stored or expired
+        """
+        rows = self._read_all(
+            "SELECT field, value FROM star_fields WHERE site = ? AND name = ? AND updated > ?",
+            (site, name, time.time() - self.expire_after),
+        )
+        if not rows:
+            return None
+        star = dict.fromkeys(self.STAR_FIELDS)
+        star.update(rows)
+        return star
+
+    def put_star(self, site: str, name: str, **fields: str):
+        """Store fields (url, star_id, star_name) of a star, keeping the other ones
+
+        Only the fields stored are refreshed, the other ones keep their own expiration.
+        """
+        now = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO star_fields (site, name, field, value, updated) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (site, name, field, fields[field], now)
+                for field in self.STAR_FIELDS
+                if field in fields
+            ],
+        )
+
+    def get_max_page(self, url: str) -> Union[int, None]:
+        """Page count of an AV list, None if unknown or expired"""
+        row = self._read(
+            "SELECT max_page FROM pages WHERE url = ? AND updated > ?",
+            (url, time.time() - self.page_expire_after),
+        )
+        return row[0] if row else None
+
+    def put_max_page(self, url: str, max_page: int):
+        self._write(
+            "INSERT OR REPLACE INTO pages (url, max_page, updated) VALUES (?, ?, ?)",
+            [(url, max_page, time.time())],
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def compile_xpath(path: str) -> "lxml.etree.XPath":
+    """Compile an xpath once, see BaseUtil.get_tree"""
+    import lxml.etree
+
+    return lxml.etree.XPath(path)
+
+
+def has_class(name: str) -> str:
+    """Xpath predicate matching the tags of class name, like find_all(class_=name)"""
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+def cache_parsed(parse: Callable) -> Callable:
+    """Memoize a `_parse_*` method on the cached response it parses
+
+    Results are keyed by the parser, its arguments, the response cache key and the
+    page content, so a page refreshed with new content is parsed again. The hash
+    of the content is computed once per bytes object, memory tier hits reuse it.
+    Responses not stored in the response cache and unhashable arguments bypass it.
+    Callers get a copy of the result, they are free to modify it.
+    """
+    name = parse.__qualname__
+
+    def memoized(self, resp, *args, **kwargs) -> Tuple[Any, str]:
+        cache_key = getattr(resp, "cache_key", None)
+        if not cache_key or not self.parsed_cache.max_bytes:
+            return parse(self, resp, *args, **kwargs), "off"
+        content = resp.content
+        key = (name, cache_key, len(content), hash(content), args)
+        if kwargs:
+            key += tuple(sorted(kwargs.items()))
+        try:
+            hash(key)
+        except TypeError:
+            return parse(self, resp, *args, **kwargs), "off"
+        result = self.parsed_cache.get(key)
+        if result is None:
+            result = parse(self, resp, *args, **kwargs)
+            self.parsed_cache.put(key, copy.deepcopy(result), len(repr(result)))
+            return result, "miss"
+        return copy.deepcopy(result), "hit"
+
+    @functools.wraps(parse)
+    def wrapper(self, resp, *args, **kwargs):
+        if not self.instrumentation.enabled:
+            return memoized(self, resp, *args, **kwargs)[0]
+        start = time.perf_counter()
+        result, cache = memoized(self, resp, *args, **kwargs)
+        self.instrumentation.emit(
+            {
+                "kind": "parse",
+                "provider": type(self).__name__,
+                "parser": parse.__name__,
+                "cache": cache,
+                "total": time.perf_counter() - start,
+            }
+        )
+        return result
+
+    return wrapper
+
+
+class UserAgentPool:
+    # platform: (platform of anti_useragent.UserAgent, attribute generating a user agent)
+    PLATFORMS: Dict[str, Tuple[Union[str, None], str]] = {
+        "any": (None, "random"),
+        "desktop": ("windows", "random"),
+        "mobile": (None, "android"),
+    }
+
+    def __init__(self, size=64):
+        """User agents generated once per platform, then picked at random
+
+        Pinned user agents stay the same for a key, e.g. a host, so that the sites see
+        one consistent client and responses varying by user agent stay cacheable.
+
+        :param int size: user agents generated per platform, defaults to 64
+        """
+        self.size = size
+        self.pools: Dict[str, List[str]] = {}
+        self.pinned: Dict[Tuple[str, str], str] = {}
+        self.lock = threading.Lock()
+
+    def pool(self, platform: str) -> List[str]:
+        pool = self.pools.get(platform)
+        if pool is None:
+            with self.lock:
+                pool = self.pools.get(platform)
+                if pool is None:
+                    from anti_useragent import UserAgent
+
+                    ua_platform, attr = self.PLATFORMS[platform]
+                    ua = UserAgent(platform=ua_platform)
+                    pool = [getattr(ua, attr) for _ in range(self.size)]
+                    self.pools[platform] = pool
+        return pool
+
+    def get(self, platform="any") -> str:
+        """A random user agent of platform: any, desktop or mobile"""
+        return random.choice(self.pool(platform))
+
+    def pin(self, platform="any", key="") -> str:
+        """The user agent of platform pinned to key, picked on first use"""
+        ua = self.pinned.get((platform, key))
+        if ua is None:
+            ua = self.pinned.setdefault((platform, key), self.get(platform))
+        return ua
+
+
+class Record(Mapping):
+    """Slotted result record, read like the dict returned by the utils
+
+    av.title and av["title"] are the same field, to_dict() builds the dict itself.
+    Records are not read-only: fields are plain attributes set with av.title = ...,
+    only item assignment (av["title"] = ...) is not supported.
+    """
+
+    __slots__ = ()
+    # keys of the dict, in order
+    FIELDS: Tuple[str, ...] = ()
+    # fields left out of the dict while None
+    OPTIONAL: Tuple[str, ...] = ()
+    # default of the fields not given, lists are new per record
+    DEFAULTS: Dict[str, Any] = {}
+
+    def __init__(self, **fields):
+        for name in self.FIELDS:
+            if name in fields:
+                value = fields.pop(name)
+            else:
+                value = self.DEFAULTS.get(name)
+                if isinstance(value, list):
+                    value = []
+            setattr(self, name, value)
+        if fields:
+            raise TypeError(f"{type(self).__name__}: unknown fields {list(fields)}")
+
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS or (key in self.OPTIONAL and getattr(self, key) is None):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        for name in self.FIELDS:
+            if name not in self.OPTIONAL or getattr(self, name) is not None:
+                yield name
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> dict:
+        """The dict returned by the utils, nested records included"""
+        res = {}
+        for name in self.FIELDS:
+            value = getattr(self, name)
+            if value is None and name in self.OPTIONAL:
+                continue
+            if isinstance(value, list):
+                value = [v.to_dict() if isinstance(v, Record) else v for v in value]
+            res[name] = value
+        return res
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, **kwargs)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()})"
+
+
+class Star(Record):
+    __slots__ = ("name", "id", "sex")
+    FIELDS = ("name", "id", "sex")
+    # only javdb knows the sex of the actors
+    OPTIONAL = ("sex",)
+
+    def __init__(self, name="", id="", sex=None):
+        """An actor of an AV
+
+        :param str name: actor name, defaults to ''
+        :param str id: actor id, defaults to ''
+        :param str sex: '女' | '男', defaults to None when unknown
+        """
+        self.name = name
+        self.id = id
+        self.sex = sex
+
+
+class AV(Record):
+    __slots__ = ("id", "title", "img", "date", "tags", "stars", "magnets", "url")
+    FIELDS = ("id", "title", "img", "date", "tags", "stars", "magnets", "url")
+    DEFAULTS = {
+        "id": "",
+        "title": "",
+        "img": "",
+        "date": "",
+        "tags": [],
+        "stars": [],
+        "magnets": [],
+        "url": "",
+    }
+
+
+class JavDbAV(AV):
+    __slots__ = ("title_cn", "duration", "producer", "publisher", "series", "score")
+    FIELDS = (
+        "id",
+        "date",
+        "img",
+        "title",
+        "title_cn",
+        "duration",
+        "producer",
+        "publisher",
+        "series",
+        "score",
+        "tags",
+        "stars",
+        "magnets",
+        "url",
+    )
+    DEFAULTS = {
+        **AV.DEFAULTS,
+        "title_cn": "",
+        "duration": "",
+        "producer": "",
+        "publisher": "",
+        "series": "",
+        "score": "",
+    }
+
+
+class RatedAV(Record):
+    """An AV of a rated list: {rate, id}, rate is None when the site shows none"""
+
+    __slots__ = ("rate", "id")
+    FIELDS = ("rate", "id")
+
+
+class Listing(Record):
+    """A search result: {title, loc}"""
+
+    __slots__ = ("title", "loc")
+    FIELDS = ("title", "loc")
+
+
 class BaseUtil:
-    def __init__(self, proxy_addr="", use_cache=True, expire_after=3600):
+    # shared by every util in the process, e.g.
+    # BaseUtil.rate_limiter.set_rate(JavDbUtil.BASE_URL, rate=2, burst=4)
+    rate_limiter = RateLimiter()
+    circuit_breaker = CircuitBreaker()
+    # memory tier of the response cache, see BaseUtil.memory_cache.stats()
+    memory_cache = LRUCache()
+    # results parsed from cached responses, see cache_parsed
+    parsed_cache = LRUCache(16 * 1024 * 1024)
+    # size limit and background purging of the sqlite cache
+    cache_janitor = CacheJanitor()
+    # a jvav.replay.FixtureStore recording every successful response, e.g. for replay
+    recorder = None
+    # 'lxml': parsers having compiled xpath selectors use them, see get_tree
+    # 'soup': every parser uses BeautifulSoup
+    parse_engine = "lxml"
+    # user agents of the requests, see ua()
+    ua_pool = UserAgentPool()
+    # observers of per request and per parse timings, see jvav.metrics
+    instrumentation = Instrumentation()
+    # star pages, ids and page counts of star AV lists, used by the utils having use_cache
+    star_cache = StarCache(PATH_STAR_CACHE)
+    METHODS = {0: "GET", 1: "POST", 2: "DELETE", 3: "PUT"}
+    # cache expiration per endpoint: {regex matched right after base_url: seconds},
+    # first match wins, urls matching no rule use expire_after
+    URLS_EXPIRE_AFTER: Dict[str, int] = {}
+
+    def __init__(
+        self,
+        proxy_addr="",
+        use_cache=True,
+        expire_after=3600,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_sizes=None,
+        max_retries=2,
+        backoff_factor=0.5,
+        max_backoff=30,
+        urls_expire_after=None,
+        pin_ua="",
+        records=False,
+    ):
+        """Initialize
+
+        :param str proxy_addr: proxy address, defaults to ''
+        :param bool use_cache: whether to use cache, defaults to True
+        :param int expire_after: cache expiration in seconds for urls matching no rule, defaults to 3600
+        :param int pool_connections: number of hosts to keep connection pools for, defaults to 10
+        :param int pool_maxsize: max connections kept alive per host, defaults to 10
+        :param dict pool_sizes: per-host max connections, e.g. {'www.javbus.com': 20}, defaults to None
+        :param int max_retries: retries for connection errors, 429 and 5xx, defaults to 2
+        :param float backoff_factor: first retry backoff in seconds, defaults to 0.5
+        :param float max_backoff: max seconds to wait before a retry, defaults to 30
+        :param dict urls_expire_after: cache expiration per url glob or regex, e.g. {'javdb.com/v/': 86400},
+            checked before the URLS_EXPIRE_AFTER rules of the provider, defaults to None
+        :param str pin_ua: keep the same user agent per 'host' (shared by all utils) or per 'session'
+            (this util), defaults to '' which picks a random one per request
+        :param bool records: return AVs, stars and list items as slotted records (AV, Star,
+            RatedAV, Listing) instead of dicts, they are read like the dicts and cost a fraction of their memory,
+            defaults to False
+        """
         self.log = logging.getLogger(__name__)
         self.proxy_addr = proxy_addr
         self.use_cache = use_cache
         self.proxy_json = None
         self.expire_after = expire_after
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_sizes = pool_sizes or {}
+        self.retry_policy = RetryPolicy(max_retries, backoff_factor, max_backoff)
+        self.urls_expire_after = urls_expire_after or {}
+        self._expire_rules = None
+        self._session = None
+        self._session_lock = threading.Lock()
+        self.pin_ua = pin_ua
+        self._session_uas: Dict[str, str] = {}
+        self.records = records
         if self.proxy_addr != "":
             self.proxy_json = {"http": proxy_addr, "https": proxy_addr}
 
-    @staticmethod
-    def ua_mobile() -> str:
-        return UserAgent().android
+    def _cached_star(self, name: str) -> Dict[str, str]:
+        """Star of a name on this site from the star cache, {} if unknown"""
+        if not self.use_cache:
+            return {}
+        return self.star_cache.get_star(self.base_url, name) or {}
 
-    @staticmethod
-    def ua_desktop() -> str:
-        return UserAgent(platform="windows").random
+    def _cache_star(self, name: str, **fields: str):
+        if self.use_cache:
+            self.star_cache.put_star(self.base_url, name, **fields)
 
-    @staticmethod
-    def ua() -> str:
-        return UserAgent().random
+    def _star_page(self, base_page_url: str, page: int) -> Tuple[int, Union[int, None]]:
+        """Page of the AV list of a star to fetch, a random one for -1
+
+        The page count of the list is kept in the star cache.
+
+        :param str base_page_url: first page of the AV list
+        :param int page: page, -1 for a random one
+        :return tuple[int, int]: status code and page
+        """
+        if page != -1:
+            return 200, page
+        code, max_page = self._max_page(base_page_url)
+        if code != 200:
+            return code, None
+        return 200, random.randint(1, max_page)
+
+    def _max_page(self, base_page_url: str) -> Tuple[int, Union[int, None]]:
+        """Page count of an AV list from get_max_page, kept in the star cache
+
+        :param str base_page_url: first page of the AV list
+        :return tuple[int, int]: status code and page count
+        """
+        max_page = self.star_cache.get_max_page(base_page_url) if self.use_cache else None
+        if max_page:
+            return 200, max_page
+        code, max_page = self.get_max_page(base_page_url)
+        if code == 200 and self.use_cache:
+            self.star_cache.put_max_page(base_page_url, max_page)
+        return code, max_page
+
+    def _export(self, code: int, result) -> Tuple[int, Any]:
+        """Public result of a parser building records: their dicts unless self.records
+
+        :param int code: status code
+        :param any result: record, list of records or None
+        :return tuple[int, any]: status code and result
+        """
+        if self.records or result is None:
+            return code, result
+        if isinstance(result, list):
+            return code, [record.to_dict() for record in result]
+        return code, result.to_dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def session(self) -> requests.Session:
+        """The session shared by all requests of this util, created on first use"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._new_session()
+        return self._session
+
+    def _new_session(self) -> requests.Session:
+        if self.use_cache:
+            session = requests_cache.CachedSession(
+                backend=TieredCache(
+                    PATH_CACHE_JVAV,
+                    memory=self.memory_cache,
+                    parsed=self.parsed_cache,
+                    janitor=self.cache_janitor,
+                ),
+                expire_after=self.expire_after,
+                urls_expire_after=self.expire_rules,
+            )
+            self.cache_janitor.start(PATH_CACHE_JVAV)
+        else:
+            session = requests.Session()
+        adapter = self._new_adapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        for host, size in self.pool_sizes.items():
+            host_adapter = self._new_adapter(pool_connections=1, pool_maxsize=size)
+            if "://" in host:
+                session.mount(host, host_adapter)
+            else:
+                session.mount(f"http://{host}", host_adapter)
+                session.mount(f"https://{host}", host_adapter)
+        return session
+
+    @property
+    def expire_rules(self) -> dict:
+        """Url pattern -> cache expiration, the user rules then the provider ones"""
+        if self._expire_rules is None:
+            base_url = re.escape(getattr(self, "base_url", ""))
+            rules = dict(self.urls_expire_after)
+            for pattern, expire_after in self.URLS_EXPIRE_AFTER.items():
+                rules[re.compile(f"^{base_url}{pattern}")] = expire_after
+            self._expire_rules = rules
+        return self._expire_rules
+
+    def get_expire_after(self, url: str) -> int:
+        """Cache expiration of url: the first matching rule, else expire_after"""
+        expire_after = requests_cache.get_url_expiration(url, self.expire_rules)
+        return self.expire_after if expire_after is None else expire_after
+
+    def _new_adapter(self, **kwargs) -> HTTPAdapter:
+        return PolicyAdapter(
+            self.rate_limiter, self.retry_policy, self.circuit_breaker, **kwargs
+        )
+
+    def close(self):
+        """Close the session, releasing pooled connections and the cache handle"""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    @classmethod
+    def ua_mobile(cls) -> str:
+        return cls.ua_pool.get("mobile")
+
+    @classmethod
+    def ua_desktop(cls) -> str:
+        return cls.ua_pool.get("desktop")
+
+    @classmethod
+    def ua(cls) -> str:
+        return cls.ua_pool.get("any")
+
+    def _ua(self, platform="any", url="") -> str:
+        """A user agent from BaseUtil.ua_pool for the requests of this util, see pin_ua
+
+        :param str platform: any, desktop or mobile, defaults to 'any'
+        :param str url: requested url, its host is the pinning key, defaults to the provider site
+        :return str: user agent
+        """
+        if not self.pin_ua:
+            return self.ua_pool.get(platform)
+        if self.pin_ua == "session":
+            ua = self._session_uas.get(platform)
+            if ua is None:
+                ua = self._session_uas.setdefault(platform, self.ua_pool.get(platform))
+            return ua
+        host = urlsplit(url or getattr(self, "base_url", "")).netloc
+        return self.ua_pool.pin(platform, host)
 
     def _inner_send_req(
         self, url: str, session, headers=None, m=0, **args
     ) -> Union[Tuple[int, None], Tuple[int, Any]]:
         if not headers:
-            headers = {"user-agent": self.ua()}
+            headers = {"user-agent": self._ua(url=url)}
         try:
             methods = {
                 0: session.get,
@@ -61,42 +1282,231 @@ class BaseUtil:
                     )
                 else:
                     resp = methods[m](url, headers=headers, **args)
-                if resp.status_code != 200:
-                    return 404, None
-                return 200, resp
+                return self._map_status(url, resp)
             else:
                 return 502, None
         except Exception as e:
             self.log.error(f"BaseUtil: failed to access {url}: {e}")
             return 502, None
 
+    def _map_status(self, url: str, resp) -> Union[Tuple[int, None], Tuple[int, Any]]:
+        """Map the real response status onto the 200/404/502 codes of send_req"""
+        if resp.status_code == 200:
+            return 200, resp
+        if resp.status_code in RetryPolicy.RETRY_CODES or resp.status_code >= 500:
+            self.log.warning(f"BaseUtil: {url} answered {resp.status_code}")
+            return 502, None
+        self.log.debug(f"BaseUtil: {url} answered {resp.status_code}")
+        return 404, None
+
     def send_req(
-        self, url: str, headers=None, m=0, **args
+        self, url: str, headers=None, m=0, endpoint="", **args
     ) -> Tuple[int, requests.Response]:
         """send request
 
         :param str url: url
         :param dict headers: headers, random headers by default
         :param int m: request method, default: get(0), others: post(1), delete(2), put(3)
+        :param str endpoint: public util method sending the request, reported to the
+            instrumentation observers, defaults to ''
         :param dict args: othre request parameters
         :return tuple[int, requests.Response] status code and response
         About status code:
         200: success
-        404: not found
-        502: bad gateway
+        404: not found (or another 4xx answer)
+        502: bad gateway (connection error, throttling or 5xx after retries, or host circuit open)
         """
-        if self.use_cache:
-            with requests_cache.CachedSession(
-                cache_name=PATH_CACHE_JVAV, expire_after=self.expire_after
-            ) as session:
-                return self._inner_send_req(url, session, headers, m, **args)
+        if self.instrumentation.enabled:
+            start = time.perf_counter()
+            with request_timing() as timing:
+                code, resp = self._inner_send_req(
+                    url, self.session, headers, m, **args
+                )
+            self._emit_request(
+                endpoint, url, m, code, resp, timing, time.perf_counter() - start
+            )
         else:
-            with requests.Session() as session:
-                return self._inner_send_req(url, session, headers, m, **args)
+            code, resp = self._inner_send_req(url, self.session, headers, m, **args)
+        if code == 200 and self.recorder is not None:
+            self.recorder.record(url, resp, args.get("params"))
+        return code, resp
+
+    def _emit_request(
+        self,
+        endpoint: str,
+        url: str,
+        m: int,
+        code: int,
+        resp,
+        timing: dict,
+        total: float,
+    ):
+        cache = "off"
+        if self.use_cache and m == 0:
+            cache = timing.get("cache", "miss")
+            if "cache" not in timing and getattr(resp, "from_cache", False):
+                cache = "revalidated" if getattr(resp, "revalidated", False) else "hit"
+        if "ttfb" in timing:  # measured by the async client
+            ttfb = timing["ttfb"]
+        elif cache == "hit" or resp is None:
+            ttfb = 0.0
+        elif cache == "revalidated":
+            ttfb = total - timing["queue_wait"]
+        else:
+            ttfb = resp.elapsed.total_seconds() - timing["queue_wait"]
+        self.instrumentation.emit(
+            {
+                "kind": "request",
+                "provider": type(self).__name__,
+                "endpoint": endpoint,
+                "method": self.METHODS.get(m, ""),
+                "url": url,
+                "code": code,
+                "cache": cache,
+                "queue_wait": timing["queue_wait"],
+                "connect": timing["connect"],
+                "ttfb": max(0.0, ttfb),
+                "total": total,
+                "retries": timing["retries"],
+                "size": len(resp.content) if resp is not None else 0,
+            }
+        )
+
+    def _iter_batch(
+        self,
+        fn: Callable[[str], Tuple[int, Any]],
+        ids: Iterable[str],
+        concurrency=8,
+        ordered=False,
+    ) -> Iterator[Tuple[str, Tuple[int, Any]]]:
+        """Run a lookup over many ids on a thread pool
+
+        At most `concurrency` lookups run at once and only a small window of ids is
+        queued ahead, so `ids` may be a lazy iterable of any length.
+
+        :param fn: lookup taking one id and returning (status code, result)
+        :param ids: ids to look up
+        :param int concurrency: number of worker threads, defaults to 8
+        :param bool ordered: yield results in input order instead of completion order
+        :return iterator of (id, (status code, result))
+        """
+        ids = iter(ids)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+        pending = {}  # future -> id, in submission order
+        try:
+            for id in itertools.islice(ids, concurrency * 2):
+                pending[executor.submit(fn, id)] = id
+            while pending:
+                if ordered:
+                    done = [next(iter(pending))]
+                else:
+                    done, _ = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                for future in done:
+                    id = pending.pop(future)
+                    for next_id in itertools.islice(ids, 1):
+                        pending[executor.submit(fn, next_id)] = next_id
+                    try:
+                        res = future.result()
+                    except Exception as e:
+                        self.log.error(f"BaseUtil: failed to look up {id}: {e}")
+                        res = (502, None)
+                    yield id, res
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _iter_pages(
+        self,
+        fetch: Callable[[int], Tuple[int, Union[list, None]]],
+        pages: Iterable[int],
+        concurrency=4,
+    ) -> Iterator[Any]:
+        """Yield the items of list pages, the pages being fetched concurrently
+
+        Pages are requested `concurrency` at a time with a small read-ahead window
+        (see _iter_batch) and their items are yielded in page order as soon as
+        they arrive. The first page answering 404 ends the list, pages failing
+        otherwise are skipped. Closing the iterator cancels the queued pages.
+
+        :param fetch: lookup of a page number returning (status code, items)
+        :param pages: page numbers, in order
+        :param int concurrency: pages requested at once, defaults to 4
+        :return iterator of the items
+        """
+        for page, (code, items) in self._iter_batch(
+            fetch, pages, concurrency, ordered=True
+        ):
+            if code == 404:
+                return
+            if code != 200:
+                self.log.error(f"BaseUtil: failed to get page {page}: {code}")
+                continue
+            yield from items
+
+    def _page_range(self, max_page: int, max_pages: Union[int, None]) -> range:
+        """Pages 1 to max_page, at most max_pages of them"""
+        if max_pages is not None:
+            max_page = min(max_page, max_pages)
+        return range(1, max_page + 1)
+
+    @staticmethod
+    def get_soup(resp: requests.Response, parse_only=None) -> "BeautifulSoup":
+        """Parse a page with BeautifulSoup
+
+        :param requests.Response resp: page
+        :param bs4.SoupStrainer parse_only: only keep the matching tags and their subtrees, defaults to None
+        :return BeautifulSoup: soup
+        """
+        from bs4 import BeautifulSoup
+
+        if not BaseUtil.instrumentation.enabled:
+            return BeautifulSoup(resp.text, "lxml", parse_only=parse_only)
+        start = time.perf_counter()
+        soup = BeautifulSoup(resp.text, "lxml", parse_only=parse_only)
+        BaseUtil._emit_tree(resp, "soup", start)
+        return soup
+
+    @staticmethod
+    def get_tree(resp: requests.Response) -> Union["lxml.html.HtmlElement", None]:
+        """Parse a page with lxml, for the parsers having compiled xpath selectors
+
+        :param requests.Response resp: page
+        :return lxml.html.HtmlElement: root of the page, None if lxml cannot parse it
+            or BaseUtil.parse_engine is 'soup', then parsers fall back to get_soup
+        """
+        if BaseUtil.parse_engine != "lxml":
+            return None
+        import lxml.html
+
+        start = time.perf_counter()
+        try:
+            tree = lxml.html.document_fromstring(resp.text)
+        except Exception:  # empty page, encoding declaration in a str...
+            return None
+        if BaseUtil.instrumentation.enabled:
+            BaseUtil._emit_tree(resp, "lxml", start)
+        return tree
+
+    @staticmethod
+    def _emit_tree(resp: requests.Response, engine: str, start: float):
+        BaseUtil.instrumentation.emit(
+            {
+                "kind": "soup",
+                "engine": engine,
+                "host": urlsplit(resp.url or "").netloc,
+                "total": time.perf_counter() - start,
+                "size": len(resp.content),
+            }
+        )
 
     @staticmethod
-    def get_soup(resp: requests.Response) -> BeautifulSoup:
-        return BeautifulSoup(resp.text, "lxml")
+    def _strainer(class_: str) -> "bs4.SoupStrainer":
+        """Restrict get_soup to the tags of class class_ and their subtrees"""
+        from bs4 import SoupStrainer
+
+        # while straining, the class attribute is not split into its classes yet
+        return SoupStrainer(class_=lambda value: bool(value) and class_ in value.split())
 
     @staticmethod
     def write_html(resp: requests.Response):
@@ -107,27 +1517,76 @@ class BaseUtil:
 class RankUtil(BaseUtil):
     BASE_URL_AV_RANK = "https://gist.githubusercontent.com/jinjier/7a405fad753f996d85ed43073e3bf009/raw/29bf7a4635c1283a1415aad9fb335f92ece2972b/250.csv"
     BASE_URL_STAR_RANK = ""  # DmmUtil supports
+    # the gist url is pinned to a commit, its content never changes
+    URLS_EXPIRE_AFTER = {re.escape(BASE_URL_AV_RANK): WEEK}
 
     def random_get_av_from_rank(self) -> Tuple[int, str]:
-        code, resp = self.send_req(self.BASE_URL_AV_RANK)
+        code, resp = self.send_req(
+            self.BASE_URL_AV_RANK, endpoint="random_get_av_from_rank"
+        )
         if code != 200:
             return code, None
-        lines = str(resp.text).splitlines()
-        id = lines[random.randint(0, len(lines) - 1)].split(",")[1]
-        return 200, id
+        return 200, random.choice(self._parse_av_rank(resp))
 
     def get_av_250_rank(self) -> Tuple[int, list]:
-        code, resp = self.send_req(self.BASE_URL_AV_RANK)
+        code, resp = self.send_req(self.BASE_URL_AV_RANK, endpoint="get_av_250_rank")
         if code != 200:
             return code, None
+        return 200, self._parse_av_rank(resp)
+
+    @staticmethod
+    def _parse_av_rank(resp: requests.Response) -> list:
         lines = str(resp.text).splitlines()
-        return 200, [line.split(",")[1] for line in lines]
+        return [line.split(",")[1] for line in lines]
 
 
 class JavDbUtil(BaseUtil):
     BASE_URL = "https://javdb.com"
     BASE_PARAM_NICE_AVS_OF_STAR = "?sort_type=1"
     PAT_SCORE = re.compile(r"(\d+\.?\d+)分")
+    URLS_EXPIRE_AFTER = {
+        r"/?(\?(vft|page)=|$)": 10 * MINUTE,  # home and newest
+        r"/search\?f=actor&": WEEK,  # star search
+        r"/search\?": DAY,  # id and tag search
+        r"/v/": 6 * HOUR,  # av page, holds the magnets too
+        r"/actors/.+\?sort_type=": DAY,  # star's nice avs
+        r"/actors/": HOUR,  # star's avs
+    }
+    # metadata of an AV page, one panel block per field: the first alternative found
+    # in the text of a block names the field (av key) and captures its value
+    PAT_META = re.compile(
+        r"(?=.*?番號: (?P<id>.+))"
+        r"|(?=.*?日期: (?P<date>.+))"
+        r"|(?=.*?(?P<duration>\d+)分鍾)"
+        r"|(?=.*?片商: (?P<producer>.+))"
+        r"|(?=.*?發行: (?P<publisher>.+))"
+        r"|(?=.*?系列: (?P<series>.+))"
+        r"|(?=.*?類別: (?P<tags>.+))"
+        r"|(?=.*?評分: +(?P<score>\d+\.*\d*)分.)"
+        r"|(?=.*?(?P<stars>演員:.))"
+    )
+    # av key: value of the field from the captured text, stars are read from the tags
+    META_EXTRACTORS: Dict[str, Callable[[str], Any]] = {
+        "id": str.strip,
+        "date": str.strip,
+        "duration": int,
+        "producer": str.strip,
+        "publisher": str.strip,
+        "series": str.strip,
+        "tags": lambda value: value.split(", "),
+        "score": str.strip,
+    }
+    # removed from the text of panel blocks before matching
+    BLANKS = str.maketrans("", "", "\n ")
+    # selectors of the lxml parse paths, see BaseUtil.get_tree
+    XPATH_ITEMS = f"//*[{has_class('item')}]"
+    XPATH_ITEM_TITLE = f"(.//*[{has_class('video-title')}])[1]/descendant::strong[1]"
+    XPATH_ITEM_LINK = "(.//a)[1]"
+    # parts of a bundle, see get_bundle_by_id
+    BUNDLE_FIELDS = ("av", "cover", "pv", "samples")
+    # id -> javdb id of every item seen on search and list pages, lookups by id skip
+    # the search request when the id is known, used by the utils having use_cache
+    id_index = IdIndex(PATH_ID_INDEX)
 
     def __init__(
         self,
@@ -136,6 +1595,7 @@ class JavDbUtil(BaseUtil):
         max_home_page_count=100,
         max_new_avs_count=8,
         base_url=BASE_URL,
+        **kwargs,
     ):
         """Initialize
 
@@ -144,8 +1604,9 @@ class JavDbUtil(BaseUtil):
         :param int max_home_page_count: maximum home page pages to crawl, defaults to 100
         :param int max_new_avs_count: number of newest AVs to fetch, defaults to 8
         :param str base_url: base url, defaults to BASE_URL
+        :param kwargs: extra options passed to BaseUtil, e.g. pool_maxsize
         """
-        super().__init__(proxy_addr, use_cache)
+        super().__init__(proxy_addr, use_cache, **kwargs)
         self.base_url = base_url
         self.base_url_new_av = self.base_url + "/?vft=1&vst=1"
         self.base_url_search = self.base_url + "/search?q="
@@ -161,9 +1622,15 @@ class JavDbUtil(BaseUtil):
         :param str url: page url
         :return tuple[int, int]: status code and max page number
         """
-        code, resp = self.send_req(url)
+        code, resp = self.send_req(url, endpoint="get_max_page")
         if code != 200:
             return code, None
+        return self._parse_max_page(resp, url)
+
+    @cache_parsed
+    def _parse_max_page(
+        self, resp: requests.Response, url: str
+    ) -> Union[Tuple[int, None], Tuple[int, int]]:
         try:
             soup = self.get_soup(resp)
             last_page = int(
@@ -191,15 +1658,17 @@ class JavDbUtil(BaseUtil):
         :param str url: home/search page url
         :return Tuple[int, list]: status code and id list
         """
-        code, resp = self.send_req(url=url)
+        code, resp = self.send_req(url=url, endpoint="get_ids_from_page")
         if code != 200:
             return code, None
+        return self._parse_ids_from_page(resp)
+
+    @cache_parsed
+    def _parse_ids_from_page(
+        self, resp: requests.Response
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
         try:
-            soup = self.get_soup(resp)
-            items = soup.find_all(class_="item")
-            ids = [
-                item.find(class_="video-title").strong.text.strip() for item in items
-            ]
+            ids = [id for id, _ in self._parse_items(resp) if id]
             if not ids:
                 return 404, None
             return 200, ids
@@ -207,12 +1676,73 @@ class JavDbUtil(BaseUtil):
             self.log.error(f"JavDbUtil: failed to get id list from page: {e}")
             return 404, None
 
+    def _parse_items(self, resp: requests.Response) -> List[Tuple[str, str]]:
+        """Id and JavDB internal ID of the items of a search or list page, '' if missing
+
+        The ids are added to the id index on the way.
+        """
+        tree = self.get_tree(resp)
+        if tree is not None:
+            items = [
+                (self._item_title(item), self._item_link(item).split("/")[-1])
+                for item in compile_xpath(self.XPATH_ITEMS)(tree)
+            ]
+        else:
+            soup = self.get_soup(resp, self._strainer("item"))
+            items = []
+            for item in soup.find_all(class_="item"):
+                title = item.find(class_="video-title")
+                link = item.find("a")
+                items.append(
+                    (
+                        title.strong.text.strip() if title and title.strong else "",
+                        link.get("href", "").split("/")[-1] if link else "",
+                    )
+                )
+        self._index_ids(items)
+        return items
+
+    def _index_ids(self, items: Iterable[Tuple[str, str]]):
+        if self.use_cache:
+            self.id_index.put_many(items)
+
+    def _indexed_javdb_id(self, id: str) -> Union[str, None]:
+        """JavDB internal ID of an id from the id index, None if unknown"""
+        return self.id_index.get(id) if self.use_cache else None
+
+    @staticmethod
+    def _item_title(item: "lxml.html.HtmlElement") -> str:
+        """Id of a search or list item, like item.find(class_="video-title").strong.text"""
+        titles = compile_xpath(JavDbUtil.XPATH_ITEM_TITLE)(item)
+        return titles[0].text_content().strip() if titles else ""
+
+    @staticmethod
+    def _item_link(item: "lxml.html.HtmlElement") -> str:
+        """Link of a search or list item, like item.find("a")["href"]"""
+        links = compile_xpath(JavDbUtil.XPATH_ITEM_LINK)(item)
+        return links[0].get("href", "") if links else ""
+
     def get_star_page_by_star_name(
         self, star_name
     ) -> Union[Tuple[int, None], Tuple[int, str]]:
-        code, resp = self.send_req(url=self.base_url_search_star + star_name)
+        url = self._cached_star(star_name).get("url")
+        if url:
+            return 200, url
+        code, resp = self.send_req(
+            url=self.base_url_search_star + star_name,
+            endpoint="get_star_page_by_star_name",
+        )
         if code != 200:
             return code, None
+        code, url = self._parse_star_page(resp)
+        if code == 200:
+            self._cache_star(star_name, url=url)
+        return code, url
+
+    @cache_parsed
+    def _parse_star_page(
+        self, resp: requests.Response
+    ) -> Union[Tuple[int, None], Tuple[int, str]]:
         try:
             soup = self.get_soup(resp)
             url = soup.find(class_="actor-box").find("a").attrs["href"]
@@ -231,9 +1761,17 @@ class JavDbUtil(BaseUtil):
         :param str text: actor name
         :return Tuple[int, list]: status code and list of actor names
         """
-        code, resp = self.send_req(url=self.base_url_search_star + text)
+        code, resp = self.send_req(
+            url=self.base_url_search_star + text, endpoint="fuzzy_search_stars"
+        )
         if code != 200:
             return code, None
+        return self._parse_fuzzy_stars(resp)
+
+    @cache_parsed
+    def _parse_fuzzy_stars(
+        self, resp: requests.Response
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
         try:
             soup = self.get_soup(resp)
             actor_boxs = soup.find_all(class_="actor-box")
@@ -274,14 +1812,10 @@ class JavDbUtil(BaseUtil):
         if code != 200:
             return code, None
         try:
-            if page != -1:
-                url = f"{base_page_url}?page={page}"
-            else:
-                code, max_page = self.get_max_page(base_page_url)
-                if code != 200:
-                    return code, None
-                url = f"{base_page_url}?page={random.randint(1, max_page)}"
-            code, ids = self.get_ids_from_page(url)
+            code, page = self._star_page(base_page_url, page)
+            if code != 200:
+                return code, None
+            code, ids = self.get_ids_from_page(f"{base_page_url}?page={page}")
             if code != 200:
                 return code, None
             return 200, ids
@@ -289,6 +1823,31 @@ class JavDbUtil(BaseUtil):
             self.log.error(f"JavDbUtil: failed to get ids by actor name: {e}")
             return 404, None
 
+    def iter_ids_by_star_name(
+        self, star_name: str, max_pages: Union[int, None] = None, concurrency=4
+    ) -> Iterator[str]:
+        """Yield the IDs of all the pages of an actor, newest first
+
+        The star page and the page count are looked up once, then the pages are
+        fetched concurrently, see BaseUtil._iter_pages.
+
+        :param str star_name: actor name
+        :param int max_pages: max pages to crawl, defaults to None for all of them
+        :param int concurrency: pages requested at once, defaults to 4
+        :return Iterator[str]: IDs
+        """
+        code, base_page_url = self.get_star_page_by_star_name(star_name)
+        if code != 200:
+            return
+        code, max_page = self._max_page(base_page_url)
+        if code != 200:
+            return
+        yield from self._iter_pages(
+            lambda page: self.get_ids_from_page(f"{base_page_url}?page={page}"),
+            self._page_range(max_page, max_pages),
+            concurrency,
+        )
+
     def get_new_ids_by_star_name(
         self, star_name: str
     ) -> Union[Tuple[Any, None], Tuple[int, Any], Tuple[int, None]]:
@@ -330,26 +1889,32 @@ class JavDbUtil(BaseUtil):
             return code, None
         url = f"{base_page_url}{self.BASE_PARAM_NICE_AVS_OF_STAR}"
         code, resp = self.send_req(
-            url=url, headers={"cookie": cookie, "user-agent": self.ua_desktop()}
+            url=url,
+            headers={"cookie": cookie, "user-agent": self._ua("desktop")},
+            endpoint="get_nice_avs_by_star_name",
         )
         if code != 200:
             return code, None
+        return self._export(*self._parse_nice_avs(resp))
+
+    @cache_parsed
+    def _parse_nice_avs(
+        self, resp: requests.Response
+    ) -> Union[Tuple[int, None], Tuple[int, List[Dict[str, Union[str, Any]]]]]:
         try:
             soup = self.get_soup(resp)
             items = soup.find_all(class_="item")
             res = []
+            ids = []
             for item in items:
                 try:
-                    res.append(
-                        {
-                            "rate": self.PAT_SCORE.findall(
-                                item.find(class_="score").text
-                            )[0],
-                            "id": item.find(class_="video-title").strong.text.strip(),
-                        }
-                    )
+                    id = item.find(class_="video-title").strong.text.strip()
+                    score = item.find(class_="score").text
+                    res.append(RatedAV(rate=self.PAT_SCORE.findall(score)[0], id=id))
+                    ids.append((id, item.find("a")["href"].split("/")[-1]))
                 except Exception:
                     pass
+            self._index_ids(ids)
             if not res:
                 return 404, None
             return 200, res
@@ -363,15 +1928,24 @@ class JavDbUtil(BaseUtil):
         :param id: public id
         :return: tuple[int, str] status code and JavDB internal ID
         """
-        code, resp = self.send_req(url=self.base_url_search + id)
+        javdb_id = self._indexed_javdb_id(id)
+        if javdb_id:
+            return 200, javdb_id
+        code, resp = self.send_req(
+            url=self.base_url_search + id, endpoint="get_javdb_id_by_id"
+        )
         if code != 200:
             return code, None
+        return self._parse_javdb_id(resp, id)
+
+    @cache_parsed
+    def _parse_javdb_id(
+        self, resp: requests.Response, id: str
+    ) -> Union[Tuple[int, None], Tuple[int, Any]]:
         try:
-            soup = self.get_soup(resp)
-            items = soup.find_all(class_="item")
-            for item in items:
-                if item.find(class_="video-title").strong.text.strip() == id.upper():
-                    return 200, item.find("a")["href"].split("/")[-1]
+            for item_id, javdb_id in self._parse_items(resp):
+                if item_id == id.upper() and javdb_id:
+                    return 200, javdb_id
             return 404, None  # if there is no correct result, return 404
         except Exception as e:
             self.log.error(f"JavDbUtil: failed to get JavDB internal id by id: {e}")
@@ -385,13 +1959,17 @@ class JavDbUtil(BaseUtil):
         :param url: home/search page url
         :return: Tuple[int, list]: status code and list of JavDB internal IDs
         """
-        code, resp = self.send_req(url=url)
+        code, resp = self.send_req(url=url, endpoint="get_javdb_ids_from_page")
         if code != 200:
             return code, None
+        return self._parse_javdb_ids_from_page(resp)
+
+    @cache_parsed
+    def _parse_javdb_ids_from_page(
+        self, resp: requests.Response
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
         try:
-            soup = self.get_soup(resp)
-            items = soup.find_all(class_="item")
-            ids = [item.find("a")["href"].split("/")[-1] for item in items]
+            ids = [javdb_id for _, javdb_id in self._parse_items(resp) if javdb_id]
             if not ids:
                 return 404, None
             return 200, ids
@@ -432,6 +2010,21 @@ class JavDbUtil(BaseUtil):
         else:
             return 200, resp
 
+    def iter_home_ids(
+        self, max_pages: Union[int, None] = None, concurrency=4
+    ) -> Iterator[str]:
+        """Yield the IDs of the homepage pages, newest first
+
+        :param int max_pages: max pages to crawl, defaults to None for max_home_page_count
+        :param int concurrency: pages requested at once, defaults to 4
+        :return Iterator[str]: IDs
+        """
+        return self._iter_pages(
+            lambda page: self.get_ids_from_page(f"{self.base_url}/?page={page}"),
+            self._page_range(self.max_home_page_count, max_pages),
+            concurrency,
+        )
+
     def get_javdb_ids_from_home(self) -> Union[Tuple[Any, None], Tuple[int, Any]]:
         """Get all JavDB internal IDs from the homepage
 
@@ -467,17 +2060,30 @@ class JavDbUtil(BaseUtil):
         :param str id: public id
         :return Tuple[int, str]: status code and cover url
         """
-        code, resp = self.send_req(url=self.base_url_search + id)
+        code, resp = self.send_req(
+            url=self.base_url_search + id, endpoint="get_cover_by_id"
+        )
         if code != 200:
             return code, None
+        return self._parse_cover_from_search(resp, id)
+
+    @cache_parsed
+    def _parse_cover_from_search(
+        self, resp: requests.Response, id: str
+    ) -> Union[Tuple[int, None], Tuple[int, Any]]:
         try:
             soup = self.get_soup(resp)
-            items = soup.find_all(class_="item")
-            for item in items:
-                if item.find(class_="video-title").strong.text.strip() == id.upper():
-                    return 200, item.find("img")["src"]
-            else:
+            items = []
+            cover = None
+            for item in soup.find_all(class_="item"):
+                item_id = item.find(class_="video-title").strong.text.strip()
+                items.append((item_id, item.find("a")["href"].split("/")[-1]))
+                if cover is None and item_id == id.upper():
+                    cover = item.find("img")["src"]
+            self._index_ids(items)
+            if cover is None:
                 return 404, None
+            return 200, cover
         except Exception as e:
             self.log.error(f"JavDbUtil: failed to get cover by id: {e}")
             return 404, None
@@ -490,11 +2096,23 @@ class JavDbUtil(BaseUtil):
         :param str javdb_id: JavDB internal ID
         :return Tuple[int, str]: status code and cover url
         """
-        code, resp = self.send_req(url=self.base_url_video + javdb_id)
+        code, resp = self.send_req(
+            url=self.base_url_video + javdb_id, endpoint="get_cover_by_javdb_id"
+        )
         if code != 200:
             return code, None
+        return self._parse_cover(resp)
+
+    @cache_parsed
+    def _parse_cover(
+        self, resp: requests.Response
+    ) -> Union[Tuple[int, None], Tuple[int, Union[str, Any]]]:
+        return self._cover_from_soup(self.get_soup(resp))
+
+    def _cover_from_soup(
+        self, soup: "BeautifulSoup"
+    ) -> Union[Tuple[int, None], Tuple[int, Union[str, Any]]]:
         try:
-            soup = self.get_soup(resp)
             cover = soup.find(class_="column column-video-cover")
             if not cover:
                 return 404, None
@@ -509,11 +2127,23 @@ class JavDbUtil(BaseUtil):
         code, j_id = self.get_javdb_id_by_id(id)
         if code != 200:
             return code, None
-        code, resp = self.send_req(url=self.base_url_video + j_id)
+        code, resp = self.send_req(
+            url=self.base_url_video + j_id, endpoint="get_pv_by_id"
+        )
         if code != 200:
             return code, None
+        return self._parse_pv(resp)
+
+    @cache_parsed
+    def _parse_pv(
+        self, resp: requests.Response
+    ) -> Union[Tuple[int, None], Tuple[int, Union[str, Any]]]:
+        return self._pv_from_soup(self.get_soup(resp))
+
+    def _pv_from_soup(
+        self, soup: "BeautifulSoup"
+    ) -> Union[Tuple[int, None], Tuple[int, Union[str, Any]]]:
         try:
-            soup = self.get_soup(resp)
             url = soup.find(id="preview-video").find("source").attrs["src"]
             if not url:
                 return 404, None
@@ -530,11 +2160,23 @@ class JavDbUtil(BaseUtil):
         code, j_id = self.get_javdb_id_by_id(id)
         if code != 200:
             return code, None
-        code, resp = self.send_req(url=self.base_url_video + j_id)
+        code, resp = self.send_req(
+            url=self.base_url_video + j_id, endpoint="get_samples_by_id"
+        )
         if code != 200:
             return code, None
+        return self._parse_samples(resp)
+
+    @cache_parsed
+    def _parse_samples(
+        self, resp: requests.Response
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
+        return self._samples_from_soup(self.get_soup(resp))
+
+    def _samples_from_soup(
+        self, soup: "BeautifulSoup"
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
         try:
-            soup = self.get_soup(resp)
             img_tags = soup.find_all(class_="tile-item")
             if not img_tags:
                 return 404, None
@@ -581,11 +2223,10 @@ class JavDbUtil(BaseUtil):
         Magnet format:
         {
             'link': '', # link
-            'size': '', # size
             'hd': '0',  # is HD 0 no | 1 yes
             'zm': '0',  # has subtitles 0 no | 1 yes
             'uc': '0',  # uncensored 0 no | 1 yes
-            'size_no_unit': float # size normalized (no unit) for sorting; present when filtering
+            'size': '', # size as shown on the site, e.g. 1.2GB
         }
 
         Actor format:
@@ -595,35 +2236,55 @@ class JavDbUtil(BaseUtil):
             'sex': ''   # actor sex
         }
         """
-        code, resp = self.send_req(url=self.base_url_video + javdb_id)
+        code, resp = self.send_req(
+            url=self.base_url_video + javdb_id, endpoint="get_av_by_javdb_id"
+        )
         if code != 200:
             return code, None
+        return self._export(
+            *self._parse_av(
+                resp, javdb_id, is_nice, is_uncensored, sex_limit, magnet_max_count
+            )
+        )
+
+    @cache_parsed
+    def _parse_av(
+        self,
+        resp: requests.Response,
+        javdb_id: str,
+        is_nice: bool,
+        is_uncensored: bool,
+        sex_limit: bool = False,
+        magnet_max_count=10,
+    ) -> Tuple[int, any]:
+        return self._av_from_soup(
+            self.get_soup(resp),
+            javdb_id,
+            is_nice,
+            is_uncensored,
+            sex_limit,
+            magnet_max_count,
+        )
+
+    def _av_from_soup(
+        self,
+        soup: "BeautifulSoup",
+        javdb_id: str,
+        is_nice: bool,
+        is_uncensored: bool,
+        sex_limit: bool = False,
+        magnet_max_count=10,
+    ) -> Tuple[int, any]:
         try:
-            av = {
-                "id": "",
-                "date": "",
-                "img": "",
-                "title": "",
-                "title_cn": "",
-                "duration": "",
-                "producer": "",
-                "publisher": "",
-                "series": "",
-                "score": "",
-                "tags": [],
-                "stars": [],
-                "magnets": [],
-                "url": self.base_url_video + javdb_id,
-            }
-            soup = self.get_soup(resp)
+            av = JavDbAV(url=self.base_url_video + javdb_id)
             # get meta information
             title_cn = soup.find("strong", {"class": "current-title"})
             title = soup.find("span", {"class": "origin-title"})
             if not title:
                 title, title_cn = title_cn, ""
-            av["title_cn"] = title_cn.text.strip() if title_cn else ""
-            av["title"] = title.text.strip() if title else ""
-            av["img"] = soup.find("div", {"class": "column column-video-cover"}).find(
+            av.title_cn = title_cn.text.strip() if title_cn else ""
+            av.title = title.text.strip() if title else ""
+            av.img = soup.find("div", {"class": "column column-video-cover"}).find(
                 "img"
             )["src"]
             # Because the nav bar structure varies depending on available info,
@@ -632,97 +2293,41 @@ class JavDbUtil(BaseUtil):
                 "div", {"class": "panel-block"}
             )
             for info in metainfos:  # iterate over nav bar info
-                text = unicodedata.normalize("NFKD", re.sub("[\n ]", "", info.text))
-                if re.search("番號:.+", text):
-                    av["id"] = re.search("(番號: )(.+)", text).group(2).strip()
-                elif re.search("日期:.+", text):
-                    av["date"] = re.search("(日期: )(.+)", text).group(2).strip()
-                elif re.search("\d+(分鍾)", text):
-                    av["duration"] = int(re.search("(\d+)(分鍾)", text).group(1))
-                elif re.search("片商:.+", text):
-                    av["producer"] = re.search("(片商: )(.+)", text).group(2).strip()
-                elif re.search("發行:.+", text):
-                    av["publisher"] = re.search("(發行: )(.+)", text).group(2).strip()
-                elif re.search("系列:.+", text):
-                    av["series"] = re.search("(系列: )(.+)", text).group(2).strip()
-                elif re.search("類別:.+", text):
-                    av["tags"] = re.search("(類別: )(.+)", text).group(2).split(", ")
-                elif re.search("評分:.+", text):
-                    av["score"] = (
-                        re.search("(評分: +)(\d+\.*\d*)(分.+)", text).group(2).strip()
-                    )
-                elif re.search("演員:.+", text):
+                text = unicodedata.normalize("NFKD", info.text.translate(self.BLANKS))
+                match = self.PAT_META.match(text)
+                if not match:
+                    continue
+                key = match.lastgroup
+                if key != "stars":
+                    setattr(av, key, self.META_EXTRACTORS[key](match[key]))
+                else:
                     actor_info = info.find_all(("a", "strong"))[1:]
                     for a in range(len(actor_info) // 2):
-                        actor = {
-                            "name": actor_info[a * 2].text.strip(),
-                            "id": actor_info[a * 2]["href"].split("/")[-1],
-                            "sex": (
-                                "女"
-                                if actor_info[a * 2 + 1].text.endswith("♀")
-                                else "男"
-                            ),
-                        }
-                        if not (sex_limit and actor["sex"] == "男"):
-                            av["stars"].append(actor)
+                        actor = Star(
+                            actor_info[a * 2].text.strip(),
+                            actor_info[a * 2]["href"].split("/")[-1],
+                            "女" if actor_info[a * 2 + 1].text.endswith("♀") else "男",
+                        )
+                        if not (sex_limit and actor.sex == "男"):
+                            av.stars.append(actor)
             # get magnet links
             magnet_list = soup.find_all(
                 "div", {"class": "item columns is-desktop"}
             ) + soup.find_all("div", {"class": "item columns is-desktop odd"})
+            magnets = []
             for link in magnet_list:
-                magnet = {
-                    "link": link.find("a")["href"],
-                    "hd": "0",
-                    "zm": "0",
-                    "uc": "0",
-                    "size": "0",
-                }
-                # get size
                 size = link.find("span", {"class": "meta"})
-                if size:
-                    magnet["size"] = size.text.strip().split(",")[0]
-                # check if uncensored
-                title = link.find("span", {"class": "name"}).text
-                if any(
-                    k in title
-                    for k in [
-                        "-U",
-                        "无码",
-                        "無碼",
-                        "无码流出",
-                        "無碼流出",
-                        "无码破解",
-                        "無碼破解",
-                        "uncensored",
-                        "Uncensored",
-                    ]
-                ):
-                    magnet["uc"] = "1"
-                # check tags
-                tags_elements = link.find("div", {"class": "tags"})
-                if tags_elements:
-                    tags_contents = tags_elements.findAll("span")
-                    for i in tags_contents:
-                        if i.text.strip() == "高清":
-                            magnet["hd"] = "1"
-                        elif i.text.strip() == "字幕":
-                            magnet["zm"] = "1"
-                av["magnets"].append(magnet)
-            if is_uncensored:
-                av["magnets"] = MagnetUtil.get_nice_magnets(
-                    av["magnets"], "uc", expect_val="1"
+                magnets.append(
+                    Magnet(
+                        link.find("a")["href"],
+                        size.text.strip().split(",")[0] if size else "0",
+                        # name, size and tags (高清, 字幕) of the magnet
+                        **MagnetUtil.classify(link.text),
+                    )
                 )
-            if is_nice:
-                magnets = av["magnets"]
-                magnets = MagnetUtil.get_nice_magnets(
-                    magnets, "hd", expect_val="1"
-                )  # filter HD
-                magnets = MagnetUtil.get_nice_magnets(
-                    magnets, "zm", expect_val="1"
-                )  # filter subtitles
-                magnets = MagnetUtil.sort_magnets(magnets)  # sort by size descending
-                magnets = magnets[0:magnet_max_count]
-                av["magnets"] = magnets
+            av.magnets = MagnetUtil.select(
+                magnets, is_nice, is_uncensored, magnet_max_count
+            )
             return 200, av
         except Exception as e:
             self.log.error(f"JavDbUtil: failed to get av info: {e}")
@@ -765,27 +2370,181 @@ class JavDbUtil(BaseUtil):
         Magnet format:
         {
             'link': '', # link
-            'size': '', # size
             'hd': '0',  # is HD 0 no | 1 yes
             'zm': '0',  # has subtitles 0 no | 1 yes
             'uc': '0',  # uncensored 0 no | 1 yes
-            'size_no_unit': float # size normalized (no unit) for sorting
+            'size': '', # size as shown on the site, e.g. 1.2GB
+        }
+
+        Actor format:
+        {
+            'name': '', # actor name
+            'id': '',   # actor id
+            'sex': ''   # actor sex
         }
+        """
+        code, j_id = self.get_javdb_id_by_id(id)
+        return (
+            self.get_av_by_javdb_id(
+                j_id, is_nice, is_uncensored, sex_limit, magnet_max_count
+            )
+            if code == 200
+            else (code, None)
+        )
+
+    def get_bundle_by_id(
+        self,
+        id: str,
+        fields: Iterable[str] = BUNDLE_FIELDS,
+        is_nice=False,
+        is_uncensored=False,
+        sex_limit=False,
+        magnet_max_count=10,
+    ) -> Tuple[int, any]:
+        """Get the AV info, cover, preview video and samples of a public ID together
+
+        The search page and the video page are requested and parsed once for all the
+        fields, get_av_by_id, get_cover_by_id, get_pv_by_id and get_samples_by_id
+        each send their own requests. Asking for the cover only skips the video page,
+        the search request is skipped when the id is in the id index.
+
+        :param str id: public id
+        :param Iterable[str] fields: parts to get among 'av', 'cover', 'pv' and 'samples', defaults to all
+        :param bool is_nice: filter for HD and subtitled magnets, defaults to False
+        :param bool is_uncensored: filter for uncensored magnets, defaults to False
+        :param bool sex_limit: whether to include only female actors, defaults to False
+        :param int magnet_max_count: max magnets after filtering, defaults to 10
+        :return Tuple[int, dict]: status code and bundle
+
+        Bundle format, with the asked fields only:
+        {
+            'javdb_id': '', # JavDB internal ID
+            'av': {},       # AV dict, see get_av_by_javdb_id
+            'cover': '',    # cover url
+            'pv': '',       # preview video url
+            'samples': [],  # sample image urls
+        }
+        A field is None when it is not found on the page.
+        """
+        fields = self._bundle_fields(fields)
+        j_id = self._indexed_javdb_id(id)
+        if not j_id or set(fields) <= {"cover"}:
+            code, resp = self.send_req(
+                url=self.base_url_search + id, endpoint="get_bundle_by_id"
+            )
+            if code != 200:
+                return code, None
+            code, j_id = self._parse_javdb_id(resp, id)
+            if code != 200:
+                return code, None
+            if set(fields) <= {"cover"}:
+                # the search results have the cover
+                bundle = {"javdb_id": j_id}
+                if fields:
+                    bundle["cover"] = self._parse_cover_from_search(resp, id)[1]
+                return 200, bundle
+        code, resp = self.send_req(
+            url=self.base_url_video + j_id, endpoint="get_bundle_by_id"
+        )
+        if code != 200:
+            return code, None
+        return self._export_bundle(
+            *self._parse_bundle(
+                resp, j_id, fields, is_nice, is_uncensored, sex_limit, magnet_max_count
+            )
+        )
 
-        Actor format:
-        {
-            'name': '', # actor name
-            'id': '',   # actor id
-            'sex': ''   # actor sex
-        }
+    def _bundle_fields(self, fields: Iterable[str]) -> Tuple[str, ...]:
+        """Asked bundle fields in BUNDLE_FIELDS order, so that they key cache_parsed"""
+        fields = set(fields)
+        unknown = fields.difference(self.BUNDLE_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown bundle fields: {sorted(unknown)}")
+        return tuple(field for field in self.BUNDLE_FIELDS if field in fields)
+
+    def _export_bundle(self, code: int, bundle: dict) -> Tuple[int, any]:
+        if bundle and bundle.get("av") is not None:
+            bundle["av"] = self._export(200, bundle["av"])[1]
+        return code, bundle
+
+    @cache_parsed
+    def _parse_bundle(
+        self,
+        resp: requests.Response,
+        javdb_id: str,
+        fields: Tuple[str, ...],
+        is_nice: bool,
+        is_uncensored: bool,
+        sex_limit: bool = False,
+        magnet_max_count=10,
+    ) -> Tuple[int, any]:
+        soup = self.get_soup(resp)
+        bundle = {"javdb_id": javdb_id}
+        if "av" in fields:
+            bundle["av"] = self._av_from_soup(
+                soup, javdb_id, is_nice, is_uncensored, sex_limit, magnet_max_count
+            )[1]
+        if "cover" in fields:
+            bundle["cover"] = self._cover_from_soup(soup)[1]
+        if "pv" in fields:
+            bundle["pv"] = self._pv_from_soup(soup)[1]
+        if "samples" in fields:
+            bundle["samples"] = self._samples_from_soup(soup)[1]
+        if all(bundle[field] is None for field in fields):
+            return 404, None
+        return 200, bundle
+
+    def get_av_by_ids(
+        self,
+        ids: Iterable[str],
+        is_nice: bool,
+        is_uncensored: bool,
+        sex_limit: bool = False,
+        magnet_max_count=10,
+        concurrency=8,
+        ordered=False,
+    ) -> Dict[str, Tuple[int, any]]:
+        """Get AV info for many public IDs concurrently via JavDB
+
+        :param ids: public ids
+        :param int concurrency: number of lookups running at once, defaults to 8
+        :param bool ordered: keep the dict in input order, defaults to False
+        :return dict: public id -> (status code, AV dict), see get_av_by_id for other params
         """
-        code, j_id = self.get_javdb_id_by_id(id)
-        return (
-            self.get_av_by_javdb_id(
-                j_id, is_nice, is_uncensored, sex_limit, magnet_max_count
+        return dict(
+            self.iter_av_by_ids(
+                ids,
+                is_nice,
+                is_uncensored,
+                sex_limit,
+                magnet_max_count,
+                concurrency,
+                ordered,
             )
-            if code == 200
-            else (code, None)
+        )
+
+    def iter_av_by_ids(
+        self,
+        ids: Iterable[str],
+        is_nice: bool,
+        is_uncensored: bool,
+        sex_limit: bool = False,
+        magnet_max_count=10,
+        concurrency=8,
+        ordered=False,
+    ) -> Iterator[Tuple[str, Tuple[int, any]]]:
+        """Stream AV info for many public IDs, yielding (id, (code, av)) as lookups finish
+
+        Each worker runs the search -> video page flow for one id, so the steps of
+        different ids overlap. See get_av_by_ids for params.
+        """
+        return self._iter_batch(
+            lambda id: self.get_av_by_id(
+                id, is_nice, is_uncensored, sex_limit, magnet_max_count
+            ),
+            ids,
+            concurrency,
+            ordered,
         )
 
 
@@ -793,20 +2552,27 @@ class JavLibUtil(BaseUtil):
     BASE_URL = "https://www.javlibrary.com"
     # max number of ranking pages
     MAX_RANK_PAGE = 25
+    URLS_EXPIRE_AFTER = {
+        r"/cn/vl_searchbyid\.php": WEEK,
+        r"/cn/video(reviews|comments)\.php": DAY,
+        r"/cn/vl_": HOUR,  # rankings and new releases
+    }
 
     def __init__(
         self,
         proxy_addr="",
         use_cache=True,
         base_url=BASE_URL,
+        **kwargs,
     ):
         """Initialize JavLibUtil
 
         :param str proxy_addr: proxy address, defaults to ''
         :param bool use_cache: whether to use cache, defaults to True
         :param str base_url: base url, defaults to BASE_URL
+        :param kwargs: extra options passed to BaseUtil, e.g. pool_maxsize
         """
-        super().__init__(proxy_addr, use_cache)
+        super().__init__(proxy_addr, use_cache, **kwargs)
         self.base_url = base_url
         # nice
         self.base_url_best_rated_last_month = (
@@ -850,7 +2616,7 @@ class JavLibUtil(BaseUtil):
     def get_headers(self):
         return {
             "cookie": "over18=18;",
-            "user-agent": self.ua_desktop(),
+            "user-agent": self._ua("desktop"),
         }
 
     def get_random_ids_from_rank_by_page(
@@ -862,14 +2628,49 @@ class JavLibUtil(BaseUtil):
         :param int list_type: ranking type 0 nice | 1 new
         :return Tuple[int, list]: status code and list of IDs
         """
-        url = None
+        return self._get_rank_ids(
+            self._rank_url(list_type), page, "get_random_ids_from_rank_by_page"
+        )
+
+    def iter_rank_ids(
+        self, list_type: int, max_pages: Union[int, None] = None, concurrency=4
+    ) -> Iterator[str]:
+        """Yield the IDs of the pages of a ranking, the pages being fetched concurrently
+
+        :param int list_type: ranking type 0 nice | 1 new
+        :param int max_pages: max pages to crawl, defaults to None for MAX_RANK_PAGE
+        :param int concurrency: pages requested at once, defaults to 4
+        :return Iterator[str]: IDs
+        """
+        url = self._rank_url(list_type)
+        return self._iter_pages(
+            lambda page: self._get_rank_ids(url, page, "iter_rank_ids"),
+            self._page_range(self.MAX_RANK_PAGE, max_pages),
+            concurrency,
+        )
+
+    def _rank_url(self, list_type: int) -> Union[str, None]:
+        """A ranking url of the type, page number excluded"""
         if list_type == 0:
-            url = random.choice(self.urls_nice)
+            return random.choice(self.urls_nice)
         elif list_type == 1:
-            url = random.choice(self.urls_new)
-        code, resp = self.send_req(url=url + str(page), headers=self.get_headers())
+            return random.choice(self.urls_new)
+        return None
+
+    def _get_rank_ids(
+        self, url: str, page: int, endpoint: str
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
+        code, resp = self.send_req(
+            url=url + str(page), headers=self.get_headers(), endpoint=endpoint
+        )
         if code != 200:
             return code, None
+        return self._parse_rank_ids(resp)
+
+    @cache_parsed
+    def _parse_rank_ids(
+        self, resp: requests.Response
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
         try:
             soup = self.get_soup(resp)
             tag_ids = soup.find_all(class_="id")
@@ -908,9 +2709,26 @@ class JavLibUtil(BaseUtil):
         :return Tuple[int, list]: status code and list of comments
         """
         url = self.base_url_search_av + id
-        code, resp = self.send_req(url=url, headers=self.get_headers())
+        code, resp = self.send_req(
+            url=url, headers=self.get_headers(), endpoint="get_comments_by_id"
+        )
+        if code != 200:
+            return code, None
+        code, javlib_av_id = self._parse_javlib_av_id(resp, url, id)
+        if code != 200:
+            return code, None
+        comment_url = self.base_url_review + javlib_av_id
+        code, resp = self.send_req(
+            url=comment_url, headers=self.get_headers(), endpoint="get_comments_by_id"
+        )
         if code != 200:
             return code, None
+        return self._parse_comments(resp, id)
+
+    @cache_parsed
+    def _parse_javlib_av_id(
+        self, resp: requests.Response, url: str, id: str
+    ) -> Union[Tuple[int, None], Tuple[int, str]]:
         if resp.url == url:
             try:
                 soup = self.get_soup(resp)
@@ -923,10 +2741,12 @@ class JavLibUtil(BaseUtil):
         else:
             r_url = resp.url
             javlib_av_id = r_url[r_url.find("v=") + 2 :]
-        comment_url = self.base_url_review + javlib_av_id
-        code, resp = self.send_req(url=comment_url, headers=self.get_headers())
-        if code != 200:
-            return code, None
+        return 200, javlib_av_id
+
+    @cache_parsed
+    def _parse_comments(
+        self, resp: requests.Response, id: str
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
         try:
             soup = self.get_soup(resp)
             comment_tags = soup.find_all(class_="t")
@@ -946,27 +2766,33 @@ class DmmUtil(BaseUtil):
     PAT_CID = re.compile(r"/cid=.+/")
     PAT_CID_REAL = re.compile(r"[A-Za-z]+0+[0-9]+")
     PAT_AV = re.compile(r"[a-z]+\d+")
+    URLS_EXPIRE_AFTER = {
+        r"/digital/videoa/-/ranking/": HOUR,
+        r"/(mono|monthly|search)/": DAY,
+    }
 
     def __init__(
         self,
         proxy_addr="",
         use_cache=True,
         base_url=BASE_URL,
+        **kwargs,
     ):
         """Initialize DMM utility
 
         :param str proxy_addr: proxy server address, defaults to ''
         :param bool use_cache: whether to use cache, defaults to True
         :param str base_url: base URL, defaults to BASE_URL
+        :param kwargs: extra options passed to BaseUtil, e.g. pool_maxsize
         """
-        super().__init__(proxy_addr, use_cache)
+        super().__init__(proxy_addr, use_cache, **kwargs)
         self.base_url = base_url
         self.base_url_search_av = self.base_url + "/mono/-/search/=/searchstr="
         self.base_url_search_av_monthly = (
             self.base_url + "/monthly/dream/-/list/search/=/sort=ranking/?searchstr="
         )
         self.base_url_search_star = (
-            "https://www.dmm.co.jp/search/=/limit=30/sort=ranking/searchstr="
+            self.base_url + "/search/=/limit=30/sort=ranking/searchstr="
         )
         self.base_url_top_stars = (
             self.base_url + "/digital/videoa/-/ranking/=/type=actress"
@@ -989,14 +2815,21 @@ class DmmUtil(BaseUtil):
         code, resp = self.send_req(
             url=url,
             headers={
-                "user-agent": self.ua_mobile(),
+                "user-agent": self._ua("mobile"),
             },
             cookies={
                 "age_check_done": "1",
             },
+            endpoint="get_pv_by_id",
         )
         if code != 200:
             return code, None
+        return self._parse_pv(resp, id)
+
+    @cache_parsed
+    def _parse_pv(
+        self, resp: requests.Response, id: str
+    ) -> Union[Tuple[int, None], Tuple[int, Any]]:
         try:
             soup = self.get_soup(resp)
             res = soup.find(class_="box-sampleplay")
@@ -1020,14 +2853,21 @@ class DmmUtil(BaseUtil):
         code, resp = self.send_req(
             url=url,
             headers={
-                "user-agent": self.ua_desktop(),  # desktop pages are easier to scrape
+                "user-agent": self._ua("desktop"),  # desktop pages are easier to scrape
             },
             cookies={
                 "age_check_done": "1",
             },
+            endpoint="get_cids",
         )
         if code != 200:
             return code, None
+        return self._parse_cids(resp, url)
+
+    @cache_parsed
+    def _parse_cids(
+        self, resp: requests.Response, url: str
+    ) -> Union[Tuple[int, None], Tuple[int, List[str]]]:
         try:
             soup = self.get_soup(resp)
             tmb_tags = soup.find_all(class_="tmb")
@@ -1051,14 +2891,21 @@ class DmmUtil(BaseUtil):
         code, resp = self.send_req(
             url=url,
             headers={
-                "user-agent": self.ua_desktop(),  # desktop pages are easier to scrape
+                "user-agent": self._ua("desktop"),  # desktop pages are easier to scrape
             },
             cookies={
                 "age_check_done": "1",
             },
+            endpoint="get_cids_monthly",
         )
         if code != 200:
             return code, None
+        return self._parse_cids_monthly(resp, url)
+
+    @cache_parsed
+    def _parse_cids_monthly(
+        self, resp: requests.Response, url: str
+    ) -> Union[Tuple[int, None], Tuple[int, List[str]]]:
         try:
             soup = self.get_soup(resp)
             li_tags = soup.find(id="list").find_all("li")
@@ -1104,14 +2951,21 @@ class DmmUtil(BaseUtil):
         code, resp = self.send_req(
             url=url,
             headers={
-                "user-agent": self.ua_desktop(),  # desktop pages are easier to scrape
+                "user-agent": self._ua("desktop"),  # desktop pages are easier to scrape
             },
             cookies={
                 "age_check_done": "1",
             },
+            endpoint="get_nice_avs_by_star_name",
         )
         if code != 200:
             return code, resp
+        return self._export(*self._parse_nice_avs(resp, star_name))
+
+    @cache_parsed
+    def _parse_nice_avs(
+        self, resp: requests.Response, star_name: str
+    ) -> Tuple[int, any]:
         try:
             soup = self.get_soup(resp)
             av_list = soup.find_all(class_="grid")[2]
@@ -1131,12 +2985,12 @@ class DmmUtil(BaseUtil):
                         score = float(match.group(1)) if match else None
                     else:
                         score = None
-                    avs.append({"rate": score, "id": id})
+                    avs.append(RatedAV(rate=score, id=id))
                 except Exception:
                     pass
             if avs == []:
                 return 404, None
-            avs = list(filter(lambda av: av["rate"] >= 4.0, avs))
+            avs = list(filter(lambda av: av.rate >= 4.0, avs))
             if len(avs) == 0:
                 return 404, None
             return 200, avs
@@ -1157,14 +3011,19 @@ class DmmUtil(BaseUtil):
         code, resp = self.send_req(
             url=url,
             headers={
-                "user-agent": self.ua_desktop(),  # desktop pages are easier to scrape
+                "user-agent": self._ua("desktop"),  # desktop pages are easier to scrape
             },
             cookies={
                 "age_check_done": "1",
             },
+            endpoint="get_score_by_id",
         )
         if code != 200:
             return code, resp
+        return self._parse_score(resp, id)
+
+    @cache_parsed
+    def _parse_score(self, resp: requests.Response, id: str) -> Tuple[int, any]:
         try:
             soup = self.get_soup(resp)
             res = soup.find(class_="rate")
@@ -1191,14 +3050,21 @@ class DmmUtil(BaseUtil):
         code, resp = self.send_req(
             url=url,
             headers={
-                "user-agent": self.ua_desktop(),  # desktop pages are easier to scrape
+                "user-agent": self._ua("desktop"),  # desktop pages are easier to scrape
             },
             cookies={
                 "age_check_done": "1",
             },
+            endpoint="get_top_stars",
         )
         if code != 200:
             return code, None
+        return self._parse_top_stars(resp, page)
+
+    @cache_parsed
+    def _parse_top_stars(
+        self, resp: requests.Response, page: int
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
         try:
             soup = self.get_soup(resp)
             res = soup.find_all(class_="data")
@@ -1214,29 +3080,34 @@ class DmmUtil(BaseUtil):
 
         :return tuple[int, list]: status code and list of actress names
         """
-        with concurrent.futures.ThreadPoolExecutor(max_workers=6) as executor:
-            # crawl pages 1 to 5
-            futures = {
-                executor.submit(self.get_top_stars, page): page for page in range(1, 6)
-            }
-            results = {}
-            # wait and collect results
-            for future in concurrent.futures.as_completed(futures):
-                code, res = future.result()
-                if code != 200:
-                    return 502, None
-                results[futures[future]] = res
-            stars = []
-            for i in range(1, 6):
-                if results[i] != None:
-                    stars += results[i]
-            if stars == []:
-                return 404, None
-            return 200, stars
+        stars = []
+        # crawl pages 1 to 5
+        for _, (code, res) in self._iter_batch(
+            self.get_top_stars, range(1, 6), concurrency=5, ordered=True
+        ):
+            if code != 200:
+                return 502, None
+            stars += res
+        if stars == []:
+            return 404, None
+        return 200, stars
 
 
 class JavBusUtil(BaseUtil):
     BASE_URL = "https://www.javbus.com"
+    URLS_EXPIRE_AFTER = {
+        r"/ajax/": 10 * MINUTE,  # magnets
+        r"/genre/?$": WEEK,  # genre list
+        r"/searchstar/": WEEK,
+        r"/(page|genre|search|star)/": 30 * MINUTE,  # av lists
+        r"/?$": 10 * MINUTE,  # home
+        r"/[^/?]+$": WEEK,  # av page: metadata and samples
+    }
+    # variables of the inline script of AV pages, needed to request the magnets
+    PAT_UC = re.compile(rb"var uc = (.+);")
+    PAT_GID = re.compile(rb"var gid = (.+);")
+    # selectors of the lxml parse paths, see BaseUtil.get_tree
+    XPATH_MOVIE_BOXES = f"//*[{has_class('movie-box')}]"
 
     def get_headers(self):
         # return {
@@ -1268,6 +3139,7 @@ class JavBusUtil(BaseUtil):
         max_home_page_count=100,
         max_new_avs_count=8,
         base_url=BASE_URL,
+        **kwargs,
     ):
         """Initialize JavBus utility
 
@@ -1277,8 +3149,9 @@ class JavBusUtil(BaseUtil):
         :param int max_new_avs_count: number of newest AVs to fetch, defaults to 8
         :param str bus_auth: cookie value required for requests, defaults to empty string
         :param str base_url: base URL, defaults to BASE_URL
+        :param kwargs: extra options passed to BaseUtil, e.g. pool_maxsize
         """
-        super().__init__(proxy_addr, use_cache)
+        super().__init__(proxy_addr, use_cache, **kwargs)
         self.max_home_page_count = max_home_page_count
         self.max_new_avs_count = max_new_avs_count
         self.bus_auth = bus_auth
@@ -1296,9 +3169,19 @@ class JavBusUtil(BaseUtil):
 
         :return Tuple[int, list]: status code and list of genres
         """
-        code, resp = self.send_req(url=self.base_url_genre, headers=self.get_headers())
+        code, resp = self.send_req(
+            url=self.base_url_genre,
+            headers=self.get_headers(),
+            endpoint="get_all_genres",
+        )
         if code != 200:
             return code, None
+        return self._parse_all_genres(resp)
+
+    @cache_parsed
+    def _parse_all_genres(
+        self, resp: requests.Response
+    ) -> Union[Tuple[int, None], Tuple[int, List[Dict[Any, Any]]]]:
         try:
             soup = self.get_soup(resp)
             boxes = soup.find_all(class_="row genre-box")
@@ -1336,9 +3219,17 @@ class JavBusUtil(BaseUtil):
         :param str url: page url
         :return tuple[int, int]: status code and max page number
         """
-        code, resp = self.send_req(url, headers=self.get_headers())
+        code, resp = self.send_req(
+            url, headers=self.get_headers(), endpoint="get_max_page"
+        )
         if code != 200:
             return code, None
+        return self._parse_max_page(resp, url)
+
+    @cache_parsed
+    def _parse_max_page(
+        self, resp: requests.Response, url: str
+    ) -> Union[Tuple[int, None], Tuple[int, int]]:
         try:
             soup = self.get_soup(resp)
             tag_pagination = soup.find(class_="pagination pagination-lg")
@@ -1367,13 +3258,25 @@ class JavBusUtil(BaseUtil):
             if code != 200:
                 return code, None
             url = f"{base_page_url}/{random.randint(1, max_page)}"
-        code, resp = self.send_req(url=url, headers=self.get_headers())
+        code, resp = self.send_req(
+            url=url, headers=self.get_headers(), endpoint="get_ids_from_page"
+        )
         if code != 200:
             return code, None
+        return self._parse_ids_from_page(resp, base_page_url)
+
+    @cache_parsed
+    def _parse_ids_from_page(
+        self, resp: requests.Response, base_page_url: str
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
         try:
             ids = []
-            soup = self.get_soup(resp)
-            tags = soup.find_all(class_="movie-box")
+            tree = self.get_tree(resp)
+            if tree is not None:
+                tags = [tag.attrib for tag in compile_xpath(self.XPATH_MOVIE_BOXES)(tree)]
+            else:
+                soup = self.get_soup(resp, self._strainer("movie-box"))
+                tags = soup.find_all(class_="movie-box")
             for tag in tags:
                 id_link = tag["href"]
                 id = id_link[id_link.rfind("/") + 1 :]
@@ -1401,6 +3304,75 @@ class JavBusUtil(BaseUtil):
             return code, None
         return 200, random.choice(ids)
 
+    def iter_ids_from_page(
+        self,
+        base_page_url: str,
+        max_pages: Union[int, None] = None,
+        concurrency=4,
+        max_page: Union[int, None] = None,
+    ) -> Iterator[str]:
+        """Yield the IDs of all the pages of an AV list
+
+        The page count is looked up once (see get_max_page), then the pages are
+        fetched concurrently, see BaseUtil._iter_pages.
+
+        :param str base_page_url: base page url (first page)
+        :param int max_pages: max pages to crawl, defaults to None for all of them
+        :param int concurrency: pages requested at once, defaults to 4
+        :param int max_page: page count if known, defaults to None to look it up
+        :return Iterator[str]: IDs
+        """
+        if max_page is None:
+            code, max_page = self._max_page(base_page_url)
+            if code != 200:
+                return
+        yield from self._iter_pages(
+            lambda page: self.get_ids_from_page(base_page_url, page),
+            self._page_range(max_page, max_pages),
+            concurrency,
+        )
+
+    def iter_home_ids(
+        self, max_pages: Union[int, None] = None, concurrency=4
+    ) -> Iterator[str]:
+        """Yield the IDs of the homepage pages
+
+        :param int max_pages: max pages to crawl, defaults to None for max_home_page_count
+        :param int concurrency: pages requested at once, defaults to 4
+        :return Iterator[str]: IDs
+        """
+        return self.iter_ids_from_page(
+            self.base_url + "/page", max_pages, concurrency, self.max_home_page_count
+        )
+
+    def iter_ids_by_star_name(
+        self, star_name: str, max_pages: Union[int, None] = None, concurrency=4
+    ) -> Iterator[str]:
+        """Yield the IDs of all the pages of an actor by name
+
+        :param str star_name: actor name
+        :param int max_pages: max pages to crawl, defaults to None for all of them
+        :param int concurrency: pages requested at once, defaults to 4
+        :return Iterator[str]: IDs
+        """
+        return self.iter_ids_from_page(
+            f"{self.base_url_search_by_star_name}/{star_name}", max_pages, concurrency
+        )
+
+    def iter_ids_by_star_id(
+        self, star_id: str, max_pages: Union[int, None] = None, concurrency=4
+    ) -> Iterator[str]:
+        """Yield the IDs of all the pages of an actor by id
+
+        :param str star_id: actor id
+        :param int max_pages: max pages to crawl, defaults to None for all of them
+        :param int concurrency: pages requested at once, defaults to 4
+        :return Iterator[str]: IDs
+        """
+        return self.iter_ids_from_page(
+            f"{self.base_url_search_by_star_id}/{star_id}", max_pages, concurrency
+        )
+
     def get_id_from_home(self, page=-1) -> Tuple[int, str]:
         """Get an ID from the javbus homepage
 
@@ -1418,10 +3390,11 @@ class JavBusUtil(BaseUtil):
         :param int page: which page to fetch; -1 means random
         :return tuple[int, str]: status code and ID
         """
-        return self.get_id_from_page(
-            base_page_url=f"{self.base_url_search_by_star_name}/{star_name}",
-            page=page,
-        )
+        base_page_url = f"{self.base_url_search_by_star_name}/{star_name}"
+        code, page = self._star_page(base_page_url, page)
+        if code != 200:
+            return code, None
+        return self.get_id_from_page(base_page_url=base_page_url, page=page)
 
     def get_ids_by_star_name(self, star_name: str, page=-1) -> Tuple[int, list]:
         """Get a list of IDs by actor name
@@ -1430,10 +3403,11 @@ class JavBusUtil(BaseUtil):
         :param int page: which page to fetch; -1 means random
         :return tuple[int, list]: status code and list of IDs
         """
-        return self.get_ids_from_page(
-            base_page_url=f"{self.base_url_search_by_star_name}/{star_name}",
-            page=page,
-        )
+        base_page_url = f"{self.base_url_search_by_star_name}/{star_name}"
+        code, page = self._star_page(base_page_url, page)
+        if code != 200:
+            return code, None
+        return self.get_ids_from_page(base_page_url=base_page_url, page=page)
 
     def get_new_ids_by_star_name(
         self, star_name: str
@@ -1458,10 +3432,11 @@ class JavBusUtil(BaseUtil):
         :param int page: which page to fetch; -1 means random
         :return tuple[int, str]: status code and ID
         """
-        return self.get_id_from_page(
-            base_page_url=f"{self.base_url_search_by_star_id}/{star_id}",
-            page=page,
-        )
+        base_page_url = f"{self.base_url_search_by_star_id}/{star_id}"
+        code, page = self._star_page(base_page_url, page)
+        if code != 200:
+            return code, None
+        return self.get_id_from_page(base_page_url=base_page_url, page=page)
 
     def get_new_ids_by_star_id(
         self, star_id: str
@@ -1486,11 +3461,19 @@ class JavBusUtil(BaseUtil):
         :param str id: public id
         :return tuple[int, list]: status code and list of sample image URLs
         """
-        samples = []
         url = f"{self.base_url}/{id}"
-        code, resp = self.send_req(url=url, headers=self.get_headers())
+        code, resp = self.send_req(
+            url=url, headers=self.get_headers(), endpoint="get_samples_by_id"
+        )
         if code != 200:
             return code, None
+        return self._parse_samples(resp, id)
+
+    @cache_parsed
+    def _parse_samples(
+        self, resp: requests.Response, id: str
+    ) -> Union[Tuple[int, None], Tuple[int, List[Union[str, Any]]]]:
+        samples = []
         try:
             soup = self.get_soup(resp)
             sample_tags = soup.find_all(class_="sample-box")
@@ -1519,12 +3502,25 @@ class JavBusUtil(BaseUtil):
             "star_name": star_name
         }
         """
+        star = self._cached_star(star_name)
+        if star.get("star_id"):
+            return 200, {"star_id": star["star_id"], "star_name": star["star_name"]}
         code, resp = self.send_req(
             url=f"{self.base_url_search_star}/{star_name}",
             headers=self.get_headers(),
+            endpoint="check_star_exists",
         )
         if code != 200:
             return code, None
+        code, star = self._parse_star(resp, star_name)
+        if code == 200:
+            self._cache_star(star_name, **star)
+        return code, star
+
+    @cache_parsed
+    def _parse_star(
+        self, resp: requests.Response, star_name: str
+    ) -> Union[Tuple[int, None], Tuple[int, Dict[str, Union[str, Any]]]]:
         try:
             soup = self.get_soup(resp)
             star = soup.find(class_="avatar-box text-center")
@@ -1546,10 +3542,18 @@ class JavBusUtil(BaseUtil):
         :return Tuple[int, list]: status code and list of actor names
         """
         code, resp = self.send_req(
-            url=f"{self.base_url_search_star}/{text}", headers=self.get_headers()
+            url=f"{self.base_url_search_star}/{text}",
+            headers=self.get_headers(),
+            endpoint="fuzzy_search_stars",
         )
         if code != 200:
             return code, None
+        return self._parse_fuzzy_stars(resp)
+
+    @cache_parsed
+    def _parse_fuzzy_stars(
+        self, resp: requests.Response
+    ) -> Union[Tuple[int, None], Tuple[int, List[Any]]]:
         try:
             soup = self.get_soup(resp)
             actor_boxs = soup.find_all(class_="avatar-box text-center")
@@ -1592,11 +3596,10 @@ class JavBusUtil(BaseUtil):
         Magnet format:
         {
             'link': '', # link
-            'size': '', # size
             'hd': '0',  # is HD 0 no | 1 yes
             'zm': '0',  # has subtitles 0 no | 1 yes
             'uc': '0',  # uncensored 0 no | 1 yes
-            'size_no_unit': float # normalized size for sorting
+            'size': '', # size as shown on the site, e.g. 1.2GB
         }
 
         Actor format:
@@ -1606,23 +3609,79 @@ class JavBusUtil(BaseUtil):
         }
         """
         id = id.lower()  # some IDs must be lowercase to be found on javbus
-        av = {
-            "id": id,
-            "title": "",
-            "img": "",
-            "date": "",
-            "tags": "",
-            "stars": [],
-            "magnets": [],
-            "url": "",
-        }
         url = f"{self.base_url}/{id}"
-        av["url"] = url
-        code, resp = self.send_req(url=url, headers=self.get_headers())
+        code, resp = self.send_req(
+            url=url, headers=self.get_headers(), endpoint="get_av_by_id"
+        )
         if code != 200:
             return code, None
+        av, uc, gid = self._parse_av(resp, id, url)
+        # if there are no magnets, return immediately
+        if not uc and not gid:
+            return self._export(200, av)
+        # send request to obtain page that contains magnets
+        code, resp = self.send_req(
+            **self._magnet_req(id, uc, gid), endpoint="get_av_by_id"
+        )
+        # if no magnets or request failed, return
+        if code != 200:
+            return self._export(200, av)
+        return self._export(
+            200, self._parse_magnets(resp, av, is_nice, is_uncensored, magnet_max_count)
+        )
+
+    def get_av_by_ids(
+        self,
+        ids: Iterable[str],
+        is_nice: bool,
+        is_uncensored: bool,
+        magnet_max_count=10,
+        concurrency=8,
+        ordered=False,
+    ) -> Dict[str, Tuple[int, any]]:
+        """Get AV info for many public IDs concurrently from javbus
+
+        :param ids: public ids
+        :param int concurrency: number of lookups running at once, defaults to 8
+        :param bool ordered: keep the dict in input order, defaults to False
+        :return dict: public id -> (status code, AV dict), see get_av_by_id for other params
+        """
+        return dict(
+            self.iter_av_by_ids(
+                ids, is_nice, is_uncensored, magnet_max_count, concurrency, ordered
+            )
+        )
+
+    def iter_av_by_ids(
+        self,
+        ids: Iterable[str],
+        is_nice: bool,
+        is_uncensored: bool,
+        magnet_max_count=10,
+        concurrency=8,
+        ordered=False,
+    ) -> Iterator[Tuple[str, Tuple[int, any]]]:
+        """Stream AV info for many public IDs, yielding (id, (code, av)) as lookups finish
+
+        Each worker runs the page -> magnet ajax flow for one id, so the steps of
+        different ids overlap. See get_av_by_ids for params.
+        """
+        return self._iter_batch(
+            lambda id: self.get_av_by_id(
+                id, is_nice, is_uncensored, magnet_max_count
+            ),
+            ids,
+            concurrency,
+            ordered,
+        )
+
+    @cache_parsed
+    def _parse_av(
+        self, resp: requests.Response, id: str, url: str
+    ) -> Tuple[AV, Union[str, None], Union[str, None]]:
+        """Parse an AV page into the AV plus the uc and gid needed for magnets"""
+        av = AV(id=id, tags="", url=url)
         soup = self.get_soup(resp)
-        html = soup.prettify()
         try:
             # get cover and title
             big_image = soup.find(class_="bigImage")
@@ -1630,125 +3689,111 @@ class JavBusUtil(BaseUtil):
             if big_image:
                 img = big_image["href"]
                 if img.find("http") == -1:
-                    av["img"] = self.base_url + img
-                    av["title"] = big_image.img["title"]
+                    av.img = self.base_url + img
+                    av.title = big_image.img["title"]
             paras = soup.find(class_="col-md-3 info").find_all("p")
             for i, p in enumerate(paras):
                 # get identifier
                 if p.text.find("識別碼:") != -1:
-                    av["id"] = "".join(
+                    av.id = "".join(
                         p.text.replace("識別碼:", "").replace('"', "").split()
                     )
                 # get release date
                 elif p.text.find("發行日期:") != -1:
-                    av["date"] = "".join(
+                    av.date = "".join(
                         p.text.replace("發行日期:", "").replace('"', "").split()
                     )
                 # get tags
                 elif p.text.find("類別:") != -1:
                     tags = paras[i + 1].find_all("a")
-                    av["tags"] = ["".join(tag.text.split()) for tag in tags]
+                    av.tags = ["".join(tag.text.split()) for tag in tags]
                 # get actors
                 elif i == len(paras) - 1:
                     tags = p.find_all("a")
                     for tag in tags:
-                        star = {"name": "", "id": ""}
-                        star["name"] = "".join(tag.text.split())
-                        star["id"] = tag["href"].split("star/")[1]
-                        av["stars"].append(star)
+                        av.stars.append(
+                            Star("".join(tag.text.split()), tag["href"].split("star/")[1])
+                        )
         except Exception as e:
             self.log.error(f"JavBusUtil: failed to get av {id}: {e}")
-        # get uc
-        uc_pattern = re.compile(r"var uc = .+;")
-        match = uc_pattern.findall(html)
-        uc = None
-        if match:
-            uc = match[0].replace("var uc = ", "").replace(";", "")
-        # get gid
-        gid_pattern = re.compile(r"var gid = .+;")
-        match = gid_pattern.findall(html)
-        gid = None
-        if match:
-            gid = match[0].replace("var gid = ", "").replace(";", "")
-        # if there are no magnets, return immediately
-        if not uc and not gid:
-            return 200, av
-        # construct ajax URL to retrieve magnets
-        url = f"{self.base_url_magnet}&gid={gid}&uc={uc}"
-        headers = {
-            "user-agent": self.ua(),
-            "referer": f"{self.base_url}/{id}",
+        uc, gid = self._scan_uc_gid(resp.content)
+        return av, uc, gid
+
+    @classmethod
+    def _scan_uc_gid(
+        cls, content: bytes
+    ) -> Tuple[Union[str, None], Union[str, None]]:
+        """Find the uc and gid variables set by an inline script of an AV page
+
+        :param bytes content: raw AV page
+        :return tuple[str, str]: uc and gid, None when missing
+        """
+        values = []
+        for pattern in (cls.PAT_UC, cls.PAT_GID):
+            match = pattern.search(content)
+            values.append(
+                match[1].replace(b";", b"").decode("utf-8", "replace") if match else None
+            )
+        return values[0], values[1]
+
+    def _magnet_req(self, id: str, uc: str, gid: str) -> dict:
+        """Build the ajax request that retrieves the magnets of an AV"""
+        return {
+            "url": f"{self.base_url_magnet}&gid={gid}&uc={uc}",
+            "headers": {
+                "user-agent": self._ua(),
+                "referer": f"{self.base_url}/{id}",
+            },
         }
-        # send request to obtain page that contains magnets
-        code, resp = self.send_req(url=url, headers=headers)
-        # if no magnets or request failed, return
-        if code != 200:
-            return 200, av
+
+    def _parse_magnets(
+        self,
+        resp: requests.Response,
+        av: AV,
+        is_nice: bool,
+        is_uncensored: bool,
+        magnet_max_count=10,
+    ) -> AV:
         # parse page to extract magnets
         try:
             soup = self.get_soup(resp)
             trs = soup.find_all("tr")
+            magnets = []
             for tr in trs:
-                magnet = {"link": "", "hd": "0", "zm": "0", "uc": "0"}
                 tds = tr.find_all("td")
-                for i, td in enumerate(tds):
-                    if i == 0:
-                        magnet["link"] = td.a["href"]
-                        magnet_title = td.a.text.strip().lower()
-                        if (
-                            "uncensor" in magnet_title
-                            or "無修正" in magnet_title
-                            or "无修正" in magnet_title
-                            or "无码" in magnet_title
-                        ):
-                            magnet["uc"] = "1"
-                        links = td.find_all("a")
-                        for link in links:
-                            text = link.text.strip()
-                            if text == "高清":
-                                magnet["hd"] = "1"
-                            elif text == "字幕":
-                                magnet["zm"] = "1"
-                    if i == 1:
-                        magnet["size"] = td.a.text.strip()
-                if magnet["link"] != "":
-                    av["magnets"].append(magnet)
-            if is_uncensored:
-                av["magnets"] = MagnetUtil.get_nice_magnets(
-                    av["magnets"], "uc", expect_val="1"
-                )
-            if is_nice:
-                magnets = av["magnets"]
-                magnets = MagnetUtil.get_nice_magnets(
-                    magnets, "hd", expect_val="1"
-                )  # filter HD
-                magnets = MagnetUtil.get_nice_magnets(
-                    magnets, "zm", expect_val="1"
-                )  # filter subtitles
-                magnets = MagnetUtil.sort_magnets(magnets)  # sort by size descending
-                magnets = magnets[0:magnet_max_count]
-                av["magnets"] = magnets
+                if not tds or not tds[0].a["href"]:
+                    continue
+                # title and tags (高清, 字幕) of the magnet
+                flags = MagnetUtil.classify(tds[0].text)
+                size = tds[1].a.text.strip() if len(tds) > 1 else ""
+                magnets.append(Magnet(tds[0].a["href"], size, **flags))
+            av.magnets = MagnetUtil.select(
+                magnets, is_nice, is_uncensored, magnet_max_count
+            )
         except Exception as e:
-            self.log.error(f"JavBusUtil: failed to get av {id}: {e}")
-        return 200, av
+            self.log.error(f"JavBusUtil: failed to get av {av.id}: {e}")
+        return av
 
 
 class AvgleUtil(BaseUtil):
     BASE_URL = "https://api.avgle.com"
+    URLS_EXPIRE_AFTER = {r"/v1/jav/": DAY}
 
     def __init__(
         self,
         proxy_addr="",
         use_cache=True,
         base_url=BASE_URL,
+        **kwargs,
     ):
         """Initialize Avgle utility
 
         :param str proxy_addr: proxy server address, defaults to ''
         :param bool use_cache: whether to use cache, defaults to True
         :param str base_url: base URL, defaults to BASE_URL
+        :param kwargs: extra options passed to BaseUtil, e.g. pool_maxsize
         """
-        super().__init__(proxy_addr, use_cache)
+        super().__init__(proxy_addr, use_cache, **kwargs)
         self.base_url = base_url
 
     def get_video_by_id(self, id: str) -> Tuple[int, any]:
@@ -1765,10 +3810,14 @@ class AvgleUtil(BaseUtil):
         page = 0
         limit = 3
         url = f"{self.base_url}/v1/jav/{id}/{page}?limit={limit}"
-        res = {"fv": "", "pv": ""}
-        code, resp = self.send_req(url=url)
+        code, resp = self.send_req(url=url, endpoint="get_video_by_id")
         if code != 200:
             return code, None
+        return self._parse_video(resp)
+
+    @staticmethod
+    def _parse_video(resp: requests.Response) -> Tuple[int, any]:
+        res = {"fv": "", "pv": ""}
         if resp.json()["success"]:
             videos = resp.json()["response"]["videos"]
             if videos != []:
@@ -1779,7 +3828,7 @@ class AvgleUtil(BaseUtil):
                         res["fv"] = fv_url
                     if res["pv"] == "" and pv_url != "":
                         res["pv"] = pv_url
-            return code, res
+            return 200, res
         else:
             return 404, None
 
@@ -1812,7 +3861,131 @@ class AvgleUtil(BaseUtil):
             return 404, None
 
 
+class Magnet(Record):
+    __slots__ = ("link", "size", "size_bytes", "flags")
+    FIELDS = ("link", "hd", "zm", "uc", "size")
+    # bits of Magnet.flags
+    FLAGS = {"uc": 1, "hd": 2, "zm": 4}
+    PAT_SIZE = re.compile(r"([\d.,]+)\s*([kmgt]?)i?b", re.IGNORECASE)
+    UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+
+    def __init__(self, link: str, size="", hd="0", zm="0", uc="0"):
+        """A magnet of an AV, its size and flags are read once here
+
+        hd, zm and uc are kept in the flags bitmask, setting them updates it.
+
+        :param str link: magnet link
+        :param str size: size as shown by the site, e.g. '1.2GiB', defaults to ''
+        :param str hd: is HD, '0' no | '1' yes, defaults to '0'
+        :param str zm: has subtitles, '0' no | '1' yes, defaults to '0'
+        :param str uc: is uncensored, '0' no | '1' yes, defaults to '0'
+        """
+        self.link = link
+        self.size = size
+        self.size_bytes = self.parse_size(size)
+        self.flags = (uc == "1") | (hd == "1") << 1 | (zm == "1") << 2
+
+    def _flag(bit: int) -> property:
+        def get(self) -> str:
+            return "1" if self.flags & bit else "0"
+
+        def set(self, value: str):
+            self.flags = self.flags | bit if value == "1" else self.flags & ~bit
+
+        return property(get, set)
+
+    uc = _flag(FLAGS["uc"])
+    hd = _flag(FLAGS["hd"])
+    zm = _flag(FLAGS["zm"])
+    del _flag
+
+    @classmethod
+    def parse_size(cls, size: str) -> int:
+        """Size in bytes of e.g. '1.2GiB' or '998 MB', -1 if unknown"""
+        match = cls.PAT_SIZE.search(size)
+        if not match:
+            return -1
+        try:
+            value = float(match[1].replace(",", ""))
+        except ValueError:
+            return -1
+        return int(value * cls.UNITS[match[2].lower()])
+
+    @classmethod
+    def from_dict(cls, magnet: dict) -> "Magnet":
+        return cls(
+            magnet["link"],
+            magnet.get("size", ""),
+            magnet.get("hd", "0"),
+            magnet.get("zm", "0"),
+            magnet.get("uc", "0"),
+        )
+
+    def to_dict(self) -> dict:
+        """The magnet dict returned by the utils"""
+        return {
+            "link": self.link,
+            "hd": self.hd,
+            "zm": self.zm,
+            "uc": self.uc,
+            "size": self.size,
+        }
+
+
 class MagnetUtil:
+    # keywords of magnet titles and tags, one named group per flag of the magnet dict
+    PAT_FLAGS = re.compile(
+        # -C / -U / -UC suffixes only before a separator, an extension or the end,
+        # not in ids like ABC-123-C1 or ABC-123-U-2
+        r"(?P<uc>(?i:uncensor)|無修正|无修正|無碼|无码|-UC?(?=[\s._\])]|$))"
+        r"|(?P<zm>字幕|中字|-C(?=[\s._\])]|$))"
+        r"|(?P<hd>高清|(?i:\bFHD\b|1080p|2160p|\b4K\b))"
+    )
+
+    _size_bytes = operator.attrgetter("size_bytes")
+
+    @staticmethod
+    def classify(text: str) -> Dict[str, str]:
+        """Find the flags of a magnet from its title and tags in a single scan
+
+        :param str text: title of the magnet, with its tags if any
+        :return dict: {'hd': '0', 'zm': '0', 'uc': '0'}, '1' for the flags found
+        """
+        flags = {"hd": "0", "zm": "0", "uc": "0"}
+        for match in MagnetUtil.PAT_FLAGS.finditer(text):
+            flags[match.lastgroup] = "1"
+        return flags
+
+    @staticmethod
+    def select(
+        magnets: List[Magnet], is_nice: bool, is_uncensored: bool, max_count=10
+    ) -> List[Magnet]:
+        """Filter and rank magnets like chained get_nice_magnets and sort_magnets calls
+
+        Uncensored (if is_uncensored), then HD and subtitled (if is_nice) magnets are
+        kept, each filter being skipped when no magnet passes it. Nice magnets are
+        the max_count largest ones, largest first.
+
+        :param list[Magnet] magnets: magnets
+        :param bool is_nice: keep the HD and subtitled magnets, then the largest ones
+        :param bool is_uncensored: keep the uncensored magnets
+        :param int max_count: max nice magnets, defaults to 10
+        :return list[Magnet]: selected magnets
+        """
+        props = (["uc"] if is_uncensored else []) + (["hd", "zm"] if is_nice else [])
+        if props and len(magnets) > 1:
+            # the filters run over the distinct flags, then one pass keeps the magnets
+            kept = {m.flags for m in magnets}
+            for prop in props:
+                passed = {flags for flags in kept if flags & Magnet.FLAGS[prop]}
+                if passed:
+                    kept = passed
+            magnets = [m for m in magnets if m.flags in kept]
+        if is_nice:
+            # same order as a stable sort by size descending
+            return heapq.nlargest(max_count, magnets, key=MagnetUtil._size_bytes)
+        return magnets
+
     @staticmethod
     def get_nice_magnets(magnets: list, prop: str, expect_val: any) -> list:
         """Filter magnet list by property
@@ -1838,7 +4011,7 @@ class MagnetUtil:
 
     @staticmethod
     def sort_magnets(magnets: list) -> list:
-        """Sort magnet list by size
+        """Sort magnet list by size, the utils use Magnet and MagnetUtil.select instead
 
         :param list magnets: list of magnets
         :return list: sorted list of magnets
@@ -1860,20 +4033,26 @@ class MagnetUtil:
 
 class SukebeiUtil(BaseUtil):
     BASE_URL = "https://sukebei.nyaa.si"
+    URLS_EXPIRE_AFTER = {
+        r"/view/": WEEK,  # torrent page
+        r"/?\?": 10 * MINUTE,  # search, i.e. magnets
+    }
 
     def __init__(
         self,
         proxy_addr="",
         use_cache=True,
         base_url=BASE_URL,
+        **kwargs,
     ):
         """Initialize Sukebei utility
 
         :param str proxy_addr: proxy server address, defaults to ''
         :param bool use_cache: whether to use cache, defaults to True
         :param str base_url: base URL, defaults to BASE_URL
+        :param kwargs: extra options passed to BaseUtil, e.g. pool_maxsize
         """
-        super().__init__(proxy_addr, use_cache)
+        super().__init__(proxy_addr, use_cache, **kwargs)
         self.base_url = base_url
 
     def get_av_by_id(
@@ -1906,11 +4085,10 @@ class SukebeiUtil(BaseUtil):
         Magnet format:
         {
             'link': '', # link
-            'size': '', # size
-            'hd': '0',  # is HD 0 no | 1 yes | sukebei does not support
-            'zm': '0',  # has subtitles 0 no | 1 yes | sukebei does not support
+            'hd': '0',  # is HD 0 no | 1 yes | guessed from the title
+            'zm': '0',  # has subtitles 0 no | 1 yes | guessed from the title
             'uc': '0',  # uncensored 0 no | 1 yes
-            'size_no_unit': float # normalized size without unit, used for sorting; present when filtering
+            'size': '', # size as shown on the site, e.g. 1.2GB
         }
 
         Actor format: | sukebei does not support
@@ -1919,66 +4097,105 @@ class SukebeiUtil(BaseUtil):
             'id': ''    # actor id
         }
         """
-        av = {
-            "id": id,
-            "title": "",
-            "img": "",
-            "date": "",
-            "tags": [],
-            "stars": [],
-            "magnets": [],
-            "url": "",
-        }
-        qid = id.lower()
-        if qid.find("fc2") != -1:
-            qid = qid.replace("-", " ")
         # search for av
-        url = f"{self.base_url}?q={qid}"
-        code, resp = self.send_req(url=url)
+        url = self._search_url(id)
+        code, resp = self.send_req(url=url, endpoint="get_av_by_id")
         if code != 200:
             return code, None
+        return self._export(
+            *self._parse_av(resp, id, url, is_nice, is_uncensored, magnet_max_count)
+        )
+
+    def get_av_by_ids(
+        self,
+        ids: Iterable[str],
+        is_nice: bool,
+        is_uncensored: bool,
+        magnet_max_count=10,
+        concurrency=8,
+        ordered=False,
+    ) -> Dict[str, Tuple[int, any]]:
+        """Fetch AV information for many public IDs concurrently from Sukebei
+
+        :param ids: public ids
+        :param int concurrency: number of lookups running at once, defaults to 8
+        :param bool ordered: keep the dict in input order, defaults to False
+        :return dict: public id -> (status code, AV dict), see get_av_by_id for other params
+        """
+        return dict(
+            self.iter_av_by_ids(
+                ids, is_nice, is_uncensored, magnet_max_count, concurrency, ordered
+            )
+        )
+
+    def iter_av_by_ids(
+        self,
+        ids: Iterable[str],
+        is_nice: bool,
+        is_uncensored: bool,
+        magnet_max_count=10,
+        concurrency=8,
+        ordered=False,
+    ) -> Iterator[Tuple[str, Tuple[int, any]]]:
+        """Stream AV information for many public IDs, yielding (id, (code, av)) as lookups finish
+
+        See get_av_by_ids for params.
+        """
+        return self._iter_batch(
+            lambda id: self.get_av_by_id(
+                id, is_nice, is_uncensored, magnet_max_count
+            ),
+            ids,
+            concurrency,
+            ordered,
+        )
+
+    def _search_url(self, id: str) -> str:
+        qid = id.lower()
+        if qid.find("fc2") != -1:
+            qid = qid.replace("-", " ")
+        return f"{self.base_url}?q={qid}"
+
+    @cache_parsed
+    def _parse_av(
+        self,
+        resp: requests.Response,
+        id: str,
+        url: str,
+        is_nice: bool,
+        is_uncensored: bool,
+        magnet_max_count=10,
+    ) -> Tuple[int, any]:
+        av = AV(id=id)
         try:
-            av["url"] = url
+            av.url = url
             soup = self.get_soup(resp)
             torrent_list = soup.find(class_="torrent-list")
             trs = torrent_list.tbody.find_all("tr")
+            magnets = []
             for i, tr in enumerate(trs):
                 tds = tr.find_all("td")
-                magnet = {
-                    "link": "",  # link
-                    "size": "",  # size
-                    "hd": "0",  # is HD 0 no | 1 yes
-                    "zm": "0",  # has subtitles 0 no | 1 yes
-                    "uc": "0",  # uncensored 0 no | 1 yes
-                }
+                title = link = size = ""
                 for j, td in enumerate(tds):
                     if j == 1:  # get title
                         title = td.a.text
-                        if (
-                            "uncensor" in title
-                            or "無修正" in title
-                            or "无修正" in title
-                            or "无码" in title
-                        ):
-                            magnet["uc"] = "1"
                         if i == 0:
-                            av["title"] = title
+                            av.title = title
                     if j == 2:  # get magnet link
-                        magnet["link"] = td.find_all("a")[-1]["href"]
+                        link = td.find_all("a")[-1]["href"]
                     if j == 3:  # get size
-                        magnet["size"] = td.text
-                av["magnets"].append(magnet)
+                        size = td.text
+                magnets.append(Magnet(link, size, **MagnetUtil.classify(title)))
             # filter magnets
-            if is_uncensored:
-                av["magnets"] = MagnetUtil.get_nice_magnets(
-                    av["magnets"], "uc", expect_val="1"
-                )
+            magnets = MagnetUtil.select(magnets, False, is_uncensored)
             if is_nice:
-                magnets = av["magnets"]
-                magnets = magnets[0:magnet_max_count]
-                magnets = MagnetUtil.sort_magnets(magnets)
-                av["magnets"] = magnets
-
+                # the largest of the first magnets
+                magnets = sorted(
+                    magnets[0:magnet_max_count],
+                    key=lambda m: m.size_bytes,
+                    reverse=True,
+                )
+            av.magnets = magnets
         except Exception as e:
             self.log.error(f"SukebeiUtil: failed to get av {id}: {e}")
             return 404, None
@@ -1996,23 +4213,21 @@ class SukebeiUtil(BaseUtil):
         }
         """
         url = f"{self.base_url}?q={tag}"
-        code, resp = self.send_req(url=url)
+        code, resp = self.send_req(url=url, endpoint="search_av_by_tag")
         if code != 200:
             return code, None
+        return self._export(*self._parse_search(resp, tag))
+
+    @cache_parsed
+    def _parse_search(self, resp: requests.Response, tag: str) -> Tuple[int, any]:
         try:
             soup = self.get_soup(resp)
             torrent_list = soup.find(class_="torrent-list")
             trs = torrent_list.tbody.find_all("tr")
             avs = []
             for tr in trs:
-                av = {
-                    "title": "",
-                    "loc": "",
-                }
                 tds = tr.find_all("td")
-                av["title"] = tds[1].a["title"]
-                av["loc"] = tds[1].a["href"]
-                avs.append(av)
+                avs.append(Listing(title=tds[1].a["title"], loc=tds[1].a["href"]))
             if avs == []:
                 return 404, None
             return 200, avs
@@ -2033,9 +4248,13 @@ class SukebeiUtil(BaseUtil):
             "magnet": "",
         }
         """
-        code, resp = self.send_req(url=url)
+        code, resp = self.send_req(url=url, endpoint="get_av_by_url")
         if code != 200:
             return code, None
+        return self._parse_av_page(resp, url)
+
+    @cache_parsed
+    def _parse_av_page(self, resp: requests.Response, url: str) -> Tuple[int, any]:
         try:
             soup = self.get_soup(resp)
             av = {
@@ -2079,12 +4298,10 @@ class WikiUtil(BaseUtil):
         }
         """
         try:
+            import wikipediaapi
+
             wiki = wikipediaapi.Wikipedia(language=from_lang, proxies=self.proxy_json)
             page = wiki.page(title=topic)
-            # links = page.links
-            # for k in links.keys():
-            #     if links[k].title.find(topic) != -1:
-            #         print(links[k].fullurl)
             if page.text:
                 langlinks = page.langlinks
                 for k in langlinks.keys():
@@ -2112,6 +4329,8 @@ class TransUtil(BaseUtil):
         :return str: translated text; returns None on failure
         """
         try:
+            from deep_translator import GoogleTranslator
+
             return GoogleTranslator(
                 source=from_lang, target=to_lang, proxies=self.proxy_json
             ).translate(text)
@@ -1,6 +1,14 @@
 # -*- coding: UTF-8 -*-
+import contextlib
+import itertools
+import json
 import jvav
+import jvav.metrics
+import jvav.replay
+import tempfile
+import time
 import unittest
+import unittest.mock
 
 PROXY_ADDR = ""
 
@@ -15,6 +23,22 @@ def assert_res(res):
     print(res)
 
 
+@contextlib.contextmanager
+def isolated_cache():
+    """Keep the utils having use_cache off ~/.jvav: temporary sqlite cache without
+    janitor thread, in-memory star cache and id index"""
+    with tempfile.TemporaryDirectory() as tmp, unittest.mock.patch.object(
+        jvav.utils, "PATH_CACHE_JVAV", f"{tmp}/cache"
+    ), unittest.mock.patch.object(
+        jvav.BaseUtil, "cache_janitor", jvav.utils.CacheJanitor(purge_interval=None)
+    ), unittest.mock.patch.object(
+        jvav.BaseUtil, "star_cache", jvav.utils.StarCache()
+    ), unittest.mock.patch.object(
+        jvav.JavDbUtil, "id_index", jvav.utils.IdIndex()
+    ):
+        yield tmp
+
+
 class RankUtilTest(unittest.TestCase):
     util = jvav.RankUtil(proxy_addr=PROXY_ADDR, use_cache=True)
 
@@ -65,6 +89,223 @@ class BaseUtilTest(unittest.TestCase):
     def test_2(self):
         print(BaseUtilTest.util.ua_mobile())
 
+    def test_ua_pool(self):
+        pool = jvav.utils.UserAgentPool(size=4)
+        assert pool.get("mobile") in pool.pool("mobile")
+        assert len(pool.pool("mobile")) == 4
+        assert pool.pin("desktop", "javdb.com") == pool.pin("desktop", "javdb.com")
+        bus = jvav.JavBusUtil(use_cache=False, pin_ua="host")
+        assert bus._ua("desktop") == bus._ua(
+            "desktop", bus.base_url_search_by_star_name
+        )
+        util = jvav.BaseUtil(use_cache=False, pin_ua="session")
+        assert util._ua(url="https://javdb.com") == util._ua(
+            url="https://www.javbus.com"
+        )
+
+    def test_ua(self):
+        for ua in (
+            jvav.BaseUtil.ua(),
+            jvav.BaseUtil.ua_mobile(),
+            jvav.JavBusUtil.ua_desktop(),
+        ):
+            self.assertIsInstance(ua, str)
+        self.assertIn(jvav.BaseUtil.ua_mobile(), jvav.BaseUtil.ua_pool.pool("mobile"))
+        self.assertIn(jvav.BaseUtil.ua_desktop(), jvav.BaseUtil.ua_pool.pool("desktop"))
+
+    def test_session(self):
+        with jvav.BaseUtil(use_cache=False, pool_sizes={"www.javbus.com": 20}) as util:
+            assert util.session is util.session
+            adapter = util.session.get_adapter("https://www.javbus.com/ipx-365")
+            assert adapter._pool_maxsize == 20
+        assert util._session is None
+
+    def test_rate_limiter(self):
+        limiter = jvav.utils.RateLimiter()
+        limiter.set_rate("https://example.com", rate=10, burst=2)
+        delays = [limiter.delay("https://example.com/a") for _ in range(4)]
+        assert delays[0] == delays[1] == 0 and delays[3] > delays[2] > 0
+        limiter.feedback("https://example.com/a", 429)
+        assert limiter.buckets["example.com"].rate == 5
+        assert limiter.delay("https://javdb.com/v/1") == 0
+
+    def test_retry_policy(self):
+        policy = jvav.utils.RetryPolicy(max_retries=2, max_backoff=30)
+        assert policy.parse_retry_after("120") == 120
+        assert policy.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+        assert policy.retry_delay("GET", 0, 503, "5") == 5
+        assert policy.retry_delay("GET", 0, 429, "3600") is None
+        assert policy.retry_delay("GET", 0, 404) is None
+        assert policy.retry_delay("POST", 0, 503) is None
+        assert policy.retry_delay("GET", 2, 503) is None
+        assert 0 < policy.retry_delay("GET", 1) <= 1
+
+    def test_circuit_breaker(self):
+        breaker = jvav.utils.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        url = "https://www.javbus.com/ipx-365"
+        breaker.record(url, 503)
+        assert breaker.allow(url)
+        breaker.record(url)
+        assert not breaker.allow(url) and breaker.is_open("https://www.javbus.com")
+        breaker.record_success(url)
+        assert breaker.allow(url)
+
+    def test_lru_cache(self):
+        cache = jvav.utils.LRUCache(max_bytes=10)
+        cache.put("a", 1, 4)
+        cache.put("b", 2, 4)
+        assert cache.get("a") == 1
+        cache.put("c", 3, 4)
+        assert cache.get("b") is None and cache.get("c") == 3
+        cache.put("d", 4, 11)
+        assert cache.get("d") is None
+        stats = cache.stats()
+        assert stats["hits"] == 2 and stats["misses"] == 2
+        assert stats["evictions"] == 1 and stats["size"] == 8
+
+    def test_expire_after(self):
+        bus = jvav.JavBusUtil(use_cache=False, urls_expire_after={"*/ipx-365": 1})
+        assert bus.get_expire_after(f"{bus.base_url}/ipx-365") == 1
+        assert bus.get_expire_after(f"{bus.base_url}/ssis-586") == jvav.utils.WEEK
+        assert bus.get_expire_after(f"{bus.base_url}/star/okq/2") == 1800
+        assert bus.get_expire_after(bus.base_url) == 600
+        assert bus.get_expire_after(f"{bus.base_url_magnet}&gid=1&uc=0") == 600
+        db = jvav.JavDbUtil(use_cache=False, base_url="https://javdb.example")
+        assert (
+            db.get_expire_after("https://javdb.example/search?f=actor&q=a")
+            == jvav.utils.WEEK
+        )
+        assert db.get_expire_after("https://javdb.example/v/abc") == 6 * jvav.utils.HOUR
+        assert db.get_expire_after("https://javdb.com/v/abc") == db.expire_after
+
+    def test_cache_parsed(self):
+        html = '<div class="item"><div class="video-title"><strong>IPX-365</strong></div></div>'
+        resp = jvav.utils.requests_cache.CachedResponse(
+            content=html.encode(), status_code=200
+        )
+        resp.cache_key = "test_cache_parsed"
+        util = jvav.JavDbUtil(use_cache=False)
+        code, ids = util._parse_ids_from_page(resp)
+        assert code == 200 and ids == ["IPX-365"]
+        ids.append("SSIS-586")
+        with unittest.mock.patch.object(
+            jvav.JavDbUtil, "get_soup", side_effect=AssertionError
+        ), unittest.mock.patch.object(
+            jvav.JavDbUtil, "get_tree", side_effect=AssertionError
+        ):
+            assert util._parse_ids_from_page(resp) == (200, ["IPX-365"])
+
+    def test_records(self):
+        av = jvav.AV(
+            id="IPX-365",
+            stars=[jvav.Star("桃乃木かな", "okq")],
+            magnets=[jvav.Magnet("#", "1GB", hd="1")],
+        )
+        expected = {
+            "id": "IPX-365",
+            "title": "",
+            "img": "",
+            "date": "",
+            "tags": [],
+            "stars": [{"name": "桃乃木かな", "id": "okq"}],
+            "magnets": [{"link": "#", "hd": "1", "zm": "0", "uc": "0", "size": "1GB"}],
+            "url": "",
+        }
+        assert av.to_dict() == expected
+        assert av == expected
+        assert dict(av)["id"] == "IPX-365"
+        assert json.loads(av.to_json()) == expected
+        assert av["stars"][0]["name"] == "桃乃木かな"
+        fields = ["id", "date", "img", "title", "title_cn"]
+        assert list(jvav.JavDbAV().to_dict())[:5] == fields
+        av.magnets[0].zm = "1"
+        assert av.magnets[0].flags == 6 and av.magnets[0].zm == "1"
+        rated = jvav.RatedAV(rate=None, id="IPX-365")
+        self.assertEqual(rated.to_dict(), {"rate": None, "id": "IPX-365"})
+        self.assertIsNone(rated["rate"])
+        self.assertEqual(list(jvav.Listing(title="t", loc=None)), ["title", "loc"])
+
+    def test_cache_janitor(self):
+        cache = jvav.utils.requests_cache.SQLiteCache(use_memory=True)
+        janitor = jvav.utils.CacheJanitor(max_size=3000, policy="lru")
+        for i in range(4):
+            resp = jvav.utils.requests_cache.CachedResponse(
+                content=b"x" * 1000, status_code=200, url=f"https://example.com/{i}"
+            )
+            cache.save_response(resp, str(i))
+            janitor.touch(str(i))
+        janitor.touch("0")
+        assert janitor.prune(cache)["evicted"] == 2
+        assert set(cache.responses.keys()) == {"0", "3"}
+        assert janitor.stats(cache)["responses"] == 2
+
+    def test_replay(self):
+        store = jvav.replay.FixtureStore(tempfile.mkdtemp())
+        store.save(
+            jvav.replay.Fixture(
+                "GET",
+                "https://www.javbus.com/ipx-365",
+                200,
+                {},
+                b"<html>ipx-365</html>",
+            )
+        )
+        with jvav.replay.FixtureServer(store) as server:
+            util = jvav.JavBusUtil(
+                base_url=server.base_url(jvav.JavBusUtil.BASE_URL),
+                use_cache=False,
+                max_retries=0,
+            )
+            code, resp = util.send_req(f"{util.base_url}/ipx-365")
+            assert code == 200 and resp.text == "<html>ipx-365</html>"
+            assert util.send_req(f"{util.base_url}/ssis-586")[0] == 404
+            recorder = jvav.replay.FixtureStore(tempfile.mkdtemp())
+            with unittest.mock.patch.object(jvav.BaseUtil, "recorder", recorder):
+                util.send_req(f"{util.base_url}/ipx-365")
+            assert [f.body for f in recorder] == [b"<html>ipx-365</html>"]
+            server.error_rate = 1
+            assert util.send_req(f"{util.base_url}/ipx-365")[0] == 502
+
+    def test_metrics(self):
+        store = jvav.replay.FixtureStore(tempfile.mkdtemp())
+        store.save(
+            jvav.replay.Fixture(
+                "GET",
+                "https://www.javbus.com/ipx-365",
+                200,
+                {},
+                b"<html>ipx-365</html>",
+            )
+        )
+        events = []
+        collector = jvav.metrics.MetricsCollector()
+        jvav.BaseUtil.instrumentation.add_observer(events.append)
+        jvav.BaseUtil.instrumentation.add_observer(collector)
+        try:
+            with jvav.replay.FixtureServer(store) as server:
+                util = jvav.JavBusUtil(
+                    base_url=server.base_url(jvav.JavBusUtil.BASE_URL),
+                    use_cache=False,
+                    max_retries=0,
+                )
+                assert util.get_samples_by_id("ipx-365") == (404, None)
+        finally:
+            jvav.BaseUtil.instrumentation.remove_observer(events.append)
+            jvav.BaseUtil.instrumentation.remove_observer(collector)
+        request, soup, parse = events
+        assert request["kind"] == "request"
+        assert request["endpoint"] == "get_samples_by_id"
+        assert request["code"] == 200 and request["cache"] == "off"
+        assert request["size"] == len(b"<html>ipx-365</html>")
+        assert 0 <= request["ttfb"] <= request["total"]
+        assert soup["kind"] == "soup" and soup["host"].startswith("127.0.0.1")
+        assert parse["kind"] == "parse" and parse["parser"] == "_parse_samples"
+        assert (
+            'jvav_request_seconds_bucket{provider="JavBusUtil"'
+            in collector.to_prometheus()
+        )
+        assert json.loads(collector.to_json())["requests"][0]["count"] == 1
+
 
 class JavDbUtilTest(unittest.TestCase):
     util = jvav.JavDbUtil(proxy_addr=PROXY_ADDR, use_cache=False)
@@ -149,6 +390,170 @@ class JavDbUtilTest(unittest.TestCase):
     def test_get_av_by_javdb_id(self):
         assert_code(*JavDbUtilTest.util.get_av_by_javdb_id("68YVQ", True, False, False))
 
+    def test_iter_av_by_ids(self):
+        for id, (code, av) in JavDbUtilTest.util.iter_av_by_ids(
+            ["IPX-580", "SSIS-586"], False, False, concurrency=2
+        ):
+            assert_code(code, av)
+
+    def test_parse_engine(self):
+        items = "".join(
+            f'<div class="item x"><a href="/v/{i}"><div class="video-title">'
+            f"<strong> IPX-{i} </strong>title</div></a></div>"
+            for i in range(3)
+        )
+        page = f'<html><body><div class="items">{items}</div></body></html>'.encode()
+        util = jvav.JavDbUtil(use_cache=False)
+        results = []
+        for engine in ("lxml", "soup"):
+            with unittest.mock.patch.object(jvav.BaseUtil, "parse_engine", engine):
+                resp = jvav.utils.requests_cache.CachedResponse(
+                    content=page, status_code=200
+                )
+                results.append(
+                    [
+                        util._parse_ids_from_page(resp),
+                        util._parse_javdb_id(resp, "ipx-1"),
+                        util._parse_javdb_ids_from_page(resp),
+                    ]
+                )
+        assert results[0] == results[1]
+        assert results[0][0] == (200, ["IPX-0", "IPX-1", "IPX-2"])
+        assert results[0][1] == (200, "1")
+
+    def test_javdb_meta(self):
+        util = jvav.JavDbUtil(use_cache=False)
+        texts = {
+            "番號: IPX-365": ("id", "IPX-365"),
+            "時長: 120分鍾": ("duration", 120),
+            "類別: 單體作品, 中出": ("tags", ["單體作品", "中出"]),
+            "評分: 4.52分,由1234人評價": ("score", "4.52"),
+            "演員: 桃乃木かな♀": ("stars", "演員: "),
+        }
+        for text, (key, value) in texts.items():
+            match = util.PAT_META.match(text)
+            assert match.lastgroup == key
+            assert util.META_EXTRACTORS.get(key, str)(match[key]) == value
+        assert util.PAT_META.match("導演: X") is None
+
+    def test_bundle(self):
+        util = jvav.JavDbUtil(use_cache=False)
+        search = jvav.utils.requests_cache.CachedResponse(
+            content=b'<div class="item"><a href="/v/abc"><img src="s.jpg">'
+            b'<div class="video-title"><strong>IPX-365</strong></div></a></div>',
+            status_code=200,
+        )
+        video = jvav.utils.requests_cache.CachedResponse(
+            content='<h2><strong class="current-title">T</strong></h2>'
+            '<div class="column column-video-cover"><img src="c.jpg"></div>'
+            '<video id="preview-video"><source src="//p.mp4"></video>'
+            '<a class="tile-item" href="1.jpg"></a><a class="tile-item" href="2.jpg"></a>'
+            '<nav class="panel movie-panel-info"><div class="panel-block">'
+            "<strong>番號:</strong>&nbsp;<span>IPX-365</span></div></nav>".encode(),
+            status_code=200,
+        )
+        with unittest.mock.patch.object(
+            util, "send_req", side_effect=[(200, search), (200, video)]
+        ) as mock:
+            code, bundle = util.get_bundle_by_id("IPX-365")
+        self.assertEqual(code, 200)
+        self.assertEqual(
+            [call.kwargs["url"] for call in mock.call_args_list],
+            [f"{util.base_url_search}IPX-365", f"{util.base_url_video}abc"],
+        )
+        self.assertEqual(bundle["javdb_id"], "abc")
+        self.assertEqual(bundle["av"]["id"], "IPX-365")
+        self.assertEqual(bundle["av"]["title"], "T")
+        self.assertEqual(bundle["cover"], "c.jpg")
+        self.assertEqual(bundle["pv"], "https://p.mp4")
+        self.assertEqual(bundle["samples"], ["1.jpg", "2.jpg"])
+        with unittest.mock.patch.object(
+            util, "send_req", return_value=(200, search)
+        ) as mock:
+            self.assertEqual(
+                util.get_bundle_by_id("IPX-365", ["cover"]),
+                (200, {"javdb_id": "abc", "cover": "s.jpg"}),
+            )
+            self.assertEqual(mock.call_count, 1)
+            self.assertEqual(util.get_bundle_by_id("SSIS-586"), (404, None))
+        with self.assertRaises(ValueError):
+            util.get_bundle_by_id("IPX-365", ["magnets"])
+
+    def test_id_index(self):
+        items = "".join(
+            f'<div class="item"><a href="/v/j{i}"><div class="video-title">'
+            f"<strong>IPX-{i}</strong></div></a></div>"
+            for i in range(3)
+        )
+        resp = jvav.utils.requests_cache.CachedResponse(
+            content=items.encode(), status_code=200
+        )
+        with isolated_cache() as tmp:
+            index = jvav.utils.IdIndex(f"{tmp}/ids.sqlite")
+            util = jvav.JavDbUtil()
+            with unittest.mock.patch.object(
+                jvav.JavDbUtil, "id_index", index
+            ), unittest.mock.patch.object(
+                util, "send_req", return_value=(200, resp)
+            ) as mock:
+                self.assertEqual(
+                    util.get_ids_from_page(util.base_url),
+                    (200, ["IPX-0", "IPX-1", "IPX-2"]),
+                )
+                mock.reset_mock()
+                self.assertEqual(util.get_javdb_id_by_id("ipx-2"), (200, "j2"))
+                mock.assert_not_called()
+                no_cache = jvav.JavDbUtil(use_cache=False)
+                with unittest.mock.patch.object(
+                    no_cache, "send_req", return_value=(404, None)
+                ):
+                    self.assertEqual(no_cache.get_javdb_id_by_id("ipx-2"), (404, None))
+            self.assertEqual(len(jvav.utils.IdIndex(f"{tmp}/ids.sqlite")), 3)
+            self.assertEqual(index.get_id("j1"), "IPX-1")
+            self.assertIsNone(index.get("SSIS-586"))
+
+    def test_star_cache(self):
+        util = jvav.JavDbUtil()
+        search = jvav.utils.requests_cache.CachedResponse(
+            content=b'<div class="actor-box"><a href="/actors/x"></a></div>',
+            status_code=200,
+        )
+        pagination = jvav.utils.requests_cache.CachedResponse(
+            content=b'<ul class="pagination-list"><li><a>1</a></li><li><a>2</a></li></ul>',
+            status_code=200,
+        )
+        items = jvav.utils.requests_cache.CachedResponse(
+            content=b'<div class="item"><a href="/v/j1"><div class="video-title">'
+            b"<strong>IPX-1</strong></div></a></div>",
+            status_code=200,
+        )
+        with isolated_cache():
+            with unittest.mock.patch.object(
+                util,
+                "send_req",
+                side_effect=[(200, search), (200, pagination), (200, items)],
+            ):
+                self.assertEqual(util.get_ids_by_star_name("S"), (200, ["IPX-1"]))
+            # the star page and the page count come from the star cache
+            with unittest.mock.patch.object(
+                util, "send_req", return_value=(200, items)
+            ) as mock:
+                self.assertEqual(util.get_ids_by_star_name("S"), (200, ["IPX-1"]))
+                self.assertEqual(mock.call_count, 1)
+            self.assertEqual(jvav.JavDbUtil.id_index.get("IPX-1"), "j1")
+            star = jvav.BaseUtil.star_cache.get_star(util.base_url, "S")
+            self.assertEqual(star["url"], f"{util.base_url}/actors/x")
+        cache = jvav.utils.StarCache(expire_after=60)
+        with unittest.mock.patch.object(
+            jvav.utils.time, "time", return_value=time.time() - 120
+        ):
+            cache.put_star(util.base_url, "S", url="/actors/x")
+        cache.put_star(util.base_url, "S", star_id="x")
+        self.assertEqual(
+            cache.get_star(util.base_url, "S"),
+            {"url": None, "star_id": "x", "star_name": None},
+        )
+
 
 class JavLibUtilTest(unittest.TestCase):
     util = jvav.JavLibUtil(proxy_addr=PROXY_ADDR, use_cache=False)
@@ -207,6 +612,13 @@ class DmmUtilTest(unittest.TestCase):
     def test_get_all_top_stars(self):
         assert_code(*DmmUtilTest.util.get_all_top_stars())
 
+    def test_iter_pages(self):
+        util = jvav.DmmUtil(use_cache=False)
+        with unittest.mock.patch.object(
+            util, "get_top_stars", side_effect=lambda page: (200, [page])
+        ):
+            self.assertEqual(util.get_all_top_stars(), (200, [1, 2, 3, 4, 5]))
+
 
 class JavBusUtilTest(unittest.TestCase):
     util = jvav.JavBusUtil(
@@ -276,6 +688,87 @@ class JavBusUtilTest(unittest.TestCase):
             )
         )
 
+    def test_get_av_by_ids(self):
+        res = JavBusUtilTest.util.get_av_by_ids(
+            ["juq-589", "ipx-365"], is_nice=True, is_uncensored=False, ordered=True
+        )
+        assert list(res) == ["juq-589", "ipx-365"]
+        for code, av in res.values():
+            assert_code(code, av)
+
+    def test_parse_engine(self):
+        page = b'<a class="movie-box" href="https://www.javbus.com/IPX-365">'
+        util = jvav.JavBusUtil(use_cache=False)
+        results = []
+        for engine in ("lxml", "soup"):
+            with unittest.mock.patch.object(jvav.BaseUtil, "parse_engine", engine):
+                resp = jvav.utils.requests_cache.CachedResponse(
+                    content=page, status_code=200
+                )
+                results.append(util._parse_ids_from_page(resp, ""))
+        assert results == [(200, ["IPX-365"])] * 2
+
+    def test_scan_uc_gid(self):
+        page = b"<script>\n\tvar gid = 52946017658;\n\tvar uc = 0;\n</script>"
+        assert jvav.JavBusUtil._scan_uc_gid(page) == ("0", "52946017658")
+        assert jvav.JavBusUtil._scan_uc_gid(b"<html></html>") == (None, None)
+
+    def test_star_cache(self):
+        util = jvav.JavBusUtil()
+        search = jvav.utils.requests_cache.CachedResponse(
+            content=b'<a class="avatar-box text-center" href="/star/okq"><img title="S"></a>',
+            status_code=200,
+        )
+        with isolated_cache():
+            with unittest.mock.patch.object(
+                util, "send_req", return_value=(200, search)
+            ) as mock:
+                for _ in range(2):
+                    self.assertEqual(
+                        util.check_star_exists("S"),
+                        (200, {"star_id": "okq", "star_name": "S"}),
+                    )
+                self.assertEqual(mock.call_count, 1)
+            self.assertIsNone(
+                jvav.BaseUtil.star_cache.get_star(util.base_url, "S")["url"]
+            )
+            jvav.BaseUtil.star_cache.expire_after = 0
+            self.assertIsNone(jvav.BaseUtil.star_cache.get_star(util.base_url, "S"))
+
+    def test_iter_pages(self):
+        util = jvav.JavBusUtil(use_cache=False, max_home_page_count=10)
+
+        def send_req(url, **kwargs):
+            page = url.rsplit("/", 1)[-1]
+            if not page.isdigit():  # first page, for the page count
+                html = (
+                    '<ul class="pagination pagination-lg"><li><a>1</a></li>'
+                    "<li><a>3</a></li><li><a>></a></li></ul>"
+                )
+            elif int(page) > 4:
+                return 404, None
+            else:
+                html = "".join(
+                    f'<a class="movie-box" href="/IPX-{page}{i}"></a>' for i in range(2)
+                )
+            return 200, jvav.utils.requests_cache.CachedResponse(
+                content=html.encode(), status_code=200
+            )
+
+        with unittest.mock.patch.object(util, "send_req", side_effect=send_req) as mock:
+            self.assertEqual(
+                list(util.iter_ids_by_star_name("S")),
+                [f"IPX-{p}{i}" for p in range(1, 4) for i in range(2)],
+            )
+            self.assertEqual(mock.call_count, 4)
+            self.assertEqual(
+                list(util.iter_ids_by_star_id("okq", max_pages=1)), ["IPX-10", "IPX-11"]
+            )
+            self.assertEqual(len(list(util.iter_home_ids(concurrency=2))), 8)
+            ids = util.iter_home_ids()
+            self.assertEqual(next(ids), "IPX-10")
+            ids.close()
+
 
 class AvgleUtilTest(unittest.TestCase):
     util = jvav.AvgleUtil(proxy_addr=PROXY_ADDR, use_cache=False)
@@ -327,6 +820,56 @@ class MagnetUtilTest(unittest.TestCase):
     def test_sort_magnets(self):
         print(MagnetUtilTest.util.sort_magnets(MagnetUtilTest.magnets))
 
+    def test_select(self):
+        magnet = jvav.Magnet("#", "1.5 GiB", hd="1")
+        assert magnet.size_bytes == 1.5 * 1024**3
+        assert jvav.Magnet("#", "?").size_bytes == -1
+        assert jvav.Magnet.from_dict(magnet.to_dict()).to_dict() == magnet.to_dict()
+        magnets = [
+            jvav.Magnet(str(i), f"{size}MB", hd, zm, uc)
+            for i, (size, hd, zm, uc) in enumerate(
+                [
+                    (900, "1", "0", "1"),
+                    (1200, "1", "0", "1"),
+                    (3000, "0", "1", "1"),
+                    (5000, "1", "1", "0"),
+                    (1100, "1", "0", "1"),
+                    (1200, "1", "0", "0"),
+                ]
+            )
+        ]
+        dicts = [m.to_dict() for m in magnets]
+        for is_nice, is_uncensored in itertools.product((True, False), repeat=2):
+            expected = dicts
+            if is_uncensored:
+                expected = MagnetUtilTest.util.get_nice_magnets(expected, "uc", "1")
+            if is_nice:
+                expected = MagnetUtilTest.util.get_nice_magnets(expected, "hd", "1")
+                expected = MagnetUtilTest.util.get_nice_magnets(expected, "zm", "1")
+                expected = MagnetUtilTest.util.sort_magnets(expected)[:2]
+            selected = MagnetUtilTest.util.select(magnets, is_nice, is_uncensored, 2)
+            assert [m.link for m in selected] == [m["link"] for m in expected]
+
+    def test_classify(self):
+        classify = MagnetUtilTest.util.classify
+        assert classify("IPX-365 Uncensored 高清 字幕") == {
+            "hd": "1",
+            "zm": "1",
+            "uc": "1",
+        }
+        assert classify("SSIS-586-C.torrent") == {"hd": "0", "zm": "1", "uc": "0"}
+        assert classify("SSIS-586-U 1080P") == {"hd": "1", "zm": "0", "uc": "1"}
+        assert classify("SSIS-586-CD1 Ultra") == {"hd": "0", "zm": "0", "uc": "0"}
+        assert classify("[SSIS-586-UC] 4K") == {"hd": "1", "zm": "0", "uc": "1"}
+        for text in (
+            "ABC-123-C1",
+            "ABC-123-C-2",
+            "ABC-123-U-",
+            "ABC-123-U2.mp4",
+            "ABC-123-UC1",
+        ):
+            self.assertEqual(classify(text), {"hd": "0", "zm": "0", "uc": "0"}, text)
+
 
 class SukebeiUtilTest(unittest.TestCase):
     util = jvav.SukebeiUtil(proxy_addr=PROXY_ADDR, use_cache=False)
@@ -346,6 +889,17 @@ class SukebeiUtilTest(unittest.TestCase):
             *SukebeiUtilTest.util.get_av_by_url("https://sukebei.nyaa.si/view/3873249")
         )
 
+    def test_records(self):
+        page = b'<table class="torrent-list"><tbody><tr><td></td><td><a href="/view/1" title="t">'
+        resp = jvav.utils.requests_cache.CachedResponse(content=page, status_code=200)
+        for records in (False, True):
+            util = jvav.SukebeiUtil(use_cache=False, records=records)
+            with unittest.mock.patch.object(util, "send_req", return_value=(200, resp)):
+                code, avs = util.search_av_by_tag("t")
+            self.assertEqual(code, 200)
+            self.assertEqual(avs, [{"title": "t", "loc": "/view/1"}])
+            self.assertEqual(isinstance(avs[0], jvav.Listing), records)
+
 
 class WikiUtilTest(unittest.TestCase):
     util = jvav.WikiUtil(proxy_addr=PROXY_ADDR, use_cache=False)
@@ -371,6 +925,42 @@ class TransUtilTest(unittest.TestCase):
         )
 
 
+class AsyncUtilTest(unittest.IsolatedAsyncioTestCase):
+    async def test_javbus_get_av_by_id(self):
+        async with jvav.AsyncJavBusUtil(proxy_addr=PROXY_ADDR, use_cache=False) as util:
+            assert_code(
+                *await util.get_av_by_id(
+                    id="juq-589", is_nice=True, is_uncensored=False
+                )
+            )
+
+    async def test_javdb_get_av_by_id(self):
+        async with jvav.AsyncJavDbUtil(proxy_addr=PROXY_ADDR, use_cache=False) as util:
+            assert_code(*await util.get_av_by_id("IPX-580", False, False, True))
+
+    async def test_sukebei_get_av_by_id(self):
+        async with jvav.AsyncSukebeiUtil(
+            proxy_addr=PROXY_ADDR, use_cache=False
+        ) as util:
+            assert_code(
+                *await util.get_av_by_id(
+                    "fc2-3237415", is_nice=True, is_uncensored=False
+                )
+            )
+
+    async def test_get_av_250_rank(self):
+        async with jvav.AsyncRankUtil(proxy_addr=PROXY_ADDR, use_cache=True) as util:
+            assert_code(*await util.get_av_250_rank())
+
+    async def test_validation_headers(self):
+        cached = jvav.utils.requests_cache.CachedResponse(
+            headers={"ETag": '"v1"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"}
+        )
+        headers = jvav.AsyncBaseUtil._validation_headers(cached)
+        assert headers["If-None-Match"] == '"v1"'
+        assert headers["If-Modified-Since"] == "Wed, 21 Oct 2015 07:28:00 GMT"
+
+
 # python3 -m unittest tests.test.RankUtilTest
 # python3 -m unittest tests.test.RankUtilTest.test_random_get_av_from_rank
 if __name__ == "__main__":